@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import math
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException, Request
+
+from app.metrics import admission_rejections, stage
+from app.rate_limit import get_api_key_from_request
+from app.settings import admission_settings, validator_settings
+
+# Weight of the latest run in the moving average of run times.
+EWMA_ALPHA = 0.2
+# Run time assumed before any validation has finished.
+INITIAL_RUN_SECONDS = 30.0
+MAX_RETRY_AFTER_SECONDS = 600
+# Idle clients' finish tags are pruned once there are more than this many.
+MAX_TRACKED_CLIENTS = 1000
+
+
+def client_id(request: Request) -> str:
+    """Who a request is queued as: its API key, else its address, hashed so it can be stored."""
+    return hashlib.sha256(get_api_key_from_request(request).encode()).hexdigest()[:16]
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish: float
+    seq: int
+    size: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    """Fair-share scheduler for validator runs.
+
+    At most `max_running` runs go at once. Waiting runs are ordered by start-time fair
+    queuing: each client's runs get virtual finish times that advance by the feed size,
+    so a client sending many or large feeds cannot starve the others. When the queue
+    holds `max_queued` runs or `max_queued_bytes` of feeds, new runs are refused with a
+    503 and a Retry-After estimate.
+    """
+
+    def __init__(
+        self, max_running: int, max_queued: int, max_queued_bytes: int
+    ) -> None:
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_queued_bytes = max_queued_bytes
+        self.running = 0
+        self.queued = 0
+        self.queued_bytes = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_avg = INITIAL_RUN_SECONDS
+        self._heap: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+
+    def retry_after(self) -> int:
+        rounds = self.queued / self.max_running + 1
+        return min(
+            MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(self.run_seconds_avg * rounds))
+        )
+
+    def _admit(self, wait_seconds: float) -> None:
+        self.running += 1
+        self.admitted += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_running and self._heap:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.cancelled():
+                continue
+            self.queued -= 1
+            self.queued_bytes -= waiter.size
+            self._virtual_time = waiter.finish - waiter.size
+            self._admit(time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+        if len(self._last_finish) > MAX_TRACKED_CLIENTS:
+            self._last_finish = {
+                key: finish
+                for key, finish in self._last_finish.items()
+                if finish > self._virtual_time
+            }
+
+    def _release(self, run_seconds: float | None) -> None:
+        self.running -= 1
+        if run_seconds is not None:
+            self.run_seconds_avg += EWMA_ALPHA * (run_seconds - self.run_seconds_avg)
+        self._dispatch()
+
+    async def _acquire(self, client: str, size: int, reject: bool) -> None:
+        if self.running < self.max_running and not self.queued:
+            self._admit(0.0)
+            return
+        if reject and (
+            self.queued >= self.max_queued
+            or self.queued_bytes + size > self.max_queued_bytes
+        ):
+            self.rejected += 1
+            admission_rejections.inc()
+            raise HTTPException(
+                503,
+                "The validator is at capacity; try again later.",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        start = max(self._virtual_time, self._last_finish.get(client, 0.0))
+        self._last_finish[client] = start + size
+        waiter = _Waiter(
+            start + size,
+            next(self._seq),
+            size,
+            time.monotonic(),
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._heap, waiter)
+        self.queued += 1
+        self.queued_bytes += size
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                # Still queued; _dispatch skips it.
+                self.queued -= 1
+                self.queued_bytes -= size
+            else:
+                # Admitted just as the caller went away.
+                self._release(None)
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self, client: str, size: int, reject: bool = True
+    ) -> AsyncIterator[None]:
+        """Wait for a turn to validate a feed of `size` bytes for `client`.
+
+        With `reject=False` the caller always waits, for work that is already queued
+        elsewhere (e.g. jobs).
+        """
+        with stage("queue"):
+            await self._acquire(client, max(size, 1), reject)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def stats(self) -> dict[str, float]:
+        now = time.monotonic()
+        waiting = [w.enqueued_at for w in self._heap if not w.future.done()]
+        return {
+            "running": self.running,
+            "max_running": self.max_running,
+            "queued": self.queued,
+            "queued_bytes": self.queued_bytes,
+            "max_queued": self.max_queued,
+            "max_queued_bytes": self.max_queued_bytes,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "oldest_wait_seconds": round(now - min(waiting), 3) if waiting else 0.0,
+            "avg_wait_seconds": round(self.wait_seconds_total / self.admitted, 3)
+            if self.admitted
+            else 0.0,
+            "max_wait_seconds": round(self.wait_seconds_max, 3),
+            "avg_run_seconds": round(self.run_seconds_avg, 3),
+            "retry_after_seconds": self.retry_after(),
+        }
+
+
+admission = AdmissionController(
+    admission_settings.ADMISSION_MAX_RUNNING
+    or validator_settings.VALIDATOR_MAX_CONCURRENCY,
+    admission_settings.ADMISSION_MAX_QUEUED,
+    admission_settings.ADMISSION_MAX_QUEUED_BYTES,
+)
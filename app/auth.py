@@ -2,45 +2,61 @@ from fastapi import HTTPException, Header, status, Depends
 from starlette.background import BackgroundTasks
 import secrets
 import datetime
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from app.settings import app_settings, mail_settings
+import hashlib
+import functools
+from app.metrics import auth_cache_requests, stage
+from app.settings import app_settings, auth_settings, mail_settings
+from app.startup import lazy_import
+from app.storage import LazyStore, new_api_key_value
+from app.ttl_cache import TTLCache
 from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Only import Firestore-dependent functions if needed
-if not app_settings.DISABLE_EMAIL_AND_API_KEY:
-    from app.firestore_db import (
-        get_user, create_user, set_user_verified,
-        create_api_key, get_api_key_by_value,
-        create_verification_token, get_verification_token, mark_token_used
-    )
-else:
-    get_user = create_user = set_user_verified = create_api_key = get_api_key_by_value = create_verification_token = get_verification_token = mark_token_used = lambda *args, **kwargs: None
+store = LazyStore()
+
+# Verified API keys as (api_key_data, user), keyed by the SHA-256 of the presented value
+# so raw keys are never held.
+api_key_cache = TTLCache(auth_settings.AUTH_CACHE_MAX_ENTRIES, auth_settings.AUTH_CACHE_TTL_SECONDS)
+# Presented values that resolved to no valid key, keyed the same way, so that repeated
+# garbage keys do not each cost a store read (or, for legacy-shaped keys, a full scan).
+rejected_key_cache = TTLCache(
+    auth_settings.AUTH_CACHE_MAX_ENTRIES, auth_settings.AUTH_NEGATIVE_CACHE_TTL_SECONDS
+)
+
+# Returned for every request when auth is disabled, without touching the store.
+DUMMY_API_KEY = {
+    "key_id": "dummy-key",
+    "user_email": "dummy@localhost",
+    "is_active": True,
+}
 
 # Only require mail settings if email/API key is enabled
-if not app_settings.DISABLE_EMAIL_AND_API_KEY:
-    if mail_settings is None:
-        print("SETTINGS:", app_settings)
-        if app_settings.APP_ENV != "local":
-            raise RuntimeError("Mail settings must be set in non-local environments.")
-        else:
-            raise RuntimeError("Authorization is disabled in local environment.")
-
-    conf = ConnectionConfig(
+if not app_settings.DISABLE_EMAIL_AND_API_KEY and mail_settings is None:
+    print("SETTINGS:", app_settings)
+    if app_settings.APP_ENV != "local":
+        raise RuntimeError("Mail settings must be set in non-local environments.")
+    else:
+        raise RuntimeError("Authorization is disabled in local environment.")
+
+
+@functools.cache
+def mail_config():
+    """fastapi_mail's ConnectionConfig, built (and fastapi_mail imported) on first use."""
+    fastapi_mail = lazy_import("fastapi_mail")
+    return fastapi_mail.ConnectionConfig(
         MAIL_USERNAME = mail_settings.MAIL_USERNAME,
         MAIL_PASSWORD = mail_settings.MAIL_PASSWORD,
         MAIL_FROM = mail_settings.MAIL_FROM,
-        MAIL_PORT = mail_settings.MAIL_PORT,    
+        MAIL_PORT = mail_settings.MAIL_PORT,
         MAIL_SERVER = mail_settings.MAIL_SERVER,
         MAIL_STARTTLS = mail_settings.MAIL_STARTTLS,
         MAIL_SSL_TLS = mail_settings.MAIL_SSL_TLS,
         USE_CREDENTIALS = True,
         VALIDATE_CERTS = True
     )
-else:
-    conf = None
+
 
 # Example .env variables:
 # MAIL_USERNAME=your@mailjet_api_key
@@ -51,31 +67,54 @@ else:
 # MAIL_STARTTLS=True
 # MAIL_SSL_TLS=False
 
-def get_api_key(x_api_key: str = Header(None)):
+async def get_api_key(x_api_key: str = Header(None)):
     if app_settings.DISABLE_EMAIL_AND_API_KEY:
-        # Bypass: always return a dummy APIKey-like dict
-        user = get_user("dummy@localhost")
-        if not user:
-            create_user("dummy@localhost", is_verified=True)
-            user = get_user("dummy@localhost")
-        # Create a dummy API key if needed
-        dummy_key = "dummy-key"
-        api_key_data = get_api_key_by_value(dummy_key)
-        if not api_key_data:
-            create_api_key("dummy@localhost", dummy_key)
-            api_key_data = get_api_key_by_value(dummy_key)
-        return api_key_data
+        return DUMMY_API_KEY
     if not x_api_key:
         return None
-    api_key_data = get_api_key_by_value(x_api_key)
-    if not api_key_data:
+    cache_key = hashlib.sha256(x_api_key.encode()).hexdigest()
+    cached = api_key_cache.get(cache_key)
+    if cached is not None:
+        auth_cache_requests.inc("hit")
+        return cached[0]
+    if rejected_key_cache.get(cache_key) is not None:
+        auth_cache_requests.inc("hit")
         return None
-    user = get_user(api_key_data["user_email"])
-    if not user or not user.get("is_verified"):
+    auth_cache_requests.inc("miss")
+    with stage("auth"):
+        api_key_data, user = await store.resolve_api_key(x_api_key)
+    if not api_key_data or not user or not user.get("is_verified"):
+        rejected_key_cache.set(cache_key, True)
         return None
+    api_key_cache.set(cache_key, (api_key_data, user))
     return api_key_data
 
 
+def require_admin(x_admin_token: str = Header(None)) -> None:
+    """Dependency of the /admin endpoints: the X-Admin-Token header must match ADMIN_TOKEN."""
+    expected = auth_settings.ADMIN_TOKEN
+    if expected is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled.")
+    if not x_admin_token or not secrets.compare_digest(
+        x_admin_token.encode(), expected.get_secret_value().encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing admin token"
+        )
+
+
+async def revoke_key(key_id: str):
+    await store.revoke_api_key(key_id)
+    api_key_cache.pop_where(lambda entry: entry[0].get("key_id") == key_id)
+    logger.info(f"API key {key_id} revoked")
+
+
+async def remove_user(email: str):
+    await store.delete_user(email)
+    api_key_cache.pop_where(lambda entry: entry[0].get("user_email") == email.lower())
+    logger.info(f"User {email} removed")
+
+
 def get_current_user(api_key: dict = Depends(get_api_key)):
     if not api_key:
         raise HTTPException(
@@ -85,17 +124,16 @@ def get_current_user(api_key: dict = Depends(get_api_key)):
     return api_key
 
 
-def create_user_with_email(
+async def create_user_with_email(
     email: str, background_tasks: Optional[BackgroundTasks] = None
 ):
     logger.info(f"create_user_with_email called for {email}")
-    user = get_user(email)
+    user = await store.get_user(email)
     if not user:
-        create_user(email, is_verified=False)
+        user = await store.create_user(email, is_verified=False)
         logger.info(f"Created new user for {email}")
-        user = get_user(email)
     if app_settings.DISABLE_EMAIL_AND_API_KEY:
-        set_user_verified(email)
+        await store.set_user_verified(email)
         logger.info(f"Authorization disabled; user {email} auto-verified.")
         return user
     # Create and store verification token
@@ -103,7 +141,7 @@ def create_user_with_email(
     expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
         hours=24
     )
-    create_verification_token(email, token, expires_at)
+    await store.create_verification_token(email, token, expires_at)
     logger.info(f"Verification token created for {email}")
     if background_tasks:
         send_verification_email(user, token, background_tasks)
@@ -111,9 +149,9 @@ def create_user_with_email(
     return user
 
 
-def verify_email_token(token: str):
+async def verify_email_token(token: str):
     logger.info(f"verify_email_token called for token: {token}")
-    vt, token_id = get_verification_token(token)
+    vt, token_id = await store.get_verification_token(token)
     if not vt:
         logger.error(f"Invalid or expired token: {token}")
         raise HTTPException(status_code=400, detail="Invalid or expired token.")
@@ -124,13 +162,13 @@ def verify_email_token(token: str):
     if expires_at < now:
         logger.error(f"Token expired for user {vt['user_email']}")
         raise HTTPException(status_code=400, detail="Token expired.")
-    mark_token_used(token_id)
-    set_user_verified(vt["user_email"])
+    await store.mark_token_used(token_id)
+    await store.set_user_verified(vt["user_email"])
     logger.info(f"User {vt['user_email']} verified via token.")
-    api_key_value = secrets.token_urlsafe(32)
-    create_api_key(vt["user_email"], api_key_value)
+    api_key_value = new_api_key_value(secrets.token_urlsafe(32))
+    await store.create_api_key(vt["user_email"], api_key_value)
     logger.info(f"API key created for user {vt['user_email']}")
-    return get_user(vt["user_email"]), type("APIKey", (), {"key": api_key_value})
+    return await store.get_user(vt["user_email"]), type("APIKey", (), {"key": api_key_value})
 
 
 def send_verification_email(user: dict, token: str, background_tasks: BackgroundTasks):
@@ -146,12 +184,13 @@ def send_verification_email(user: dict, token: str, background_tasks: Background
     <p>This link will expire in 24 hours.</p>
     """
     recipients = [user["email"]] if "email" in user else [user.get("user_email")]
-    message = MessageSchema(
+    fastapi_mail = lazy_import("fastapi_mail")
+    message = fastapi_mail.MessageSchema(
         subject=subject,
         recipients=recipients,
         body=body,
         subtype="html",  # type: ignore[arg-type]
     )
-    fm = FastMail(conf)
+    fm = fastapi_mail.FastMail(mail_config())
     background_tasks.add_task(fm.send_message, message)
     logger.info(f"Verification email task added for {recipients}")
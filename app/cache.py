@@ -0,0 +1,259 @@
+import errno
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.settings import cache_settings, validator_settings
+
+logger = logging.getLogger(__name__)
+
+# Validator outputs kept for each cached feed.
+CACHED_FILES = ("report.json", "report.html", "system_errors.json")
+
+HASH_CHUNK_BYTES = 1024 * 1024
+_KEY = re.compile(r"[0-9a-f]{64}")
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class _Entry:
+    size: int
+    created_at: float
+
+
+class ReportCache:
+    """Size-bounded LRU cache of validator reports on local disk.
+
+    Entries are directories named by `key()`, i.e. by the SHA-256 of the feed and the
+    validator version, holding the files in CACHED_FILES. Recency survives restarts
+    through the entry directory's mtime. Entries being served are pinned: they are not
+    evicted or replaced until every pin is released, so the cache may run over its size
+    until then.
+    """
+
+    def __init__(self, root: str, max_bytes: int, ttl_seconds: int = 0) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._pins: dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(feed_sha256: str) -> str:
+        version = validator_settings.GTFS_VALIDATOR_VERSION
+        return hashlib.sha256(f"{feed_sha256}:{version}".encode()).hexdigest()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        self.root.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.root.iterdir():
+            if path.name.startswith("."):
+                # Half-written entry from a previous process.
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            if not any((path / name).exists() for name in CACHED_FILES):
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            # Counts derived files (e.g. precompressed reports) too.
+            stats = [f.stat() for f in path.iterdir() if f.is_file()]
+            size = sum(s.st_size for s in stats)
+            found.append(
+                (
+                    path.stat().st_mtime,
+                    path.name,
+                    _Entry(size, min(s.st_mtime for s in stats)),
+                )
+            )
+        for _, key, entry in sorted(found):
+            self._entries[key] = entry
+            self._bytes += entry.size
+
+    def _expired(self, entry: _Entry) -> bool:
+        return (
+            bool(self.ttl_seconds) and time.time() - entry.created_at > self.ttl_seconds
+        )
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def _shrink(self, keep: str | None = None) -> None:
+        """Evict least recently used entries, other than pinned ones and `keep`, to fit."""
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                return
+            if key != keep and key not in self._pins:
+                logger.info(f"Evicting cached report {key}")
+                self._remove(key)
+
+    def _pin(self, key: str) -> None:
+        self._pins[key] = self._pins.get(key, 0) + 1
+
+    def get(self, key: str, pin: bool = False) -> Path | None:
+        """Return the directory holding the cached reports for `key`, or None on a miss.
+
+        With `pin` the entry stays until `unpin` is called with the returned path.
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                # Still being served; it goes once it is unpinned and space is needed.
+                if key not in self._pins:
+                    self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            path = self.root / key
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self._remove(key)
+                self.hits -= 1
+                self.misses += 1
+                return None
+            if pin:
+                self._pin(key)
+            return path
+
+    def pin(self, path: Path) -> None:
+        """Pin the entry at `path` once more, if it is one; it must already be pinned."""
+        key = self.entry_id(path)
+        if key is not None:
+            with self._lock:
+                self._pin(key)
+
+    def unpin(self, path: Path) -> None:
+        """Release a pin on the entry at `path`; does nothing if `path` is not an entry."""
+        key = self.entry_id(path)
+        if key is None:
+            return
+        with self._lock:
+            pins = self._pins.get(key, 0) - 1
+            if pins > 0:
+                self._pins[key] = pins
+                return
+            self._pins.pop(key, None)
+            self._shrink()
+
+    def entry_id(self, path: Path) -> str | None:
+        """The key of the cache entry at `path`, or None if `path` is not one.
+
+        Keys double as report IDs: they name a feed's report for as long as it is cached.
+        """
+        return (
+            path.name
+            if path.parent == self.root and _KEY.fullmatch(path.name)
+            else None
+        )
+
+    def lookup(self, report_id: str, pin: bool = False) -> Path | None:
+        """`get` for an untrusted report ID."""
+        if not _KEY.fullmatch(report_id):
+            return None
+        return self.get(report_id, pin)
+
+    def put(self, key: str, work: str, pin: bool = False) -> Path | None:
+        """Move the validator outputs in `work` into the cache under `key`.
+
+        With `pin` the entry stays until `unpin` is called with the returned path.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._load()
+            staging = self.root / f".{key}-{uuid.uuid4().hex}"
+            staging.mkdir()
+            size = 0
+            for name in CACHED_FILES:
+                src = Path(work) / name
+                if not src.exists():
+                    continue
+                try:
+                    os.rename(src, staging / name)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    shutil.copyfile(src, staging / name)
+                size += (staging / name).stat().st_size
+            if size > self.max_bytes:
+                shutil.rmtree(staging, ignore_errors=True)
+                logger.info(
+                    f"Report for {key} ({size} bytes) is larger than the cache; not cached."
+                )
+                return None
+            if key in self._pins:
+                # The entry for this feed is being served; it stays, and this one goes.
+                shutil.rmtree(staging, ignore_errors=True)
+                self._entries.move_to_end(key)
+            else:
+                self._remove(key)
+                os.rename(staging, self.root / key)
+                self._entries[key] = _Entry(size, time.time())
+                self._bytes += size
+                self._shrink(keep=key)
+            if pin:
+                self._pin(key)
+            return self.root / key
+
+    def grow(self, path: Path, nbytes: int) -> None:
+        """Account for `nbytes` of derived files written into the entry at `path`, if it is one."""
+        if not nbytes or path.parent != self.root:
+            return
+        with self._lock:
+            entry = self._entries.get(path.name)
+            if entry is None:
+                return
+            entry.size += nbytes
+            self._bytes += nbytes
+            self._shrink(keep=path.name)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "pinned": len(self._pins),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+report_cache = ReportCache(
+    cache_settings.REPORT_CACHE_DIR,
+    cache_settings.REPORT_CACHE_MAX_BYTES,
+    cache_settings.REPORT_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,338 @@
+import asyncio
+import errno
+import hashlib
+import logging
+import os
+import re
+import shutil
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+
+from fastapi import HTTPException
+
+from app.settings import fetch_settings
+from app.startup import lazy_import
+from app.workspace import pid_alive
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1024 * 1024
+# Bodies of unknown size reserve scratch space this far ahead, not for every chunk.
+RESERVE_AHEAD_BYTES = 64 * 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+@dataclass
+class FetchResult:
+    sha256: str
+    size: int
+    # True when the server answered 304 and the remembered body was reused.
+    not_modified: bool = False
+
+
+@dataclass
+class _Remembered:
+    etag: str | None
+    last_modified: str | None
+    path: Path
+    size: int
+    sha256: str
+
+
+class _RangeRestart(Exception):
+    """The server stopped honouring ranges (or the feed changed) mid-download."""
+
+
+class _RememberedGone(Exception):
+    """The remembered body went away between the conditional request and its 304."""
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    try:
+        os.link(src, dest)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copyfile(src, dest)
+
+
+def _check_size(size: int | None) -> None:
+    if size is not None and size > fetch_settings.FETCH_MAX_BYTES:
+        raise HTTPException(
+            413, f"Feed is larger than the {fetch_settings.FETCH_MAX_BYTES} byte limit."
+        )
+
+
+def _total_size(content_range: str | None) -> int | None:
+    match = _CONTENT_RANGE.match(content_range or "")
+    if not match or match.group(3) == "*":
+        return None
+    return int(match.group(3))
+
+
+async def _copy_body(
+    resp: "aiohttp.ClientResponse",
+    out: BinaryIO,
+    digest=None,
+    already_written: int = 0,
+    reserve: Callable[[int], None] | None = None,
+) -> int:
+    written = 0
+    reserved = already_written
+    while chunk := await resp.content.read(CHUNK_BYTES):
+        written += len(chunk)
+        _check_size(already_written + written)
+        if reserve is not None and already_written + written > reserved:
+            reserved = min(
+                already_written + written + RESERVE_AHEAD_BYTES,
+                fetch_settings.FETCH_MAX_BYTES,
+            )
+            reserve(reserved)
+        out.write(chunk)
+        if digest is not None:
+            digest.update(chunk)
+    return written
+
+
+class FeedFetcher:
+    """Shared, connection-pooled HTTP client for remote GTFS feeds.
+
+    Bodies of feeds served with an ETag or Last-Modified header are remembered on disk,
+    so re-fetching an unchanged feed is a conditional request answered by a bodyless 304.
+    The first request asks for a byte range; when the server honours it and the feed is
+    larger than one part, the remaining parts are downloaded in parallel.
+
+    Worker processes share the store directory, but each remembers its own bodies, in
+    files named after its PID, and only ever deletes those.
+    """
+
+    def __init__(self, store_dir: str, store_max_bytes: int) -> None:
+        self.store_dir = Path(store_dir)
+        self.store_max_bytes = store_max_bytes
+        self._session: aiohttp.ClientSession | None = None
+        self._remembered: OrderedDict[str, _Remembered] = OrderedDict()
+        self._store_bytes = 0
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            aiohttp = lazy_import("aiohttp")
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=fetch_settings.FETCH_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(
+                    total=fetch_settings.FETCH_TIMEOUT_SECONDS,
+                    sock_connect=fetch_settings.FETCH_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+        return self._session
+
+    async def warm(self) -> None:
+        """Import aiohttp in a thread and create the session, ahead of the first download."""
+        await asyncio.to_thread(lazy_import, "aiohttp")
+        _ = self.session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(
+        self, url: str, dest: str, reserve: Callable[[int], None] | None = None
+    ) -> FetchResult:
+        """Download `url` to `dest`.
+
+        `reserve(nbytes)` is called before `nbytes` more are written to `dest`: once
+        with the expected size when the server gives it, otherwise in steps of
+        RESERVE_AHEAD_BYTES as the body arrives.
+        """
+        reserved = 0
+
+        def reserve_up_to(size: int) -> None:
+            nonlocal reserved
+            if reserve is not None and size > reserved:
+                reserve(size - reserved)
+                reserved = size
+
+        try:
+            try:
+                return await self._fetch_ranged(url, Path(dest), True, reserve_up_to)
+            except _RememberedGone:
+                logger.info(f"Remembered body of {url} went away; fetching it again.")
+                return await self._fetch_ranged(url, Path(dest), False, reserve_up_to)
+        except TimeoutError:
+            raise HTTPException(504, f"Timed out downloading {url}")
+        except lazy_import("aiohttp").ClientError as e:
+            raise HTTPException(400, f"Failed to download file: {e}")
+
+    async def _fetch_ranged(
+        self, url: str, dest: Path, conditional: bool, reserve: Callable[[int], None]
+    ) -> FetchResult:
+        try:
+            return await self._fetch(url, dest, True, conditional, reserve)
+        except _RangeRestart as e:
+            logger.info(
+                f"Range download of {url} abandoned ({e}); fetching in one piece."
+            )
+            return await self._fetch(url, dest, False, conditional, reserve)
+
+    async def _fetch(
+        self,
+        url: str,
+        dest: Path,
+        use_ranges: bool,
+        conditional: bool,
+        reserve: Callable[[int], None],
+    ) -> FetchResult:
+        part_bytes = fetch_settings.FETCH_RANGE_PART_BYTES
+        headers = {"Range": f"bytes=0-{part_bytes - 1}"} if use_ranges else {}
+        remembered = self._remembered.get(url) if conditional else None
+        if remembered is not None and remembered.path.exists():
+            if remembered.etag:
+                headers["If-None-Match"] = remembered.etag
+            if remembered.last_modified:
+                headers["If-Modified-Since"] = remembered.last_modified
+        else:
+            remembered = None
+
+        async with self.session.get(url, headers=headers) as resp:
+            if resp.status == 304 and remembered is not None:
+                logger.info(f"{url} not modified; reusing remembered body")
+                reserve(remembered.size)
+                try:
+                    _link_or_copy(remembered.path, dest)
+                except FileNotFoundError:
+                    # A concurrent fetch of the same URL replaced or evicted it meanwhile.
+                    if self._remembered.get(url) is remembered:
+                        self._forget(url)
+                    raise _RememberedGone()
+                if url in self._remembered:
+                    self._remembered.move_to_end(url)
+                return FetchResult(
+                    remembered.sha256, remembered.size, not_modified=True
+                )
+            if resp.status == 206:
+                total = _total_size(resp.headers.get("Content-Range"))
+                if total is None:
+                    raise _RangeRestart("unknown total size")
+            elif resp.status == 200:
+                total = resp.content_length
+            else:
+                raise HTTPException(400, f"Failed to download file: {resp.status}")
+            _check_size(total)
+            if total is not None:
+                reserve(total)
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            digest = hashlib.sha256()
+            with dest.open("wb") as out:
+                written = await _copy_body(
+                    resp, out, digest, reserve=None if total is not None else reserve
+                )
+                if resp.status == 206 and total is not None and written < total:
+                    out.truncate(total)
+
+        if resp.status == 206 and total is not None and written < total:
+            await self._fetch_ranges(url, dest, written, total, etag or last_modified)
+            with dest.open("rb") as f:
+                f.seek(written)
+                while chunk := f.read(CHUNK_BYTES):
+                    digest.update(chunk)
+            written = total
+        result = FetchResult(digest.hexdigest(), written)
+        self._remember(url, dest, etag, last_modified, result)
+        return result
+
+    async def _fetch_ranges(
+        self, url: str, dest: Path, start: int, total: int, validator: str | None
+    ) -> None:
+        part_bytes = fetch_settings.FETCH_RANGE_PART_BYTES
+        parts: list[tuple[int, int]] = [
+            (offset, min(offset + part_bytes, total) - 1)
+            for offset in range(start, total, part_bytes)
+        ]
+        slots = asyncio.Semaphore(fetch_settings.FETCH_RANGE_PARALLELISM)
+
+        async def fetch_part(first: int, last: int) -> None:
+            headers = {"Range": f"bytes={first}-{last}"}
+            if validator:
+                # A changed feed answers 200 with the full body instead of a stale part.
+                headers["If-Range"] = validator
+            async with slots, self.session.get(url, headers=headers) as resp:
+                if resp.status != 206:
+                    raise _RangeRestart(f"part {first}-{last} answered {resp.status}")
+                with dest.open("r+b") as out:
+                    out.seek(first)
+                    if await _copy_body(resp, out) != last - first + 1:
+                        raise _RangeRestart(f"short part {first}-{last}")
+
+        logger.info(
+            f"Fetching {url} in {len(parts) + 1} parallel ranges ({total} bytes)"
+        )
+        tasks = [
+            asyncio.ensure_future(fetch_part(first, last)) for first, last in parts
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _remember(
+        self,
+        url: str,
+        dest: Path,
+        etag: str | None,
+        last_modified: str | None,
+        result: FetchResult,
+    ) -> None:
+        self._forget(url)
+        if not (etag or last_modified) or result.size > self.store_max_bytes:
+            return
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        # A new name for each body: a fetch still linking the previous one finds it gone
+        # rather than replaced.
+        path = self.store_dir / f"{os.getpid()}-{uuid.uuid4().hex}"
+        _link_or_copy(dest, path)
+        self._remembered[url] = _Remembered(
+            etag, last_modified, path, result.size, result.sha256
+        )
+        self._store_bytes += result.size
+        while self._store_bytes > self.store_max_bytes:
+            self._forget(next(iter(self._remembered)))
+
+    def _forget(self, url: str) -> None:
+        remembered = self._remembered.pop(url, None)
+        if remembered is not None:
+            self._store_bytes -= remembered.size
+            remembered.path.unlink(missing_ok=True)
+
+    def clean_store(self) -> int:
+        """Delete remembered bodies of processes that no longer run; return how many."""
+        if not self.store_dir.exists():
+            return 0
+        mine = {remembered.path.name for remembered in self._remembered.values()}
+        removed = 0
+        for path in self.store_dir.iterdir():
+            pid, _, _ = path.name.partition("-")
+            if pid.isdigit() and int(pid) != os.getpid() and pid_alive(int(pid)):
+                continue
+            if path.name in mine:
+                continue
+            path.unlink(missing_ok=True)
+            removed += 1
+        if removed:
+            logger.info(f"Removed {removed} remembered bodies left in {self.store_dir}")
+        return removed
+
+
+fetcher = FeedFetcher(
+    fetch_settings.FETCH_STORE_DIR, fetch_settings.FETCH_STORE_MAX_BYTES
+)
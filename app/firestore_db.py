@@ -4,35 +4,18 @@ os.environ["FIRESTORE_EMULATOR_HOST"] = os.environ.get(
     "FIRESTORE_EMULATOR_HOST", "localhost:8081"
 )
 from google.cloud import firestore
+import asyncio
 import bcrypt
 import uuid
 import datetime
 
-# Firestore client (uses emulator if FIRESTORE_EMULATOR_HOST is set)
-db = firestore.Client()
+from app.storage import is_legacy_key, parse_key_id
 
+# Firestore accepts at most this many writes per batch.
+BATCH_MAX_WRITES = 500
+USAGE_COUNTERS = ("validations", "bytes", "cpu_seconds")
 
-# --- User helpers ---
-def get_user(email: str):
-    doc = db.collection("users").document(email.lower()).get()
-    return doc.to_dict() if doc.exists else None
 
-
-def create_user(email: str, is_verified: bool = False):
-    user_data = {
-        "email": email,  # Store the email address explicitly
-        "is_verified": is_verified,
-        "created_at": datetime.datetime.now(datetime.timezone.utc),
-    }
-    db.collection("users").document(email.lower()).set(user_data)
-    return user_data
-
-
-def set_user_verified(email: str):
-    db.collection("users").document(email.lower()).update({"is_verified": True})
-
-
-# --- API Key helpers ---
 def hash_api_key(api_key: str) -> str:
     return bcrypt.hashpw(api_key.encode(), bcrypt.gensalt()).decode()
 
@@ -41,59 +24,153 @@ def verify_api_key_hash(api_key: str, key_hash: str) -> bool:
     return bcrypt.checkpw(api_key.encode(), key_hash.encode())
 
 
-def create_api_key(email: str, api_key: str):
-    key_hash = hash_api_key(api_key)
-    key_id = str(uuid.uuid4())
-    data = {
-        "user_email": email.lower(),
-        "key_hash": key_hash,
-        "created_at": datetime.datetime.now(datetime.timezone.utc),
-        "is_active": True,
-    }
-    db.collection("api_keys").document(key_id).set(data)
-    return key_id
-
-
-def get_api_key_by_value(api_key: str):
-    # Search all api_keys for a matching hash (slow, but ok for small scale)
-    keys = db.collection("api_keys").where("is_active", "==", True).stream()
-    for doc in keys:
-        data = doc.to_dict()
-        if verify_api_key_hash(api_key, data["key_hash"]):
-            return data
-    return None
-
-
-# --- Verification Token helpers ---
-def create_verification_token(email: str, token: str, expires_at: datetime.datetime):
-    token_id = str(uuid.uuid4())
-    # Ensure expires_at is aware
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
-    data = {
-        "user_email": email.lower(),
-        "token": token,
-        "created_at": datetime.datetime.now(datetime.timezone.utc),
-        "expires_at": expires_at,
-        "is_used": False,
-    }
-    db.collection("verification_tokens").document(token_id).set(data)
-    return token_id
-
-
-def get_verification_token(token: str):
-    # Search for token (should be indexed for scale)
-    tokens = (
-        db.collection("verification_tokens")
-        .where("token", "==", token)
-        .where("is_used", "==", False)
-        .stream()
-    )
-    for doc in tokens:
-        data = doc.to_dict()
-        return data, doc.id
-    return None, None
-
-
-def mark_token_used(token_id: str):
-    db.collection("verification_tokens").document(token_id).update({"is_used": True})
+def _now():
+    return datetime.datetime.now(datetime.UTC)
+
+
+class FirestoreStore:
+    """Store backed by Firestore's AsyncClient (uses emulator if FIRESTORE_EMULATOR_HOST is set).
+
+    bcrypt runs in a worker thread so it never blocks the event loop, and independent
+    reads are issued together rather than one after another.
+    """
+
+    def __init__(self) -> None:
+        self.db = firestore.AsyncClient()
+
+    # --- User helpers ---
+    async def get_user(self, email: str):
+        doc = await self.db.collection("users").document(email.lower()).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def create_user(self, email: str, is_verified: bool = False):
+        user_data = {
+            "email": email,  # Store the email address explicitly
+            "is_verified": is_verified,
+            "created_at": _now(),
+        }
+        await self.db.collection("users").document(email.lower()).set(user_data)
+        return user_data
+
+    async def set_user_verified(self, email: str):
+        await (
+            self.db.collection("users")
+            .document(email.lower())
+            .update({"is_verified": True})
+        )
+
+    async def delete_user(self, email: str):
+        await self.db.collection("users").document(email.lower()).delete()
+
+    # --- API Key helpers ---
+    async def create_api_key(self, email: str, api_key: str):
+        key_hash = await asyncio.to_thread(hash_api_key, api_key)
+        key_id = parse_key_id(api_key) or str(uuid.uuid4())
+        data = {
+            "user_email": email.lower(),
+            "key_hash": key_hash,
+            "created_at": _now(),
+            "is_active": True,
+        }
+        await self.db.collection("api_keys").document(key_id).set(data)
+        return key_id
+
+    async def resolve_api_key(self, api_key: str):
+        """Return (api_key_data, user) for a valid, active key, else (None, None)."""
+        key_id = parse_key_id(api_key)
+        if key_id:
+            doc = await self.db.collection("api_keys").document(key_id).get()
+            data = doc.to_dict() if doc.exists else None
+            if data is None or not data.get("is_active"):
+                return None, None
+            # The user read overlaps the (deliberately slow) hash check.
+            valid, user = await asyncio.gather(
+                asyncio.to_thread(verify_api_key_hash, api_key, data["key_hash"]),
+                self.get_user(data["user_email"]),
+            )
+            return ({**data, "key_id": doc.id}, user) if valid else (None, None)
+        if not is_legacy_key(api_key):
+            return None, None
+        # Keys issued before key IDs were embedded: search all active keys (slow, but ok for small scale)
+        query = self.db.collection("api_keys").where("is_active", "==", True)
+        async for doc in query.stream():
+            data = doc.to_dict()
+            if data is None:
+                continue
+            if await asyncio.to_thread(verify_api_key_hash, api_key, data["key_hash"]):
+                return {**data, "key_id": doc.id}, await self.get_user(
+                    data["user_email"]
+                )
+        return None, None
+
+    async def revoke_api_key(self, key_id: str):
+        await (
+            self.db.collection("api_keys").document(key_id).update({"is_active": False})
+        )
+
+    # --- Verification Token helpers ---
+    async def create_verification_token(
+        self, email: str, token: str, expires_at: datetime.datetime
+    ):
+        token_id = str(uuid.uuid4())
+        # Ensure expires_at is aware
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=datetime.UTC)
+        data = {
+            "user_email": email.lower(),
+            "token": token,
+            "created_at": _now(),
+            "expires_at": expires_at,
+            "is_used": False,
+        }
+        await self.db.collection("verification_tokens").document(token_id).set(data)
+        return token_id
+
+    async def get_verification_token(self, token: str):
+        # Search for token (should be indexed for scale)
+        tokens = (
+            self.db.collection("verification_tokens")
+            .where("token", "==", token)
+            .where("is_used", "==", False)
+            .limit(1)
+        )
+        async for doc in tokens.stream():
+            return doc.to_dict(), doc.id
+        return None, None
+
+    async def mark_token_used(self, token_id: str):
+        await (
+            self.db.collection("verification_tokens")
+            .document(token_id)
+            .update({"is_used": True})
+        )
+
+    # --- Usage helpers ---
+    async def add_usage(self, period: str, deltas: dict[str, dict[str, float]]):
+        """Add each key's counters to its usage document for `period`, in batched writes."""
+        items = list(deltas.items())
+        for start in range(0, len(items), BATCH_MAX_WRITES):
+            batch = self.db.batch()
+            for key_id, delta in items[start : start + BATCH_MAX_WRITES]:
+                doc = self.db.collection("usage").document(f"{key_id}_{period}")
+                fields = {
+                    name: firestore.Increment(value) for name, value in delta.items()
+                }
+                batch.set(
+                    doc,
+                    {
+                        **fields,
+                        "key_id": key_id,
+                        "period": period,
+                        "updated_at": _now(),
+                    },
+                    merge=True,
+                )
+            await batch.commit()
+
+    async def get_usage(self, key_id: str, period: str):
+        doc = await self.db.collection("usage").document(f"{key_id}_{period}").get()
+        data = doc.to_dict() if doc.exists else None
+        if data is None:
+            return None
+        return {name: data.get(name, 0) for name in USAGE_COUNTERS}
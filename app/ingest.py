@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+
+from app.settings import upload_settings
+
+
+def _write(out: BinaryIO, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def stream_upload(file: UploadFile, dest: str) -> str:
+    """Copy `file` to `dest` in fixed-size chunks and return its SHA-256.
+
+    Memory use is one chunk regardless of the feed size; the upload is rejected
+    with a 413 as soon as it grows past UPLOAD_MAX_BYTES. The file is opened, written
+    and hashed in threads, off the event loop.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    out = await asyncio.to_thread(Path(dest).open, "wb")
+    try:
+        while chunk := await file.read(upload_settings.UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > upload_settings.UPLOAD_MAX_BYTES:
+                raise HTTPException(
+                    413,
+                    f"GTFS feed is larger than the {upload_settings.UPLOAD_MAX_BYTES} byte limit.",
+                )
+            await asyncio.to_thread(_write, out, digest, chunk)
+    finally:
+        await asyncio.to_thread(out.close)
+    return digest.hexdigest()
+
+
+def check_feed_archive(path: str) -> None:
+    """Reject files that are not zips, or whose central directory looks like a zip bomb.
+
+    Only the central directory is read, so this costs milliseconds even for large feeds.
+    """
+    compressed = Path(path).stat().st_size
+    try:
+        with zipfile.ZipFile(path) as archive:
+            entries = archive.infolist()
+    except (zipfile.BadZipFile, OSError):
+        raise HTTPException(400, "GTFS feed must be a valid .zip archive.")
+    uncompressed = sum(entry.file_size for entry in entries)
+    if uncompressed > upload_settings.FEED_MAX_UNCOMPRESSED_BYTES:
+        raise HTTPException(
+            413,
+            f"GTFS feed expands to {uncompressed} bytes, more than the "
+            f"{upload_settings.FEED_MAX_UNCOMPRESSED_BYTES} byte limit.",
+        )
+    if uncompressed / max(compressed, 1) > upload_settings.FEED_MAX_COMPRESSION_RATIO:
+        raise HTTPException(
+            400,
+            f"GTFS feed compression ratio exceeds {upload_settings.FEED_MAX_COMPRESSION_RATIO:g}:1.",
+        )
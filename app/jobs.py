@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from fastapi import HTTPException
+
+from app.cache import sha256_file
+from app.pipeline import download_file, validate_in_background
+from app.settings import job_settings
+from app.workspace import pid_alive
+
+logger = logging.getLogger(__name__)
+
+# Reserved by new_job while its feed is uploaded; not visible through the API.
+RECEIVING = "receiving"
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+VALIDATING = "validating"
+DONE = "done"
+FAILED = "failed"
+UNFINISHED = (QUEUED, DOWNLOADING, VALIDATING)
+
+# Longest pause between sweeps for expired jobs.
+REAP_INTERVAL_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    url TEXT,
+    feed_sha256 TEXT,
+    client TEXT,
+    key_id TEXT,
+    report_id TEXT,
+    error TEXT,
+    status_code INTEGER,
+    cache_status TEXT,
+    owner INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+# Columns added since the table was first created, for databases made before them.
+_ADDED_COLUMNS = {"key_id": "TEXT", "report_id": "TEXT", "owner": "INTEGER"}
+
+
+class JobQueue:
+    """Validation jobs run by background workers, persisted in SQLite.
+
+    Each job has a directory under `jobs_dir` holding its feed and, once done, its
+    reports. Worker processes sharing the database claim a job by recording their PID
+    as its owner, so each job runs once. Jobs owned by processes that are gone are
+    queued again on start.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        jobs_dir: str,
+        workers: int,
+        max_pending: int,
+        result_ttl: int,
+    ) -> None:
+        self.db_path = db_path
+        self.jobs_dir = Path(jobs_dir)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.jobs_dir.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                self.db_path, check_same_thread=False, isolation_level=None
+            )
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for name, type_ in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {type_}")
+            self._db = db
+        return self._db
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def new_job(self) -> str:
+        """Reserve a job ID and its directory; the job runs once `submit` is called."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        # Recorded before the directory exists, so no other process takes it for an orphan.
+        self._execute(
+            "INSERT INTO jobs (id, status, owner, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, RECEIVING, os.getpid(), now, now),
+        )
+        self.job_dir(job_id).mkdir(parents=True)
+        return job_id
+
+    def discard(self, job_id: str) -> None:
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def submit(
+        self,
+        job_id: str,
+        url: str | None = None,
+        feed_sha256: str | None = None,
+        client: str = "",
+        key_id: str | None = None,
+    ) -> None:
+        """Queue `job_id`, which validates `url`, or the feed already in its directory."""
+        pending = self._execute(
+            f"SELECT COUNT(*) FROM jobs WHERE status IN ({','.join('?' * len(UNFINISHED))})",
+            UNFINISHED,
+        )[0][0]
+        if pending >= self.max_pending:
+            raise HTTPException(503, "Too many pending jobs; try again later.")
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, url = ?, feed_sha256 = ?, client = ?, key_id = ?,"
+            " owner = NULL, created_at = ?, updated_at = ? WHERE id = ?",
+            (QUEUED, url, feed_sha256, client, key_id, now, now, job_id),
+        )
+        self._queue.put_nowait(job_id)
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        rows = self._execute(
+            "SELECT * FROM jobs WHERE id = ? AND status != ?", (job_id, RECEIVING)
+        )
+        if not rows:
+            return None
+        job = dict(rows[0])
+        if (
+            job["finished_at"] is not None
+            and job["finished_at"] + self.result_ttl < time.time()
+        ):
+            return None
+        return job
+
+    def _set_status(self, job_id: str, status: str, **fields: Any) -> None:
+        fields["status"] = status
+        fields["updated_at"] = time.time()
+        if status in (DONE, FAILED):
+            fields["finished_at"] = fields["updated_at"]
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(
+            f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+        )
+
+    def _claim(self, job_id: str) -> bool:
+        """Take a queued job for this process; False if another process already has."""
+        with self._lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET owner = ?, updated_at = ? WHERE id = ? AND status = ? AND owner IS NULL",
+                (os.getpid(), time.time(), job_id, QUEUED),
+            )
+            return cursor.rowcount == 1
+
+    async def _run(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        work = self.job_dir(job_id)
+        feed = work / "feed.zip"
+        if job["url"]:
+            self._set_status(job_id, DOWNLOADING)
+            feed_sha256 = (await download_file(job["url"], str(feed))).sha256
+        elif feed.exists():
+            feed_sha256 = job["feed_sha256"] or await asyncio.to_thread(
+                sha256_file, str(feed)
+            )
+        else:
+            raise HTTPException(500, "The uploaded feed was lost.")
+        cache_status, report_id, _ = await validate_in_background(
+            feed,
+            feed_sha256,
+            job["client"] or "",
+            job["key_id"],
+            on_validating=lambda: self._set_status(job_id, VALIDATING),
+        )
+        self._set_status(job_id, DONE, cache_status=cache_status, report_id=report_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            if not self._claim(job_id):
+                self._queue.task_done()
+                continue
+            try:
+                await self._run(job_id)
+                logger.info(f"Job {job_id} done.")
+            except HTTPException as e:
+                logger.info(f"Job {job_id} failed: {e.detail}")
+                self._set_status(
+                    job_id, FAILED, error=str(e.detail), status_code=e.status_code
+                )
+            except Exception as e:  # noqa: BLE001  (whatever went wrong, the job ends as failed)
+                logger.error(f"Job {job_id} failed: {e}")
+                self._set_status(
+                    job_id, FAILED, error="Internal error.", status_code=500
+                )
+            finally:
+                self._queue.task_done()
+
+    def reap(self) -> int:
+        """Delete finished jobs older than the result TTL; return how many went."""
+        cutoff = time.time() - self.result_ttl
+        rows = self._execute("SELECT id FROM jobs WHERE finished_at < ?", (cutoff,))
+        for row in rows:
+            self.discard(row["id"])
+        return len(rows)
+
+    async def _reaper(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.result_ttl, REAP_INTERVAL_SECONDS))
+            try:
+                await asyncio.to_thread(self.reap)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Reaping expired jobs failed: {e}")
+
+    def _owner_gone(self, owner: int | None) -> bool:
+        # Nothing has been claimed yet by this process, so its own PID is a previous one's.
+        return owner is not None and (owner == os.getpid() or not pid_alive(owner))
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        statuses = (RECEIVING, *UNFINISHED)
+        owned = self._execute(
+            f"SELECT id, status, owner FROM jobs WHERE status IN ({','.join('?' * len(statuses))})"
+            " AND owner IS NOT NULL",
+            statuses,
+        )
+        requeued = 0
+        for row in owned:
+            if not self._owner_gone(row["owner"]):
+                continue
+            if row["status"] == RECEIVING:
+                # Abandoned upload.
+                self.discard(row["id"])
+                continue
+            requeued += len(
+                self._execute(
+                    "UPDATE jobs SET status = ?, owner = NULL, updated_at = ? WHERE id = ? AND owner = ?"
+                    " RETURNING id",
+                    (QUEUED, time.time(), row["id"], row["owner"]),
+                )
+            )
+        if requeued:
+            logger.info(
+                f"Requeued {requeued} jobs left unfinished by processes that are gone."
+            )
+        # Other processes may also queue these; whichever claims a job first runs it.
+        for row in self._execute(
+            "SELECT id FROM jobs WHERE status = ? AND owner IS NULL ORDER BY created_at",
+            (QUEUED,),
+        ):
+            self._queue.put_nowait(row["id"])
+        # Reports and feeds of jobs that no longer exist. A directory is only created once
+        # its job's row is in, so this never takes another process's new job.
+        known = {row["id"] for row in self._execute("SELECT id FROM jobs")}
+        for path in self.jobs_dir.iterdir():
+            if path.name not in known:
+                shutil.rmtree(path, ignore_errors=True)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+jobs = JobQueue(
+    job_settings.JOBS_DB_PATH,
+    job_settings.JOBS_DIR,
+    job_settings.JOB_WORKERS,
+    job_settings.JOB_MAX_PENDING,
+    job_settings.JOB_RESULT_TTL_SECONDS,
+)
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from app.jvm_profile import cds_archive
+from app.settings import validator_settings
+from app.validator import (
+    DisconnectCheck,
+    java_options,
+    kill_process_group,
+    raise_for_kill_reason,
+    supervise,
+)
+
+logger = logging.getLogger(__name__)
+
+WORKER_CLASS = "ValidatorWorker"
+
+
+class WorkerUnavailable(Exception):
+    """A pooled JVM could not be started; the caller should use the one-shot path."""
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class JvmWorker:
+    """One long-lived JVM running jvm/ValidatorWorker.java.
+
+    Jobs are sent as `<input>\\t<output>` lines on stdin; the worker answers `OK` or
+    `ERR <message>` on stdout. Validator logging goes to our stderr.
+    """
+
+    def __init__(self) -> None:
+        self.proc: asyncio.subprocess.Process | None = None
+        self.jobs = 0
+        self.broken = False
+
+    @property
+    def pid(self) -> int:
+        assert self.proc is not None
+        return self.proc.pid
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.proc is not None and self.proc.returncode is None and not self.broken
+        )
+
+    async def start(self) -> None:
+        classpath = os.pathsep.join(
+            [validator_settings.VALIDATOR_JAR, validator_settings.JVM_WORKER_CLASSPATH]
+        )
+        self.proc = await asyncio.create_subprocess_exec(
+            validator_settings.JAVA_BIN,
+            *java_options(),
+            *cds_archive.options_if_present(),
+            # Lets the worker trap System.exit() calls made by the validator CLI.
+            "-Djava.security.manager=allow",
+            "-cp",
+            classpath,
+            WORKER_CLASS,
+            validator_settings.VALIDATOR_JAR,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        assert self.proc.stdout is not None
+        try:
+            ready = await asyncio.wait_for(
+                self.proc.stdout.readline(),
+                timeout=validator_settings.JVM_POOL_START_TIMEOUT_SECONDS,
+            )
+        except TimeoutError:
+            ready = b""
+        if ready.strip() != b"READY":
+            self.kill()
+            raise WorkerUnavailable("JVM worker did not report READY")
+        logger.info(f"JVM worker pid={self.pid} ready")
+
+    async def run(self, feed_path: str, work: str) -> None:
+        assert self.proc is not None and self.proc.stdin and self.proc.stdout
+        self.jobs += 1
+        try:
+            self.proc.stdin.write(f"{feed_path}\t{work}\n".encode())
+            await self.proc.stdin.drain()
+            reply = (await self.proc.stdout.readline()).decode().rstrip("\n")
+        except (BrokenPipeError, ConnectionResetError):
+            reply = ""
+        if not reply:
+            self.broken = True
+            raise WorkerCrashed(f"JVM worker pid={self.pid} exited during validation")
+        if reply != "OK":
+            raise HTTPException(500, reply.removeprefix("ERR").strip())
+
+    def kill(self) -> None:
+        self.broken = True
+        if self.proc is not None and self.proc.returncode is None:
+            kill_process_group(self.proc.pid)
+
+    async def stop(self) -> None:
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        # Closing stdin makes the worker's read loop end and the JVM exit.
+        if self.proc.stdin is not None:
+            self.proc.stdin.close()
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout=10)
+        except TimeoutError:
+            self.kill()
+            await self.proc.wait()
+
+
+class JvmWorkerPool:
+    def __init__(self, size: int, max_jobs: int) -> None:
+        self.size = size
+        self.max_jobs = max_jobs
+        self._idle: list[JvmWorker] = []
+        self._slots = asyncio.Semaphore(size)
+        self._retiring: set = set()
+
+    @staticmethod
+    def available() -> bool:
+        return (
+            Path(validator_settings.JVM_WORKER_CLASSPATH) / f"{WORKER_CLASS}.class"
+        ).exists()
+
+    async def _spawn(self) -> JvmWorker:
+        worker = JvmWorker()
+        await worker.start()
+        return worker
+
+    async def start(self) -> None:
+        """Warm up the pool so the first validations don't pay for JVM startup."""
+        if not self.available():
+            logger.warning(
+                f"{WORKER_CLASS}.class not found in {validator_settings.JVM_WORKER_CLASSPATH}; "
+                "validations will use the one-shot validator."
+            )
+            return
+        results = await asyncio.gather(
+            *(self._spawn() for _ in range(self.size - len(self._idle))),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, JvmWorker):
+                self._idle.append(result)
+            else:
+                logger.warning(f"Could not start JVM worker: {result}")
+
+    def _retire(self, worker: JvmWorker) -> None:
+        task = asyncio.create_task(worker.stop())
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    def _checkout(self) -> JvmWorker | None:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                return worker
+            self._retire(worker)
+        return None
+
+    async def validate(
+        self, feed_path: str, work: str, is_disconnected: DisconnectCheck | None = None
+    ) -> None:
+        async with self._slots:
+            worker = self._checkout() or await self._spawn()
+            job = asyncio.ensure_future(worker.run(feed_path, work))
+            try:
+                reason = await supervise(worker.pid, job, is_disconnected)
+                if reason:
+                    worker.broken = True
+                raise_for_kill_reason(reason)
+                try:
+                    job.result()
+                except WorkerCrashed as e:
+                    raise HTTPException(500, str(e))
+            except asyncio.CancelledError:
+                worker.kill()
+                raise
+            finally:
+                if worker.alive and worker.jobs < self.max_jobs:
+                    self._idle.append(worker)
+                else:
+                    logger.info(
+                        f"Recycling JVM worker pid={worker.pid} after {worker.jobs} jobs"
+                    )
+                    self._retire(worker)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(worker.stop() for worker in idle), *self._retiring)
+
+
+pool = JvmWorkerPool(
+    validator_settings.JVM_POOL_SIZE, validator_settings.JVM_POOL_MAX_JOBS
+)
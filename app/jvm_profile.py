@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+import zipfile
+from pathlib import Path
+
+from app.settings import validator_settings
+
+logger = logging.getLogger(__name__)
+
+# Share of the memory budget handed to the JVM heap; the rest covers metaspace, threads and code cache.
+HEAP_FRACTION = 0.75
+# cgroup v2, then v1. v1 reports "no limit" as a huge number.
+CGROUP_MEMORY_LIMITS = (
+    "/sys/fs/cgroup/memory.max",
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+)
+UNLIMITED_BYTES = 1 << 60
+MB = 1024 * 1024
+
+
+def container_memory_limit_mb() -> int | None:
+    """The container's memory limit from its cgroup, or None when unlimited or unknown."""
+    for path in CGROUP_MEMORY_LIMITS:
+        try:
+            value = Path(path).read_text().strip()
+        except OSError:
+            continue
+        if value == "max":
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            continue
+        return limit // MB if limit < UNLIMITED_BYTES else None
+    return None
+
+
+def memory_budget_mb() -> int | None:
+    """Memory one validator JVM may use.
+
+    VALIDATOR_MEMORY_LIMIT_MB when set; otherwise the container limit, less what the
+    API itself needs, shared by the validators that may run at once.
+    """
+    if validator_settings.VALIDATOR_MEMORY_LIMIT_MB:
+        return validator_settings.VALIDATOR_MEMORY_LIMIT_MB
+    limit = container_memory_limit_mb()
+    if limit is None:
+        return None
+    jvms = max(validator_settings.VALIDATOR_MAX_CONCURRENCY, 1)
+    if validator_settings.VALIDATOR_MODE == "pool":
+        jvms = max(jvms, validator_settings.JVM_POOL_SIZE)
+    return max((limit - validator_settings.JVM_RESERVED_MB) // jvms, 64)
+
+
+def feed_size_mb(feed_path: str) -> float:
+    """Uncompressed size of a feed, from the zip's central directory."""
+    try:
+        with zipfile.ZipFile(feed_path) as archive:
+            return sum(info.file_size for info in archive.infolist()) / MB
+    except (zipfile.BadZipFile, OSError):
+        return os.path.getsize(feed_path) / MB if os.path.exists(feed_path) else 0.0
+
+
+def heap_options(feed_mb: float | None) -> list[str]:
+    """-Xmx from the memory budget, so large feeds fail with an OutOfMemoryError in the
+    JVM rather than an OOM kill of the container; -Xms from the feed size, so large feeds
+    don't spend their first seconds growing the heap."""
+    options = []
+    budget = memory_budget_mb()
+    max_heap = int(budget * HEAP_FRACTION) if budget else None
+    if max_heap:
+        options.append(f"-Xmx{max_heap}m")
+    if feed_mb is not None:
+        initial = (
+            validator_settings.JVM_HEAP_BASE_MB
+            + feed_mb * validator_settings.JVM_HEAP_MB_PER_FEED_MB
+        )
+        if max_heap:
+            initial = min(initial, max_heap)
+        options.append(f"-Xms{int(initial)}m")
+    return options
+
+
+def runtime_options(feed_mb: float | None) -> list[str]:
+    """GC and JIT flags. Small feeds finish in a few seconds, where the serial collector
+    and C1-only compilation cost less than they lose; larger ones keep the defaults."""
+    if feed_mb is None or feed_mb > validator_settings.JVM_SMALL_FEED_MB:
+        return []
+    return ["-XX:+UseSerialGC", "-XX:TieredStopAtLevel=1"]
+
+
+class CdsArchive:
+    """Class-data-sharing archive of the validator's classes.
+
+    Used when the file exists. Otherwise, with `auto_create`, one run at a time records
+    the classes it loads into a temporary file (-XX:ArchiveClassesAtExit), which becomes
+    the archive once that run succeeds.
+    """
+
+    def __init__(self, path: str, auto_create: bool) -> None:
+        self.path = Path(path) if path else None
+        self.auto_create = auto_create
+        self._creating = False
+        self._lock = threading.Lock()
+
+    def options_if_present(self) -> list[str]:
+        """Options that use the archive, without ever creating it (e.g. for pooled JVMs,
+        whose classpath extends the one the archive was recorded with)."""
+        if self.path is None or not self.path.exists():
+            return []
+        return [f"-XX:SharedArchiveFile={self.path}"]
+
+    def options(self) -> tuple[list[str], Path | None]:
+        """JVM options for the next run, and the temporary archive it writes, if any."""
+        if self.path is None or self.path.exists() or not self.auto_create:
+            return self.options_if_present(), None
+        with self._lock:
+            if self._creating:
+                return [], None
+            self._creating = True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        return [f"-XX:ArchiveClassesAtExit={tmp}"], tmp
+
+    def finish(self, tmp: Path | None, ok: bool) -> None:
+        """Keep the archive written by a run if the run succeeded."""
+        if tmp is None:
+            return
+        try:
+            # `tmp` is only handed out when there is an archive path to keep it at.
+            if ok and self.path is not None and tmp.exists():
+                os.replace(tmp, self.path)
+                logger.info(f"Created class-data-sharing archive {self.path}")
+            else:
+                tmp.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not keep class-data-sharing archive: {e}")
+        finally:
+            self._creating = False
+
+
+cds_archive = CdsArchive(
+    validator_settings.JVM_CDS_ARCHIVE, validator_settings.JVM_CDS_AUTO_CREATE
+)
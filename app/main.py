@@ -9,31 +9,117 @@ from fastapi import (
     Request,
     Depends,
 )
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from slowapi.util import get_remote_address
 from typing import Optional
-import subprocess
-import tempfile
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import datetime
+from dataclasses import dataclass
+import time
 import json
-import aiohttp
-import markdown  # type: ignore
 from pathlib import Path
-from starlette.background import BackgroundTasks
+from starlette.background import BackgroundTask, BackgroundTasks
 import re
 import logging
 
 from app.rate_limit import limiter, rate_limit_exceeded_handler
-from app.auth import get_api_key, create_user_with_email, verify_email_token
-from app.settings import app_settings, rate_limit_settings
+from app import startup
+from app.auth import (
+    get_api_key,
+    create_user_with_email,
+    mail_config,
+    verify_email_token,
+    remove_user,
+    require_admin,
+    revoke_key,
+    store as auth_store,
+)
+from app.settings import (
+    app_settings,
+    batch_settings,
+    rate_limit_settings,
+    upload_settings,
+    validator_settings,
+)
+from app.admission import admission, client_id
+from app.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    Gauge,
+    cache_requests,
+    log_request,
+    registry,
+    stage,
+    start_request,
+)
+from app.jvm_pool import pool as jvm_pool
+from app.cache import report_cache
+from app.ingest import stream_upload
+from app.reports import (
+    choose_encoding,
+    iter_notices,
+    precompressed,
+    stream_errors,
+    stream_inline,
+    stream_ndjson,
+)
+from app.fetch import fetcher
+from app.pipeline import download_file, validate_shared
+from app.workspace import workspace
+from app.jobs import DONE, FAILED, jobs
+from app.watchlist import watchlist
+from app.report_diff import diff_summaries, load_summary
+from app.notice_index import ensure_index, query_notices, summarize_notices
+from app.usage import key_id_of, usage as usage_tracker
+from app.readme import (
+    ReadmePage,
+    etag_matches,
+    get_md_intro,
+    get_md_section,
+    read_readme,
+    render_markdown,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(workspace.start)
+    await asyncio.to_thread(fetcher.clean_store)
+    await jobs.start()
+    usage_tracker.start()
+    watchlist.start()
+    # Clients and caches are warmed up in the background, so the service answers
+    # (e.g. /health) as soon as it is imported; anything not warm yet is set up on first use.
+    steps = {
+        "store": auth_store.warm,
+        "http client": fetcher.warm,
+        "landing page": lambda: asyncio.to_thread(landing_page.get),
+    }
+    if not app_settings.DISABLE_EMAIL_AND_API_KEY:
+        steps["mail"] = lambda: asyncio.to_thread(mail_config)
+    if validator_settings.VALIDATOR_MODE == "pool":
+        steps["jvm pool"] = jvm_pool.start
+    warm_up = asyncio.create_task(startup.warm_up(steps))
+    startup.mark("serving")
+    yield
+    warm_up.cancel()
+    await asyncio.gather(warm_up, return_exceptions=True)
+    await watchlist.close()
+    await jobs.close()
+    await usage_tracker.close()
+    await fetcher.close()
+    await jvm_pool.close()
+    await asyncio.to_thread(workspace.close)
 
-JAR = "/opt/gtfs-validator.jar"
 
 app = FastAPI(
     title="GTFS Validator API",
     version="1.0.0-beta.1",
     description="API wrapper for MobilityData GTFS Validator",
     docs_url="/docs",
+    lifespan=lifespan,
 )
 
 # Add slowapi middleware and exception handler
@@ -47,6 +133,46 @@ templates = Jinja2Templates(directory="app/templates")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Multipart framing on top of the feed itself.
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+# Routes whose body holds several feeds; UPLOAD_MAX_BYTES applies to each of them instead.
+MULTI_FEED_ROUTES = ("/validate/batch",)
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse an oversized upload from its Content-Length, before the body is received.
+    content_length = request.headers.get("content-length")
+    if (
+        request.method == "POST"
+        and request.url.path not in MULTI_FEED_ROUTES
+        and content_length
+        and content_length.isdigit()
+        and int(content_length) > upload_settings.UPLOAD_MAX_BYTES + UPLOAD_OVERHEAD_BYTES
+    ):
+        return JSONResponse(
+            {"detail": f"Request body is larger than the {upload_settings.UPLOAD_MAX_BYTES} byte limit."},
+            status_code=413,
+        )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stages = start_request()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        log_request(
+            request.method, getattr(route, "path", "other"), status, time.perf_counter() - started, stages
+        )
+
+
 # Helper: conditional decorator for rate limiting
 def conditional_rate_limit(limit_str, key_func):
     def decorator(func):
@@ -55,30 +181,9 @@ def conditional_rate_limit(limit_str, key_func):
         return limiter.limit(limit_str, key_func=key_func)(func)
     return decorator
 
-def get_md_intro(readme_md: str) -> str:
-    # Extract from # heading to the next '##' (not including subheadings)
-    pattern = r"^# .+?(?=^## |\Z)"
-    match = re.search(pattern, readme_md, re.DOTALL | re.MULTILINE)
-    if match:
-        return match.group(0).strip()
-    return ""
-
-def get_md_section(readme_md: str, heading: str) -> str:
-    pattern = re.escape(heading) + r"(.*?)(?=^## [^#]|^# |\Z)"
-    match = re.search(pattern, readme_md, re.DOTALL | re.MULTILINE)
-    if match:
-        return heading + "\n\n" + match.group(1).strip()
-    return ""
-
-@app.get("/", response_class=HTMLResponse)
-def landing(request: Request):
-    client_host = getattr(request.client, "host", "unknown")
-    logger.info(f"Landing page accessed from {client_host}")
-    readme_path = Path(__file__).parent.parent / "README.md"
-
+def render_landing() -> str:
     try:
-        readme_md = readme_path.read_text(encoding="utf-8")
-        readme_md = readme_md.replace("<YOUR-GATEWAY-URL>", app_settings.BASE_URL)
+        readme_md = read_readme()
         sections = [ get_md_intro(readme_md) ]
         include_headings = [
             "## Endpoint Reference",
@@ -89,20 +194,52 @@ def landing(request: Request):
             sections.append(get_md_section(readme_md, heading))
 
         combined_md = "\n\n".join(sections)
-        readme_html = markdown.markdown(combined_md, extensions=["fenced_code", "tables"])
+        readme_html = render_markdown(combined_md)
     except Exception as e:
         readme_html = f"<p>Could not load README.md: {e}</p>"
-    return templates.TemplateResponse("landing.html", {"request": request, "readme_html": readme_html})
+    return templates.get_template("landing.html").render(readme_html=readme_html)
+
+
+def render_usage() -> str:
+    try:
+        readme_md = read_readme()
+        # Extract from ## Programmatic Usage to the next ##
+        usage = re.search(r"## Usage(.+?)(^## |\Z)", readme_md, re.DOTALL | re.MULTILINE)
+        combined = ""
+        if usage:
+            combined += "## Programmatic Usage" + usage.group(1)
+        return render_markdown(combined) if combined else ""
+    except Exception as e:
+        return f"<p>Could not load usage instructions: {e}</p>"
+
+
+# Both are rendered on first use and again only when README.md changes.
+landing_page = ReadmePage(render_landing)
+usage_fragment = ReadmePage(render_usage)
+
+# Landing page responses may be reused by clients and proxies for this long.
+LANDING_MAX_AGE_SECONDS = 300
+
+
+@app.get("/", response_class=HTMLResponse)
+def landing(request: Request):
+    client_host = getattr(request.client, "host", "unknown")
+    logger.info(f"Landing page accessed from {client_host}")
+    html, etag = landing_page.get()
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={LANDING_MAX_AGE_SECONDS}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(html, headers=headers)
 
 
 @app.post("/request-key")
-def request_key(
+async def request_key(
     request: Request, background_tasks: BackgroundTasks, email: str = Form(...)
 ):
     client_host = getattr(request.client, "host", "unknown")
     logger.info(f"API key request for email: {email} from {client_host}")
     try:
-        user = create_user_with_email(email, background_tasks)
+        user = await create_user_with_email(email, background_tasks)
         logger.info(f"User created or found for email: {email}")
         return templates.TemplateResponse(
             "landing.html",
@@ -118,58 +255,95 @@ def request_key(
         )
 
 
-def run_validator(feed_path: str, work: str) -> None:
-    result = subprocess.run(
-        ["java", "-jar", JAR, "-i", str(feed_path), "-o", str(work)],
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        raise HTTPException(500, result.stderr)
+async def send_report_file(path: Path, media_type: str, accept_encoding: str) -> Response:
+    """Send a report file as-is from disk, precompressed when the client accepts it."""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = choose_encoding(accept_encoding)
+    if encoding is not None:
+        path, written = await asyncio.to_thread(precompressed, path, encoding)
+        report_cache.grow(path.parent, written)
+        headers["Content-Encoding"] = encoding
+    return FileResponse(path, media_type=media_type, headers=headers)
+
 
+async def get_report(work: str, format: str, accept_encoding: str = ""):
+    with stage("report"):
+        return await _get_report(work, format, accept_encoding)
 
-def get_report(work: str, format: str):
+
+async def _get_report(work: str, format: str, accept_encoding: str):
     work_path = Path(work)
     report_json_path = work_path / "report.json"
     report_html_path = work_path / "report.html"
     if format == "json":
-        with report_json_path.open() as f:
-            return json.load(f)
+        return await send_report_file(report_json_path, "application/json", accept_encoding)
     elif format == "html":
         if not report_html_path.exists():
             raise HTTPException(500, "HTML report not found.")
-        with report_html_path.open() as f:
-            return Response(f.read(), media_type="text/html")
+        return await send_report_file(report_html_path, "text/html", accept_encoding)
     elif format == "errors":
-        with report_json_path.open() as f:
-            data = json.load(f)
-        errors = [n for n in data.get("notices", []) if n.get("severity") == "ERROR"]
-        return JSONResponse({"errors": errors})
+        return StreamingResponse(stream_errors(str(report_json_path)), media_type="application/json")
+    elif format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(str(report_json_path)), media_type="application/x-ndjson"
+        )
     else:
         raise HTTPException(400, "Invalid format parameter.")
 
 
-async def save_uploaded_file(file: UploadFile, dest: str):
-    if file.content_type != "application/zip":
-        raise HTTPException(400, "GTFS feed must be a .zip")
-    dest_path = Path(dest)
-    dest_path.write_bytes(await file.read())
+async def reserve_upload(request: Request, work: Path, max_bytes: int) -> None:
+    """Reserve room in `work` for the uploads of `request` before they are saved there.
 
+    Sized from the Content-Length, or `max_bytes` (the most the uploads may take) when
+    the body is sent without one.
+    """
+    content_length = request.headers.get("content-length", "")
+    nbytes = int(content_length) if content_length.isdigit() else max_bytes
+    await asyncio.to_thread(workspace.reserve, work, nbytes)
 
-async def download_file(url: str, dest: str):
-    if not url.lower().endswith(".zip"):
-        raise HTTPException(400, "A valid GTFS .zip URL must be provided.")
-    dest_path = Path(dest)
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                raise HTTPException(400, f"Failed to download file: {resp.status}")
-            with dest_path.open("wb") as out:
-                while True:
-                    chunk = await resp.content.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    out.write(chunk)
+
+async def save_uploaded_file(file: UploadFile, dest: str) -> str:
+    if file.content_type != "application/zip":
+        raise HTTPException(400, "GTFS feed must be a .zip")
+    with stage("upload"):
+        return await stream_upload(file, dest)
+
+
+def check_feed_source(file: UploadFile | None, url: str | None) -> UploadFile | None:
+    """Check that exactly one of `file` and `url` was given; return `file`, or None if empty."""
+    if isinstance(file, str) and file == "":
+        file = None
+    if not file and not url:
+        logger.warning("No file or URL provided.")
+        raise HTTPException(400, "You must provide either a file or a URL.")
+    if file and url:
+        logger.warning("Both file and URL provided.")
+        raise HTTPException(400, "Provide only one of file or URL, not both.")
+    return file
+
+
+def release_request(work: str, pinned: Path | None = None) -> None:
+    workspace.release(work)
+    if pinned is not None:
+        report_cache.unpin(pinned)
+
+
+def finish_report(
+    report: Response,
+    cache_status: str,
+    mode: str,
+    work: str,
+    report_id: str | None = None,
+    pinned: Path | None = None,
+) -> Response:
+    report.headers["X-Cache"] = cache_status
+    report.headers["X-Validation-Mode"] = mode
+    if report_id:
+        report.headers["X-Report-Id"] = report_id
+    # Reports are sent from disk, so `work` is only removed, and the cache entry `pinned`
+    # only let go, once the response is complete.
+    report.background = BackgroundTask(release_request, work, pinned)
+    return report
 
 
 def get_rate_limit(request: Request = None):
@@ -190,8 +364,17 @@ async def validate(
     url: Optional[str] = Form(None),
     format: str = Query(
         "json",
-        enum=["json", "html", "errors"],
-        description="Response format: 'json' (default), 'html', or 'errors'",
+        enum=["json", "html", "errors", "ndjson"],
+        description="Response format: 'json' (default), 'html', 'errors', or 'ndjson' (one notice per line, streamed)",
+    ),
+    use_cache: bool = Query(
+        True,
+        description="Serve a cached report for an identical feed, and cache this one. Set to false to force a fresh validation.",
+    ),
+    mode: str = Query(
+        "full",
+        enum=["full", "quick"],
+        description="'full' (default) runs the GTFS validator; 'quick' only checks files, headers and ID references, in well under a second",
     ),
     api_key=Depends(get_api_key),
 ):
@@ -204,19 +387,16 @@ async def validate(
             logger.info(
                 "DISABLE_EMAIL_AND_API_KEY is set; skipping auth and rate limiting."
             )
-        if isinstance(file, str) and file == "":
-            file = None
-        if not file and not url:
-            logger.warning("No file or URL provided to /validate.")
-            raise HTTPException(400, "You must provide either a file or a URL.")
-        if file and url:
-            logger.warning("Both file and URL provided to /validate.")
-            raise HTTPException(400, "Provide only one of file or URL, not both.")
-        with tempfile.TemporaryDirectory() as work:
+        file = check_feed_source(file, url)
+        await usage_tracker.check_quota(key_id_of(api_key))
+        accept_encoding = request.headers.get("accept-encoding", "")
+        work = str(workspace.create("validate"))
+        try:
             work_path = Path(work)
             feed = work_path / "feed.zip"
             if file:
-                await save_uploaded_file(file, str(feed))
+                await reserve_upload(request, work_path, upload_settings.UPLOAD_MAX_BYTES)
+                feed_sha256 = await save_uploaded_file(file, str(feed))
                 logger.info(f"Uploaded file saved for validation: {file.filename}")
             else:
                 if url is None:
@@ -224,55 +404,529 @@ async def validate(
                     raise HTTPException(
                         400, "You must provide a URL if no file is uploaded."
                     )
-                await download_file(url, str(feed))
-                logger.info(f"Downloaded file from URL: {url}")
-            run_validator(str(feed), str(work_path))
-            logger.info("Validation completed successfully.")
-            return get_report(str(work_path), format)
+                watched = watchlist.ready(url) if use_cache and mode == "full" else None
+                if watched is not None:
+                    logger.info(f"Serving the watchlist report of {url}")
+                    cache_requests.inc("hit")
+                    report = await get_report(
+                        str(watchlist.report_dir(watched)), format, accept_encoding
+                    )
+                    report.headers["X-Checked-At"] = _timestamp(watched["checked_at"])
+                    return finish_report(
+                        report, "HIT", watched["mode"] or "full", work, watched["report_id"]
+                    )
+                fetched = await download_file(url, str(feed))
+                feed_sha256 = fetched.sha256
+                logger.info(
+                    f"Downloaded file from URL: {url}"
+                    + (" (not modified)" if fetched.not_modified else "")
+                )
+            report_dir, cache_status, mode = await validate_shared(
+                feed,
+                feed_sha256,
+                use_cache,
+                client_id(request),
+                request.is_disconnected,
+                mode,
+                key_id_of(api_key),
+            )
+            try:
+                report = await get_report(str(report_dir), format, accept_encoding)
+            except BaseException:
+                report_cache.unpin(report_dir)
+                raise
+            return finish_report(
+                report, cache_status, mode, work, report_cache.entry_id(report_dir), report_dir
+            )
+        except BaseException:
+            workspace.release(work)
+            raise
     except Exception as e:
         logger.error(f"Error in /validate: {e}")
         raise
 
 
+@dataclass
+class BatchSources:
+    urls: list[str]
+    files: list[UploadFile]
+
+
+async def batch_sources(
+    request: Request,
+    urls: list[str] | None = Form(None),
+    files: list[UploadFile] | None = File(None),
+) -> BatchSources:
+    """The batch's non-empty URLs and files, counted for `batch_cost`."""
+    sources = BatchSources(
+        [url for url in urls or [] if url],
+        [file for file in files or [] if not isinstance(file, str)],
+    )
+    # Dependencies are solved before the rate limiter runs, so it can charge per feed.
+    request.state.batch_feeds = len(sources.urls) + len(sources.files)
+    return sources
+
+
+def batch_cost(request: Request) -> int:
+    """Rate-limit cost of a batch: one hit per feed."""
+    return max(1, request.state.batch_feeds)
+
+
+@dataclass
+class BatchFeed:
+    index: int
+    source: str
+    path: Path
+    url: str | None = None
+    sha256: str | None = None
+    error: HTTPException | None = None
+
+
+def batch_errors(report_json: Path) -> list[dict]:
+    return list(iter_notices(str(report_json), "ERROR"))
+
+
+async def batch_line(result: dict, report_json: Path | None) -> AsyncIterator[bytes]:
+    """One NDJSON line: `result`, plus the report at `report_json` copied in as-is."""
+    if report_json is None:
+        yield (json.dumps(result) + "\n").encode()
+        return
+    yield json.dumps(result)[:-1].encode() + b', "report": '
+    chunks = stream_inline(str(report_json))
+    while chunk := await asyncio.to_thread(next, chunks, b""):
+        yield chunk
+    yield b"}\n"
+
+
+async def stream_batch(
+    work: Path,
+    feeds: list[BatchFeed],
+    format: str,
+    use_cache: bool,
+    client: str,
+    account: str | None = None,
+) -> AsyncIterator[bytes]:
+    """Validate `feeds` concurrently and yield one NDJSON result line per feed as each finishes.
+
+    Identical URLs are downloaded once and identical feeds are validated once.
+    """
+    semaphore = asyncio.Semaphore(batch_settings.BATCH_CONCURRENCY)
+    downloads: dict[str, asyncio.Future] = {}
+    validations: dict[str, asyncio.Future] = {}
+
+    async def run(feed: BatchFeed) -> tuple[dict, Path | None]:
+        result: dict = {"index": feed.index, "source": feed.source}
+        report_json = None
+        try:
+            async with semaphore:
+                if feed.error is not None:
+                    raise feed.error
+                if feed.url is not None:
+                    if feed.url not in downloads:
+                        downloads[feed.url] = asyncio.ensure_future(
+                            download_file(feed.url, str(feed.path))
+                        )
+                    feed.sha256 = (await asyncio.shield(downloads[feed.url])).sha256
+                # Set by the upload, or by the download just above.
+                sha256 = feed.sha256
+                assert sha256 is not None
+                result["sha256"] = sha256
+                duplicate = sha256 in validations
+                if not duplicate:
+                    validations[sha256] = asyncio.ensure_future(
+                        validate_shared(feed.path, sha256, use_cache, client, account=account)
+                    )
+                report_dir, cache_status, mode = await asyncio.shield(validations[sha256])
+            result["status"] = "ok"
+            result["cache"] = "DUPLICATE" if duplicate else cache_status
+            result["mode"] = mode
+            report_id = report_cache.entry_id(report_dir)
+            if report_id:
+                result["report_id"] = report_id
+            if format == "json":
+                # Copied into the line as-is rather than parsed and serialised again.
+                report_json = report_dir / "report.json"
+            else:
+                result["errors"] = await asyncio.to_thread(batch_errors, report_dir / "report.json")
+        except HTTPException as e:
+            result.update(status="error", status_code=e.status_code, error=e.detail)
+        except Exception as e:  # noqa: BLE001  (one feed failing must not end the batch)
+            logger.error(f"Batch feed {feed.source} failed: {e}")
+            result.update(status="error", status_code=500, error="Internal error.")
+        return result, report_json
+
+    tasks = [asyncio.ensure_future(run(feed)) for feed in feeds]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            async for chunk in batch_line(*await next_result):
+                yield chunk
+    finally:
+        pending = [*tasks, *downloads.values(), *validations.values()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        # Each validation pinned the cache entry it found; the lines using it are written.
+        for validation in validations.values():
+            if not validation.cancelled() and validation.exception() is None:
+                report_cache.unpin(validation.result()[0])
+        workspace.release(work)
+
+
+@app.post("/validate/batch")
+@limiter.limit(
+    lambda request=None: get_rate_limit(request), key_func=get_remote_address, cost=batch_cost
+)
+async def validate_batch(
+    request: Request,
+    sources: BatchSources = Depends(batch_sources),
+    format: str = Query(
+        "errors",
+        enum=["errors", "json"],
+        description="Per-feed result: 'errors' (default, ERROR notices only) or 'json' (full report)",
+    ),
+    use_cache: bool = Query(True, description="As for /validate."),
+    api_key=Depends(get_api_key),
+):
+    """Validate several feeds; results stream back as NDJSON, one line per feed as it finishes."""
+    urls, files = sources.urls, sources.files
+    total = len(urls) + len(files)
+    if not total:
+        raise HTTPException(400, "You must provide at least one file or URL.")
+    if total > batch_settings.BATCH_MAX_FEEDS:
+        raise HTTPException(
+            400, f"A batch may contain at most {batch_settings.BATCH_MAX_FEEDS} feeds."
+        )
+    logger.info(f"/validate/batch called with {len(urls)} URLs and {len(files)} files")
+    await usage_tracker.check_quota(key_id_of(api_key))
+    work = workspace.create("batch")
+    try:
+        feeds = []
+        for index, url in enumerate(urls):
+            (work / str(index)).mkdir()
+            feeds.append(BatchFeed(index, url, work / str(index) / "feed.zip", url=url))
+        # Uploads are saved now, while the request body is still available.
+        if files:
+            await reserve_upload(request, work, batch_settings.BATCH_MAX_FEEDS * upload_settings.UPLOAD_MAX_BYTES)
+        for index, file in enumerate(files, start=len(urls)):
+            (work / str(index)).mkdir()
+            feed = BatchFeed(index, file.filename or f"file {index}", work / str(index) / "feed.zip")
+            try:
+                feed.sha256 = await save_uploaded_file(file, str(feed.path))
+            except HTTPException as e:
+                feed.error = e
+            feeds.append(feed)
+    except BaseException:
+        workspace.release(work)
+        raise
+    return StreamingResponse(
+        stream_batch(work, feeds, format, use_cache, client_id(request), key_id_of(api_key)),
+        media_type="application/x-ndjson",
+    )
+
+
+def _timestamp(seconds: float | None) -> str | None:
+    if seconds is None:
+        return None
+    return datetime.datetime.fromtimestamp(seconds, datetime.UTC).isoformat()
+
+
+@app.post("/jobs", status_code=202)
+@limiter.limit(lambda request=None: get_rate_limit(request), key_func=get_remote_address)
+async def submit_job(
+    request: Request,
+    file: UploadFile | None = File(None),
+    url: str | None = Form(None),
+    api_key=Depends(get_api_key),
+):
+    """Queue a feed for validation and return its job ID without waiting for the result."""
+    file = check_feed_source(file, url)
+    await usage_tracker.check_quota(key_id_of(api_key))
+    job_id = jobs.new_job()
+    try:
+        feed_sha256 = None
+        if file:
+            feed_sha256 = await save_uploaded_file(file, str(jobs.job_dir(job_id) / "feed.zip"))
+        elif url is not None and not url.lower().endswith(".zip"):
+            raise HTTPException(400, "A valid GTFS .zip URL must be provided.")
+        jobs.submit(job_id, url, feed_sha256, client_id(request), key_id_of(api_key))
+    except BaseException:
+        jobs.discard(job_id)
+        raise
+    logger.info(f"Job {job_id} queued from {getattr(request.client, 'host', 'unknown')}")
+    return JSONResponse(
+        {"id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"},
+        status_code=202,
+        headers={"Location": f"/jobs/{job_id}"},
+    )
+
+
+def get_job_or_404(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found or expired.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_job_or_404(job_id)
+    status = {
+        "id": job["id"],
+        "status": job["status"],
+        "created_at": _timestamp(job["created_at"]),
+        "updated_at": _timestamp(job["updated_at"]),
+    }
+    if job["status"] == DONE:
+        status["report_url"] = f"/jobs/{job_id}/report"
+        if job["report_id"]:
+            status["report_id"] = job["report_id"]
+        status["expires_at"] = _timestamp(job["finished_at"] + jobs.result_ttl)
+    elif job["status"] == FAILED:
+        status["error"] = job["error"]
+        status["status_code"] = job["status_code"]
+        status["expires_at"] = _timestamp(job["finished_at"] + jobs.result_ttl)
+    return status
+
+
+@app.get("/jobs/{job_id}/report")
+async def job_report(
+    request: Request,
+    job_id: str,
+    format: str = Query(
+        "json",
+        enum=["json", "html", "errors", "ndjson"],
+        description="Response format, as for /validate",
+    ),
+):
+    job = get_job_or_404(job_id)
+    if job["status"] == FAILED:
+        raise HTTPException(job["status_code"] or 500, job["error"])
+    if job["status"] != DONE:
+        raise HTTPException(409, f"Job is {job['status']}; the report is not ready yet.")
+    report = await get_report(
+        str(jobs.job_dir(job_id)), format, request.headers.get("accept-encoding", "")
+    )
+    report.headers["X-Cache"] = job["cache_status"]
+    if job["report_id"]:
+        report.headers["X-Report-Id"] = job["report_id"]
+    return report
+
+
+@contextmanager
+def cached_report_dir(report_id: str) -> Iterator[Path]:
+    """The directory of a cached report, kept in the cache while in use."""
+    report_dir = report_cache.lookup(report_id, pin=True)
+    if report_dir is None:
+        raise HTTPException(404, f"Report {report_id} not found or no longer cached.")
+    try:
+        yield report_dir
+    finally:
+        report_cache.unpin(report_dir)
+
+
+async def report_summary(report_id: str) -> dict:
+    with cached_report_dir(report_id) as report_dir:
+        summary, written = await asyncio.to_thread(load_summary, report_dir)
+        report_cache.grow(report_dir, written)
+    return summary
+
+
+@app.get("/reports/{base_id}/diff/{head_id}")
+async def report_diff(base_id: str, head_id: str):
+    """Notices added, removed and changed between two reports, e.g. two versions of a feed.
+
+    Report IDs come from the X-Report-Id header of /validate and /jobs/{id}/report.
+    """
+    base, head = await asyncio.gather(report_summary(base_id), report_summary(head_id))
+    return {"base": base_id, "head": head_id, **diff_summaries(base, head)}
+
+
+async def index_report(report_dir: Path) -> None:
+    """Build the notice index of a cached report on first use."""
+    with stage("index"):
+        written = await asyncio.to_thread(ensure_index, report_dir)
+    report_cache.grow(report_dir, written)
+
+
+@app.get("/reports/{report_id}/notices")
+async def report_notices_page(
+    report_id: str,
+    code: str | None = Query(None, description="Only notices with this code, e.g. foreign_key_violation"),
+    severity: str | None = Query(None, enum=["ERROR", "WARNING", "INFO"]),
+    file: str | None = Query(None, description="Only notices about this file, e.g. stop_times.txt"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """One page of a report's sample notices, filtered by code, severity and file."""
+    with cached_report_dir(report_id) as report_dir:
+        await index_report(report_dir)
+        return await asyncio.to_thread(query_notices, report_dir, code, severity, file, offset, limit)
+
+
+@app.get("/reports/{report_id}/summary")
+async def report_notice_summary(report_id: str):
+    """Notice totals of a report by severity and by code."""
+    with cached_report_dir(report_id) as report_dir:
+        await index_report(report_dir)
+        return await asyncio.to_thread(summarize_notices, report_dir)
+
+
+def require_key_id(api_key) -> str:
+    key_id = key_id_of(api_key)
+    if key_id is None:
+        raise HTTPException(401, "A valid X-API-Key header is required.")
+    return key_id
+
+
+def watch_view(watch: dict) -> dict:
+    return {
+        "id": watch["id"],
+        "url": watch["url"],
+        "interval_seconds": watch["interval"],
+        "status": watch["status"],
+        "error": watch["error"],
+        "feed_sha256": watch["feed_sha256"],
+        "report_id": watch["report_id"],
+        "created_at": _timestamp(watch["created_at"]),
+        "checked_at": _timestamp(watch["checked_at"]),
+        "changed_at": _timestamp(watch["changed_at"]),
+        "next_check_at": _timestamp(watch["next_check_at"]),
+    }
+
+
+@app.post("/watchlist", status_code=201)
+async def add_watch(
+    url: str = Form(...),
+    interval_seconds: float | None = Form(None),
+    api_key=Depends(get_api_key),
+):
+    """Watch a feed URL: it is re-validated in the background whenever it changes, and
+    /validate?url= answers from the latest report."""
+    key_id = require_key_id(api_key)
+    if not url.lower().endswith(".zip"):
+        raise HTTPException(400, "A valid GTFS .zip URL must be provided.")
+    watch = await asyncio.to_thread(watchlist.add, key_id, url, interval_seconds)
+    return watch_view(watch)
+
+
+@app.get("/watchlist")
+async def list_watches(api_key=Depends(get_api_key)):
+    key_id = require_key_id(api_key)
+    return {"watches": [watch_view(w) for w in await asyncio.to_thread(watchlist.list, key_id)]}
+
+
+@app.get("/watchlist/{watch_id}")
+async def get_watch(watch_id: str, api_key=Depends(get_api_key)):
+    watch = await asyncio.to_thread(watchlist.get, require_key_id(api_key), watch_id)
+    if watch is None:
+        raise HTTPException(404, "Watch not found.")
+    return watch_view(watch)
+
+
+@app.delete("/watchlist/{watch_id}", status_code=204)
+async def remove_watch(watch_id: str, api_key=Depends(get_api_key)):
+    if not await asyncio.to_thread(watchlist.remove, require_key_id(api_key), watch_id):
+        raise HTTPException(404, "Watch not found.")
+    return Response(status_code=204)
+
+
 @app.get("/verify-email", response_class=HTMLResponse)
-def verify_email(request: Request, token: str):
+async def verify_email(request: Request, token: str):
     api_key_value = None
     try:
-        user, api_key = verify_email_token(token)
+        user, api_key = await verify_email_token(token)
         api_key_value = api_key.key
         msg = "<h2>Email verified!</h2>"
     except Exception as e:
         msg = f"<h2>Verification failed</h2><p>{e}</p>"
-    # Extract usage instructions from README
-    readme_path = Path(__file__).parent.parent / "README.md"
-    usage_html = ""
-    try:
-        readme_md = readme_path.read_text(encoding="utf-8")
-        readme_md = readme_md.replace("<YOUR-GATEWAY-URL>", app_settings.BASE_URL)
-        # Extract from ## Programmatic Usage to the next ##
-        usage = re.search(r"## Usage(.+?)(^## |\Z)", readme_md, re.DOTALL | re.MULTILINE)
-        combined = ""
-        if usage:
-            combined += "## Programmatic Usage" + usage.group(1)
-        if combined:
-            usage_html = markdown.markdown(combined, extensions=["fenced_code", "tables"])
-    except Exception as e:
-        usage_html = f"<p>Could not load usage instructions: {e}</p>"
-    return templates.TemplateResponse("verify_email.html", {"request": request, "message": msg, "api_key": api_key_value, "usage_html": usage_html})
+    usage_html, _ = usage_fragment.get()
+    response = templates.TemplateResponse("verify_email.html", {"request": request, "message": msg, "api_key": api_key_value, "usage_html": usage_html})
+    # The page shows a freshly issued API key.
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return report_cache.stats()
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/workspace/stats")
+def workspace_stats():
+    return workspace.stats()
+
+
+@app.get("/usage")
+async def key_usage(api_key=Depends(get_api_key)):
+    """This month's usage of the calling API key, and its quotas."""
+    key_id = require_key_id(api_key)
+    used = await usage_tracker.get(key_id)
+    return {
+        "period": usage_tracker.period,
+        "usage": used.as_dict(),
+        "quota": {"bytes": usage_tracker.quota_bytes, "cpu_seconds": usage_tracker.quota_cpu_seconds},
+    }
+
+
+registry.add(Gauge("gtfs_admission_running", "Validator runs in progress.", lambda: admission.running))
+registry.add(Gauge("gtfs_admission_queued", "Validator runs waiting for a turn.", lambda: admission.queued))
+registry.add(
+    Gauge("gtfs_admission_queued_bytes", "Size of feeds waiting for a turn.", lambda: admission.queued_bytes)
+)
+registry.add(
+    Gauge(
+        "gtfs_workspace_reserved_bytes",
+        "Scratch space held or reserved by all workers.",
+        lambda: workspace.usage()[0],
+    )
+)
+registry.add(
+    Gauge("gtfs_report_cache_bytes", "Size of the report cache.", lambda: report_cache.stats()["bytes"])
+)
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
-@app.post("/admin/delete-user")
-def admin_delete_user(email: str = Form(...)):
-    from app.firestore_db import db
+
+@app.get("/startup")
+def startup_report():
+    """How long startup took: milestones after process start, lazy imports and warm-ups."""
+    return startup.report()
+
+
+@app.post("/admin/delete-user", dependencies=[Depends(require_admin)])
+async def admin_delete_user(email: str = Form(...)):
     logger.info(f"Admin deleting user: {email}")
     try:
-        db.collection('users').document(email.lower()).delete()
+        await remove_user(email)
         logger.info(f"User {email} deleted by admin.")
         return {"status": "success", "message": f"User {email} deleted."}
     except Exception as e:
         logger.error(f"Error deleting user {email}: {e}")
-        raise HTTPException(status_code=500, detail=f"Error deleting user: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error deleting user: {e}")
+
+
+@app.post("/admin/revoke-key", dependencies=[Depends(require_admin)])
+async def admin_revoke_key(key_id: str = Form(...)):
+    logger.info(f"Admin revoking API key: {key_id}")
+    try:
+        await revoke_key(key_id)
+        return {"status": "success", "message": f"API key {key_id} revoked."}
+    except Exception as e:  # noqa: BLE001  (storage backends raise their own error types)
+        logger.error(f"Error revoking API key {key_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error revoking API key: {e}")
+
+
+startup.mark("imported")
@@ -0,0 +1,251 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[str, ...]
+
+# Per-request stage durations, filled in by `stage()` and logged by the request middleware.
+_stages: ContextVar[dict[str, float] | None] = ContextVar("stages", default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(
+                    f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                )
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = sorted(buckets)
+        self.labelnames = tuple(labelnames)
+        # Per label set: bucket counts (non-cumulative, last one is +Inf), sum.
+        self._values: dict[Labels, tuple[list[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            counts, total = self._values.get(labels) or (
+                [0] * (len(self.buckets) + 1),
+                0.0,
+            )
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[labels] = (counts, total + value)
+
+    def count(self, *labels: str) -> int:
+        item = self._values.get(labels)
+        return sum(item[0]) if item else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip([*self.buckets, float("inf")], counts):
+                    cumulative += count
+                    le = _format_labels(
+                        self.labelnames, labels, f'le="{_format_value(bound)}"'
+                    )
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                plain = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{plain} {_format_value(total)}")
+                lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A gauge read from `read` at scrape time."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]) -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.read())}",
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:  # noqa: BLE001  (a broken gauge must not take /metrics down)
+                logger.error(f"Could not render metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+SECONDS_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = tuple(2**n for n in range(10, 34, 2))
+COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000)
+
+registry = Registry()
+stage_seconds = registry.add(
+    Histogram(
+        "gtfs_stage_seconds",
+        "Time spent in each request stage.",
+        SECONDS_BUCKETS,
+        ["stage"],
+    )
+)
+request_seconds = registry.add(
+    Histogram(
+        "gtfs_request_seconds",
+        "Request handling time.",
+        SECONDS_BUCKETS,
+        ["path", "status"],
+    )
+)
+feed_bytes = registry.add(
+    Histogram("gtfs_feed_bytes", "Size of validated feeds.", BYTES_BUCKETS)
+)
+report_notices = registry.add(
+    Histogram(
+        "gtfs_report_notices", "Notices per new report.", COUNT_BUCKETS, ["severity"]
+    )
+)
+validator_cpu_seconds = registry.add(
+    Histogram(
+        "gtfs_validator_cpu_seconds",
+        "CPU time of one-shot validator runs.",
+        SECONDS_BUCKETS,
+    )
+)
+validator_max_rss_bytes = registry.add(
+    Histogram(
+        "gtfs_validator_max_rss_bytes",
+        "Peak RSS of one-shot validator runs.",
+        BYTES_BUCKETS,
+    )
+)
+cache_requests = registry.add(
+    Counter("gtfs_report_cache_requests_total", "Report cache lookups.", ["result"])
+)
+auth_cache_requests = registry.add(
+    Counter("gtfs_auth_cache_requests_total", "API key cache lookups.", ["result"])
+)
+coalesced_requests = registry.add(
+    Counter(
+        "gtfs_coalesced_requests_total",
+        "Requests that joined identical work in flight.",
+        ["kind"],
+    )
+)
+admission_rejections = registry.add(
+    Counter(
+        "gtfs_admission_rejected_total",
+        "Validator runs refused because the queue was full.",
+    )
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage `name` of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, name)
+        stages = _stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def start_request() -> dict[str, float]:
+    stages: dict[str, float] = {}
+    _stages.set(stages)
+    return stages
+
+
+def log_request(
+    method: str, path: str, status: int, seconds: float, stages: dict[str, float]
+) -> None:
+    """Record a finished request and log one structured line with its stage breakdown."""
+    request_seconds.observe(seconds, path, str(status))
+    logger.info(
+        json.dumps(
+            {
+                "event": "request",
+                "method": method,
+                "path": path,
+                "status": status,
+                "ms": round(seconds * 1000, 1),
+                "stages_ms": {
+                    name: round(value * 1000, 1) for name, value in stages.items()
+                },
+            }
+        )
+    )
+
+
+def observe_validator_usage(usage) -> None:
+    """Record a validator run's app.validator.ResourceUsage (None for JVM pool runs)."""
+    if usage is not None:
+        validator_cpu_seconds.observe(usage.cpu_seconds)
+        validator_max_rss_bytes.observe(usage.max_rss_bytes)
@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from app.reports import iter_notices
+
+INDEX_FILE = "notices.sqlite3"
+# Sample fields naming the file a notice is about, in order of preference.
+FILENAME_FIELDS = ("filename", "childFilename", "parentFilename")
+INSERT_BATCH = 1000
+
+_SCHEMA = """
+CREATE TABLE codes (code TEXT PRIMARY KEY, severity TEXT NOT NULL, total INTEGER NOT NULL);
+CREATE TABLE samples (code TEXT NOT NULL, severity TEXT NOT NULL, filename TEXT, sample TEXT NOT NULL);
+"""
+# Created after the rows are in, which is faster than maintaining them row by row.
+_INDEXES = (
+    "CREATE INDEX samples_code ON samples (code)",
+    "CREATE INDEX samples_severity ON samples (severity, code)",
+    "CREATE INDEX samples_filename ON samples (filename, code)",
+)
+
+
+def _filename(sample: dict[str, Any]) -> str | None:
+    for name in FILENAME_FIELDS:
+        if sample.get(name):
+            return sample[name]
+    return None
+
+
+def build_index(report_json: str, dest: Path) -> None:
+    """Index the notices of `report_json` by code, severity and file into SQLite at `dest`."""
+    db = sqlite3.connect(dest, isolation_level=None)
+    try:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.executescript(_SCHEMA)
+        db.execute("BEGIN")
+        codes: dict[str, tuple[str, int]] = {}
+        rows: list[tuple[str, str, str | None, str]] = []
+        for notice in iter_notices(report_json):
+            code = notice.get("code", "unknown")
+            severity = notice.get("severity", "UNKNOWN")
+            total = codes.get(code, (severity, 0))[1] + notice.get("totalNotices", 1)
+            codes[code] = (severity, total)
+            for sample in notice.get("sampleNotices", []):
+                rows.append((code, severity, _filename(sample), json.dumps(sample)))
+                if len(rows) >= INSERT_BATCH:
+                    db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?)", rows)
+                    rows = []
+        db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?)", rows)
+        db.executemany(
+            "INSERT INTO codes VALUES (?, ?, ?)",
+            [(code, severity, total) for code, (severity, total) in codes.items()],
+        )
+        for statement in _INDEXES:
+            db.execute(statement)
+        db.execute("COMMIT")
+    finally:
+        db.close()
+
+
+def ensure_index(report_dir: Path) -> int:
+    """Build the index of the report in `report_dir` if it is missing.
+
+    Returns the number of bytes written (0 when it already existed), so callers can
+    account for it.
+    """
+    path = report_dir / INDEX_FILE
+    if path.exists():
+        return 0
+    fd, tmp = tempfile.mkstemp(dir=report_dir, prefix=f".{INDEX_FILE}.")
+    os.close(fd)
+    try:
+        build_index(str(report_dir / "report.json"), Path(tmp))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path.stat().st_size
+
+
+def _connect(report_dir: Path) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{report_dir / INDEX_FILE}?mode=ro", uri=True)
+
+
+def query_notices(
+    report_dir: Path,
+    code: str | None = None,
+    severity: str | None = None,
+    filename: str | None = None,
+    offset: int = 0,
+    limit: int = 100,
+) -> dict[str, Any]:
+    """One page of the samples matching the filters, and how many match in all."""
+    where, params = [], []
+    for column, value in (
+        ("code", code),
+        ("severity", severity),
+        ("filename", filename),
+    ):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    clause = f" WHERE {' AND '.join(where)}" if where else ""
+    db = _connect(report_dir)
+    try:
+        total = db.execute(f"SELECT COUNT(*) FROM samples{clause}", params).fetchone()[
+            0
+        ]
+        rows = db.execute(
+            f"SELECT code, severity, sample FROM samples{clause} ORDER BY rowid LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        ).fetchall()
+    finally:
+        db.close()
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "notices": [
+            {"code": code, "severity": severity, "sample": json.loads(sample)}
+            for code, severity, sample in rows
+        ],
+    }
+
+
+def summarize_notices(report_dir: Path) -> dict[str, Any]:
+    """Notice totals by severity and by code, and the files notices are about."""
+    db = _connect(report_dir)
+    try:
+        codes = db.execute(
+            "SELECT code, severity, total FROM codes ORDER BY total DESC, code"
+        ).fetchall()
+        files = db.execute(
+            "SELECT filename, COUNT(*) FROM samples WHERE filename IS NOT NULL"
+            " GROUP BY filename ORDER BY filename"
+        ).fetchall()
+    finally:
+        db.close()
+    counts: dict[str, int] = {}
+    for _, severity, total in codes:
+        counts[severity] = counts.get(severity, 0) + total
+    return {
+        "counts": counts,
+        "codes": [
+            {"code": code, "severity": severity, "total": total}
+            for code, severity, total in codes
+        ],
+        "sampled_files": {filename: count for filename, count in files},
+    }
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from app.admission import admission
+from app.cache import CACHED_FILES, report_cache
+from app.fetch import FetchResult, fetcher
+from app.ingest import check_feed_archive
+from app.metrics import (
+    cache_requests,
+    coalesced_requests,
+    feed_bytes,
+    observe_validator_usage,
+    report_notices,
+    stage,
+)
+from app.reports import count_notices
+from app.settings import triage_settings
+from app.singleflight import Flight, SingleFlight
+from app.triage import TriageResult, triage
+from app.triage import write_report as write_triage_report
+from app.usage import usage as usage_tracker
+from app.usage import validator_cpu_seconds
+from app.validator import run_validator
+from app.workspace import workspace
+
+logger = logging.getLogger(__name__)
+
+# Identical downloads and validations running at the same time are done once.
+download_flights: SingleFlight[FetchResult] = SingleFlight("download")
+validation_flights: SingleFlight[tuple[Path, str, str]] = SingleFlight("validation")
+
+
+async def download_file(url: str, dest: str) -> FetchResult:
+    if not url.lower().endswith(".zip"):
+        raise HTTPException(400, "A valid GTFS .zip URL must be provided.")
+
+    async def download(flight: Flight) -> FetchResult:
+        # Room for the feed is reserved before it is written.
+        return await fetcher.fetch(
+            url,
+            str(flight.scratch / "feed.zip"),
+            lambda nbytes: workspace.reserve(flight.scratch, nbytes),
+        )
+
+    with stage("download"):
+        async with download_flights.join(url, download) as (fetched, flight, leader):
+            if not leader:
+                coalesced_requests.inc("download")
+            await asyncio.to_thread(
+                flight.link, flight.scratch / "feed.zip", Path(dest)
+            )
+    return fetched
+
+
+async def triage_feed(feed: Path, deep: bool) -> TriageResult:
+    """Run the Python-side checks, writing their report next to `feed` if it is to be served."""
+    with stage("triage"):
+        result = await asyncio.to_thread(triage, str(feed), deep)
+    if deep or result.fatal:
+        await asyncio.to_thread(write_triage_report, result, feed.parent)
+    return result
+
+
+async def validate_feed(
+    feed: Path,
+    feed_sha256: str,
+    use_cache: bool,
+    client: str,
+    is_disconnected=None,
+    mode: str = "full",
+    account: str | None = None,
+    wait: bool = False,
+    on_validating: Callable[[], None] | None = None,
+) -> tuple[Path, str, str]:
+    """Validate `feed`, which sits alone in its work directory, or find its cached report.
+
+    Returns the directory holding the reports, the X-Cache status and the validation
+    mode: "full", "quick" (triage only, as asked) or "preflight" (triage found the
+    feed unloadable, so the validator was skipped). A cache entry returned is pinned;
+    the caller unpins it once done with it. Usage is counted against the API
+    key `account`. With `wait` the validator waits for an admission turn rather than
+    being refused, for work nobody is waiting on; `on_validating` is called once it
+    has its turn.
+    """
+    feed_size = feed.stat().st_size
+    feed_bytes.observe(feed_size)
+    with stage("check"):
+        await asyncio.to_thread(check_feed_archive, str(feed))
+    usage_tracker.record(account, validations=1, bytes=feed_size)
+    if mode == "quick":
+        result = await triage_feed(feed, deep=True)
+        return feed.parent, "BYPASS", result.mode
+    use_cache = use_cache and report_cache.enabled
+    if use_cache:
+        cache_key = report_cache.key(feed_sha256)
+        cached = report_cache.get(cache_key, pin=True)
+        if cached is not None:
+            cache_requests.inc("hit")
+            logger.info(f"Serving cached report {cache_key}")
+            return cached, "HIT", "full"
+    cache_requests.inc("miss" if use_cache else "bypass")
+    if triage_settings.TRIAGE_PREFLIGHT:
+        result = await triage_feed(feed, deep=False)
+        if result.fatal:
+            logger.info("Feed failed preflight checks; skipping the validator.")
+            return feed.parent, "BYPASS", result.mode
+    await asyncio.to_thread(workspace.reserve_for_feed, feed.parent, feed_size)
+    async with admission.slot(client, feed_size, reject=not wait):
+        if on_validating is not None:
+            on_validating()
+        with stage("validator"):
+            started = time.monotonic()
+            usage = await run_validator(str(feed), str(feed.parent), is_disconnected)
+    observe_validator_usage(usage)
+    usage_tracker.record(account, cpu_seconds=validator_cpu_seconds(usage, started))
+    logger.info("Validation completed successfully.")
+    counts = await asyncio.to_thread(count_notices, str(feed.parent / "report.json"))
+    for severity, count in counts.items():
+        report_notices.observe(count, severity)
+    if not use_cache:
+        return feed.parent, "BYPASS", "full"
+    cached = await asyncio.to_thread(
+        report_cache.put, cache_key, str(feed.parent), True
+    )
+    return cached or feed.parent, "MISS", "full"
+
+
+async def validate_shared(
+    feed: Path,
+    feed_sha256: str,
+    use_cache: bool,
+    client: str,
+    is_disconnected=None,
+    mode: str = "full",
+    account: str | None = None,
+    wait: bool = False,
+    on_validating: Callable[[], None] | None = None,
+) -> tuple[Path, str, str]:
+    """`validate_feed`, run once for identical feeds submitted at the same time.
+
+    The validation runs in a directory of its own, so any waiter's client may
+    disconnect without affecting the others; it is stopped only once all of them have.
+    Callers that `wait` for a turn never share a run with callers that would be refused
+    one. `on_validating` is only called for the caller that starts the run. A cache
+    entry returned is pinned for each caller, which unpins it once done with it.
+    """
+    if mode == "quick":
+        return await validate_feed(
+            feed, feed_sha256, use_cache, client, is_disconnected, mode, account
+        )
+
+    async def validate(flight: Flight) -> tuple[Path, str, str]:
+        shared = flight.scratch / "feed.zip"
+        await asyncio.to_thread(flight.link, feed, shared)
+        result = await validate_feed(
+            shared,
+            feed_sha256,
+            use_cache,
+            client,
+            flight.abandoned,
+            mode,
+            account,
+            wait,
+            on_validating,
+        )
+        # The run's pin holds the entry until every waiter has taken its own.
+        flight.cleanups.append(lambda: report_cache.unpin(result[0]))
+        return result
+
+    key = f"{feed_sha256}:{use_cache}:{wait}"
+    async with validation_flights.join(key, validate, is_disconnected) as (
+        result,
+        flight,
+        leader,
+    ):
+        report_dir, cache_status, mode = result
+        report_cache.pin(report_dir)
+        if not leader:
+            coalesced_requests.inc("validation")
+            usage_tracker.record(account, validations=1, bytes=feed.stat().st_size)
+        if report_dir == flight.scratch:
+            # Not cached: each waiter takes its own links to the reports.
+            for path in report_dir.iterdir():
+                if path.is_file() and path.name != "feed.zip":
+                    await asyncio.to_thread(flight.link, path, feed.parent / path.name)
+            report_dir = feed.parent
+    return report_dir, cache_status, mode
+
+
+async def validate_in_background(
+    feed: Path,
+    feed_sha256: str,
+    client: str,
+    account: str | None,
+    on_validating: Callable[[], None] | None = None,
+) -> tuple[str, str | None, str]:
+    """`validate_shared` for work nobody is waiting on, such as jobs and watched feeds.
+
+    It waits for an admission turn rather than being refused, and leaves the reports in
+    the feed's directory, linked from the cache if they are cached, then deletes the
+    feed. Returns the X-Cache status, the report ID (if the report is cached) and the
+    validation mode.
+    """
+    report_dir, cache_status, mode = await validate_shared(
+        feed,
+        feed_sha256,
+        True,
+        client,
+        account=account,
+        wait=True,
+        on_validating=on_validating,
+    )
+    report_id = report_cache.entry_id(report_dir)
+    try:
+        if report_dir != feed.parent:
+            # Links survive the cache evicting the entry.
+            for name in CACHED_FILES:
+                if (report_dir / name).exists():
+                    await asyncio.to_thread(
+                        Flight.link, report_dir / name, feed.parent / name
+                    )
+    finally:
+        report_cache.unpin(report_dir)
+    feed.unlink(missing_ok=True)
+    return cache_status, report_id, mode
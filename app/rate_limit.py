@@ -1,7 +1,8 @@
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from fastapi import Request
-from app.settings import app_settings
+from app.settings import app_settings, rate_limit_settings
+import app.rate_limit_store  # noqa: F401  (registers the sqlite:// storage scheme)
 
 
 # Key function for API key-based rate limiting
@@ -9,7 +10,12 @@ def get_api_key_from_request(request: Request):
     return request.headers.get("x-api-key") or get_remote_address(request)
 
 
-limiter = Limiter(key_func=get_api_key_from_request, enabled=not app_settings.DISABLE_EMAIL_AND_API_KEY)
+limiter = Limiter(
+    key_func=get_api_key_from_request,
+    enabled=not app_settings.DISABLE_EMAIL_AND_API_KEY,
+    storage_uri=rate_limit_settings.RATE_LIMIT_STORAGE_URI if rate_limit_settings else "memory://",
+    strategy=rate_limit_settings.RATE_LIMIT_STRATEGY if rate_limit_settings else None,
+)
 
 # Custom 429 handler
 rate_limit_exceeded_handler = _rate_limit_exceeded_handler
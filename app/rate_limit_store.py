@@ -0,0 +1,165 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+# Expired counters are swept after this many increments.
+SWEEP_EVERY = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Starts a fresh window when the stored one has expired.
+_INCR = """
+INSERT INTO counters (key, count, expires_at) VALUES (:key, :amount, :expires_at)
+ON CONFLICT (key) DO UPDATE SET
+    count = CASE WHEN expires_at <= :now THEN :amount ELSE count + :amount END,
+    expires_at = CASE WHEN expires_at <= :now THEN :expires_at ELSE expires_at END
+RETURNING count
+"""
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate-limit counters in a SQLite database, shared by every process on the host.
+
+    Registered for ``sqlite:///path/to/file.sqlite3`` storage URIs. Supports the
+    fixed-window and sliding-window-counter strategies. The database runs in WAL mode
+    without per-commit fsync, so a hit is one short local transaction.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]  # noqa: RUF012  (limits declares it a plain list)
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options) -> None:
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = urlparse(uri).path
+        self._db: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._incrs = 0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Connections must not cross a fork, so each worker process opens its own.
+        if self._db is None or self._pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=5, check_same_thread=False, isolation_level=None
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+            self._pid = os.getpid()
+        return self._db
+
+    def _incr(
+        self, db: sqlite3.Connection, key: str, expiry: float, amount: int, now: float
+    ) -> int:
+        row = db.execute(
+            _INCR,
+            {"key": key, "amount": amount, "expires_at": now + expiry, "now": now},
+        ).fetchone()
+        self._incrs += 1
+        if self._incrs % SWEEP_EVERY == 0:
+            db.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+        return row[0]
+
+    def _get(self, db: sqlite3.Connection, key: str, now: float) -> tuple[int, float]:
+        row = db.execute(
+            "SELECT count, expires_at FROM counters WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, now)
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        with self._lock:
+            return self._incr(self.db, key, expiry, amount, time.time())
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            return self._get(self.db, key, time.time())[0]
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            return self._get(self.db, key, time.time())[1]
+
+    def check(self) -> bool:
+        with self._lock:
+            self.db.execute("SELECT 1").fetchone()
+        return True
+
+    def reset(self) -> int | None:
+        with self._lock:
+            return self.db.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self.db.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def _sliding_window(
+        self, db: sqlite3.Connection, key: str, expiry: int, now: float
+    ) -> tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(db, previous_key, now)[0]
+        current_count = self._get(db, current_key, now)[0]
+        previous_ttl = (
+            (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        )
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._lock:
+            db = self.db
+            # The write lock is taken up front, so the check and the increment are atomic
+            # across processes.
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                previous_count, previous_ttl, current_count, _ = self._sliding_window(
+                    db, key, expiry, now
+                )
+                weighted = previous_count * previous_ttl / expiry + current_count
+                acquired = math.floor(weighted) + amount <= limit
+                if acquired:
+                    self._incr(
+                        db,
+                        self.sliding_window_keys(key, expiry, now)[1],
+                        2 * expiry,
+                        amount,
+                        now,
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return acquired
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> tuple[int, float, int, float]:
+        with self._lock:
+            return self._sliding_window(self.db, key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for window_key in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(window_key)
@@ -0,0 +1,76 @@
+import hashlib
+import re
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from app.settings import app_settings
+from app.startup import lazy_import
+
+README_PATH = Path(__file__).parent.parent / "README.md"
+
+
+def get_md_intro(readme_md: str) -> str:
+    # Extract from # heading to the next '##' (not including subheadings)
+    pattern = r"^# .+?(?=^## |\Z)"
+    match = re.search(pattern, readme_md, re.DOTALL | re.MULTILINE)
+    if match:
+        return match.group(0).strip()
+    return ""
+
+
+def get_md_section(readme_md: str, heading: str) -> str:
+    pattern = re.escape(heading) + r"(.*?)(?=^## [^#]|^# |\Z)"
+    match = re.search(pattern, readme_md, re.DOTALL | re.MULTILINE)
+    if match:
+        return heading + "\n\n" + match.group(1).strip()
+    return ""
+
+
+def render_markdown(md: str) -> str:
+    markdown = lazy_import("markdown")
+    return markdown.markdown(md, extensions=["fenced_code", "tables"])
+
+
+def read_readme(path: Path = README_PATH) -> str:
+    return path.read_text(encoding="utf-8").replace(
+        "<YOUR-GATEWAY-URL>", app_settings.BASE_URL
+    )
+
+
+def _mtime(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class ReadmePage:
+    """HTML built from README.md by `render`, rebuilt only when the README changes.
+
+    `get()` returns the HTML and a strong ETag for it.
+    """
+
+    def __init__(self, render: Callable[[], str], path: Path = README_PATH) -> None:
+        self.render = render
+        self.path = path
+        self._mtime: object = object()
+        self._page: tuple[str, str] = ("", "")
+        self._lock = threading.Lock()
+
+    def get(self) -> tuple[str, str]:
+        mtime = _mtime(self.path)
+        with self._lock:
+            if mtime != self._mtime:
+                html = self.render()
+                etag = '"' + hashlib.sha256(html.encode()).hexdigest()[:32] + '"'
+                self._page = (html, etag)
+                self._mtime = mtime
+            return self._page
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
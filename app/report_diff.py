@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from app.reports import iter_notices
+
+SUMMARY_FILE = "notice_summary.json"
+# Sample fields that locate a notice rather than identify it: inserting a row shifts
+# every row number after it, which must not make all later notices look new.
+POSITIONAL_FIELDS = (
+    "csvRowNumber",
+    "csvRowNumber1",
+    "csvRowNumber2",
+    "prevCsvRowNumber",
+)
+# Samples listed per code and direction in a diff.
+MAX_DIFF_SAMPLES = 20
+
+
+def fingerprint(sample: dict[str, Any]) -> str:
+    identity = {
+        name: value for name, value in sample.items() if name not in POSITIONAL_FIELDS
+    }
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def summarize(report_json: str) -> dict[str, dict[str, Any]]:
+    """Per-code summary of a report: severity, total and samples by fingerprint."""
+    summary: dict[str, dict[str, Any]] = {}
+    for notice in iter_notices(report_json):
+        code = notice.get("code", "unknown")
+        entry = summary.setdefault(
+            code,
+            {"severity": notice.get("severity", "UNKNOWN"), "total": 0, "samples": {}},
+        )
+        entry["total"] += notice.get("totalNotices", 1)
+        for sample in notice.get("sampleNotices", []):
+            entry["samples"].setdefault(fingerprint(sample), sample)
+    return summary
+
+
+def load_summary(report_dir: Path) -> tuple[dict[str, dict[str, Any]], int]:
+    """The summary of the report in `report_dir`, written next to it on first use.
+
+    Also returns the number of bytes written (0 when it already existed), so callers
+    can account for it.
+    """
+    path = report_dir / SUMMARY_FILE
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            return json.load(f), 0
+    summary = summarize(str(report_dir / "report.json"))
+    fd, tmp = tempfile.mkstemp(dir=report_dir, prefix=f".{SUMMARY_FILE}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(summary, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return summary, path.stat().st_size
+
+
+def _samples(samples: dict[str, Any], keys: list[str]) -> list[dict[str, Any]]:
+    return [samples[key] for key in sorted(keys)[:MAX_DIFF_SAMPLES]]
+
+
+def diff_summaries(
+    base: dict[str, dict[str, Any]], head: dict[str, dict[str, Any]]
+) -> dict[str, Any]:
+    """Notices added, removed and changed from `base` to `head`, by code.
+
+    Totals are exact. Sample-level changes only cover the samples the validator kept
+    in each report, which it caps per code.
+    """
+    changes = []
+    counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+    for code in sorted(set(base) | set(head)):
+        old = base.get(code, {"total": 0, "samples": {}})
+        new = head.get(code, {"total": 0, "samples": {}})
+        added = [key for key in new["samples"] if key not in old["samples"]]
+        removed = [key for key in old["samples"] if key not in new["samples"]]
+        if code not in base:
+            status = "added"
+        elif code not in head:
+            status = "removed"
+        elif old["total"] != new["total"] or added or removed:
+            status = "changed"
+        else:
+            counts["unchanged"] += 1
+            continue
+        counts[status] += 1
+        changes.append(
+            {
+                "code": code,
+                "severity": (head.get(code) or base[code])["severity"],
+                "status": status,
+                "base_total": old["total"],
+                "head_total": new["total"],
+                "delta": new["total"] - old["total"],
+                "added_samples": _samples(new["samples"], added),
+                "removed_samples": _samples(old["samples"], removed),
+            }
+        )
+    return {"codes": counts, "notices": changes}
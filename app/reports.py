@@ -0,0 +1,197 @@
+import gzip
+import json
+import os
+import re
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, TextIO
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional: pip install ".[brotli]"
+    brotli = None
+
+READ_CHARS = 64 * 1024
+COMPRESS_CHUNK_BYTES = 1024 * 1024
+GZIP_LEVEL = 6
+# Higher brotli qualities compress a little better but many times slower.
+BROTLI_QUALITY = 5
+# Content codings we can produce, in order of preference.
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+_WHITESPACE = re.compile(r"\s*")
+_decoder = json.JSONDecoder()
+
+
+class _JsonReader:
+    """Pulls JSON values one at a time out of a text stream.
+
+    Only the value being decoded is held in memory. The read size doubles while a
+    value is incomplete, so a large value still decodes in linear time.
+    """
+
+    def __init__(self, f: TextIO) -> None:
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int = READ_CHARS) -> None:
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()  # type: ignore[union-attr]
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos : self.pos + 1]
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in report at offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        size = READ_CHARS
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number running into the end of the buffer may continue in the next read.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+
+def iter_notices(
+    report_json: str, severity: str | None = None
+) -> Iterator[dict[str, Any]]:
+    """Yield the entries of the top-level `notices` array of a validator report.json.
+
+    The rest of the document is skipped value by value, so memory use is bounded by
+    the largest single notice rather than by the report size.
+    """
+    with open(report_json, encoding="utf-8") as f:
+        reader = _JsonReader(f)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == "notices" and reader.peek() == "[":
+                reader.expect("[")
+                if reader.peek() == "]":
+                    reader.expect("]")
+                else:
+                    while True:
+                        notice = reader.value()
+                        if severity is None or notice.get("severity") == severity:
+                            yield notice
+                        if reader.peek() != ",":
+                            break
+                        reader.expect(",")
+                    reader.expect("]")
+            else:
+                reader.value()
+            if reader.peek() != ",":
+                break
+            reader.expect(",")
+
+
+def stream_ndjson(report_json: str, severity: str | None = None) -> Iterator[bytes]:
+    for notice in iter_notices(report_json, severity):
+        yield json.dumps(notice).encode() + b"\n"
+
+
+def stream_errors(report_json: str) -> Iterator[bytes]:
+    """Stream `{"errors": [...]}` with the ERROR notices, one notice at a time."""
+    yield b'{"errors": ['
+    separator = b""
+    for notice in iter_notices(report_json, "ERROR"):
+        yield separator + json.dumps(notice).encode()
+        separator = b", "
+    yield b"]}"
+
+
+def stream_inline(path: str) -> Iterator[bytes]:
+    """Stream a JSON document as-is but on one line, for embedding in an NDJSON line.
+
+    Line breaks in JSON can only be whitespace between tokens (in strings they are
+    escaped), so replacing them with spaces leaves the document's meaning intact.
+    """
+    with open(path, "rb") as f:
+        while chunk := f.read(COMPRESS_CHUNK_BYTES):
+            yield chunk.replace(b"\r", b" ").replace(b"\n", b" ")
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Pick the preferred content coding the client accepts, or None for identity."""
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        try:
+            accepted[name.strip().lower()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            continue
+    for encoding in ENCODING_SUFFIXES:
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _compress(src: Path, dest, encoding: str) -> None:
+    with src.open("rb") as f:
+        if encoding == "gzip":
+            with gzip.GzipFile(
+                fileobj=dest, mode="wb", compresslevel=GZIP_LEVEL, mtime=0
+            ) as out:
+                while chunk := f.read(COMPRESS_CHUNK_BYTES):
+                    out.write(chunk)
+        else:
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            while chunk := f.read(COMPRESS_CHUNK_BYTES):
+                dest.write(compressor.process(chunk))
+            dest.write(compressor.finish())
+
+
+def precompressed(path: Path, encoding: str) -> tuple[Path, int]:
+    """Return the `encoding` variant of `path`, writing it next to `path` if missing.
+
+    Also returns the number of bytes written (0 when the variant already existed), so
+    callers can account for it.
+    """
+    variant = path.with_name(path.name + ENCODING_SUFFIXES[encoding])
+    if variant.exists():
+        return variant, 0
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{variant.name}.")
+    try:
+        with os.fdopen(fd, "wb") as dest:
+            _compress(path, dest, encoding)
+        os.replace(tmp, variant)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return variant, variant.stat().st_size
+
+
+def count_notices(report_json: str) -> dict[str, int]:
+    """Total notices in a report by severity."""
+    counts: dict[str, int] = {}
+    for notice in iter_notices(report_json):
+        severity = notice.get("severity", "UNKNOWN")
+        counts[severity] = counts.get(severity, 0) + notice.get("totalNotices", 1)
+    return counts
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from typing import Literal, Annotated, Optional
-from pydantic import SecretStr, StringConstraints
+from pydantic import SecretStr, StringConstraints, PositiveInt, PositiveFloat, NonNegativeInt, NonNegativeFloat
 
 r_rate_limit = r"^\d+/(second|minute|hour|day|week|month)$"
 
@@ -9,6 +9,8 @@ class AppSettings(BaseSettings):
     BASE_URL: str = "http://localhost:8080"
     DISABLE_EMAIL_AND_API_KEY: bool = False
     APP_ENV: Literal["local", "development", "production", "default"] = "default"
+    # Where users and API keys live; defaults to "memory" when auth is disabled, else "firestore".
+    STORAGE_BACKEND: Literal["firestore", "memory"] | None = None
 
 
 class MailSettings(BaseSettings):
@@ -23,7 +25,158 @@ class MailSettings(BaseSettings):
 class RateLimitSettings(BaseSettings):
     UNAUTH_LIMIT: Annotated[str, StringConstraints(pattern=r_rate_limit)] = "5/day"
     AUTH_LIMIT: Annotated[str, StringConstraints(pattern=r_rate_limit)] = "50/day"
+    # Where counters live. The default SQLite file is shared by all worker processes on a
+    # host; use e.g. redis://host:6379 (with the `redis` extra) to share them across hosts.
+    RATE_LIMIT_STORAGE_URI: str = "sqlite:///tmp/gtfs-validator-ratelimit.sqlite3"
+    RATE_LIMIT_STRATEGY: Literal["fixed-window", "sliding-window-counter"] = "fixed-window"
+
+class ValidatorSettings(BaseSettings):
+    JAVA_BIN: str = "java"
+    VALIDATOR_JAR: str = "/opt/gtfs-validator.jar"
+    GTFS_VALIDATOR_VERSION: str = "7.1.0"
+    # Maximum number of validator JVMs running at once; further runs wait for a slot.
+    VALIDATOR_MAX_CONCURRENCY: PositiveInt = 2
+    # Wall-clock limit for a single validator run.
+    VALIDATOR_TIMEOUT_SECONDS: PositiveFloat = 540
+    # Memory cap (resident set) for a single validator run; 0 disables the cap.
+    VALIDATOR_MEMORY_LIMIT_MB: NonNegativeInt = 0
+    # "oneshot" starts a fresh JVM per validation; "pool" hands validations to warm, long-lived JVMs.
+    VALIDATOR_MODE: Literal["oneshot", "pool"] = "oneshot"
+    JVM_POOL_SIZE: PositiveInt = 2
+    # A pooled JVM is replaced after this many validations (or as soon as it crashes).
+    JVM_POOL_MAX_JOBS: PositiveInt = 50
+    JVM_POOL_START_TIMEOUT_SECONDS: PositiveFloat = 60
+    # Directory holding the compiled jvm/ValidatorWorker.class.
+    JVM_WORKER_CLASSPATH: str = "/opt/validator-worker"
+    # Class-data-sharing archive of the validator's classes, used when it exists. With
+    # JVM_CDS_AUTO_CREATE the first one-shot run creates it. Empty disables CDS.
+    JVM_CDS_ARCHIVE: str = "/tmp/gtfs-validator-cds.jsa"
+    JVM_CDS_AUTO_CREATE: bool = True
+    # Memory kept for the API itself when the JVM heap is sized from the container's limit.
+    JVM_RESERVED_MB: NonNegativeInt = 256
+    # Initial heap: this much plus JVM_HEAP_MB_PER_FEED_MB per MB of uncompressed feed.
+    JVM_HEAP_BASE_MB: PositiveInt = 64
+    JVM_HEAP_MB_PER_FEED_MB: NonNegativeFloat = 4
+    # Feeds up to this size (uncompressed) run with the serial GC and C1-only JIT, which start faster.
+    JVM_SMALL_FEED_MB: NonNegativeFloat = 20
+
+class CacheSettings(BaseSettings):
+    REPORT_CACHE_DIR: str = "/tmp/gtfs-validator-cache"
+    # Disk budget for cached reports; least recently used entries are evicted beyond it. 0 disables the cache.
+    REPORT_CACHE_MAX_BYTES: NonNegativeInt = 1024 * 1024 * 1024
+    # Age after which a cached report is revalidated; 0 keeps entries until evicted.
+    REPORT_CACHE_TTL_SECONDS: NonNegativeInt = 0
+
+class FetchSettings(BaseSettings):
+    # Feeds larger than this are rejected before any of the body is written.
+    FETCH_MAX_BYTES: PositiveInt = 1024 * 1024 * 1024
+    FETCH_TIMEOUT_SECONDS: PositiveFloat = 300
+    FETCH_CONNECT_TIMEOUT_SECONDS: PositiveFloat = 10
+    # Connections kept open by the shared HTTP client.
+    FETCH_POOL_SIZE: PositiveInt = 32
+    # Size of each HTTP Range request; larger feeds are fetched in parallel parts.
+    FETCH_RANGE_PART_BYTES: PositiveInt = 16 * 1024 * 1024
+    FETCH_RANGE_PARALLELISM: PositiveInt = 4
+    # Bodies remembered for conditional (ETag/Last-Modified) re-fetches. 0 disables them.
+    FETCH_STORE_DIR: str = "/tmp/gtfs-validator-fetch"
+    FETCH_STORE_MAX_BYTES: NonNegativeInt = 2 * 1024 * 1024 * 1024
+
+class UploadSettings(BaseSettings):
+    # Largest accepted uploaded feed; bigger uploads get a 413.
+    UPLOAD_MAX_BYTES: PositiveInt = 1024 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: PositiveInt = 1024 * 1024
+    # Zip-bomb guards, applied to uploaded and downloaded feeds before validation.
+    FEED_MAX_UNCOMPRESSED_BYTES: PositiveInt = 8 * 1024 * 1024 * 1024
+    FEED_MAX_COMPRESSION_RATIO: PositiveFloat = 100
+
+class AuthSettings(BaseSettings):
+    # How long a verified API key (and its user) is trusted without another Firestore read.
+    # Revoking a key clears it only from the cache of the process handling the revocation;
+    # other workers and instances keep trusting it for up to this long.
+    AUTH_CACHE_TTL_SECONDS: NonNegativeInt = 60
+    AUTH_CACHE_MAX_ENTRIES: PositiveInt = 10000
+    # How long an unknown or invalid API key is refused without another Firestore read.
+    AUTH_NEGATIVE_CACHE_TTL_SECONDS: NonNegativeInt = 30
+    # Token expected in the X-Admin-Token header of /admin/* requests; unset disables them.
+    ADMIN_TOKEN: SecretStr | None = None
+
+class JobSettings(BaseSettings):
+    # SQLite database holding the job queue, and the directory holding job feeds and reports.
+    JOBS_DB_PATH: str = "/tmp/gtfs-validator-jobs.sqlite3"
+    JOBS_DIR: str = "/tmp/gtfs-validator-jobs"
+    # Background workers running jobs; each one runs at most one validator at a time.
+    JOB_WORKERS: PositiveInt = 2
+    # Submissions beyond this many unfinished jobs get a 503.
+    JOB_MAX_PENDING: PositiveInt = 1000
+    # How long finished jobs and their reports are kept.
+    JOB_RESULT_TTL_SECONDS: PositiveInt = 24 * 60 * 60
+
+class AdmissionSettings(BaseSettings):
+    # Validator runs admitted at once; defaults to VALIDATOR_MAX_CONCURRENCY.
+    ADMISSION_MAX_RUNNING: PositiveInt | None = None
+    # Runs (and total feed bytes) allowed to wait for a turn before new ones get a 503.
+    ADMISSION_MAX_QUEUED: PositiveInt = 100
+    ADMISSION_MAX_QUEUED_BYTES: PositiveInt = 4 * 1024 * 1024 * 1024
+
+class BatchSettings(BaseSettings):
+    # Most feeds (URLs plus uploads) accepted in one /validate/batch request.
+    BATCH_MAX_FEEDS: PositiveInt = 500
+    # Feeds of one batch downloaded and validated at the same time.
+    BATCH_CONCURRENCY: PositiveInt = 4
+
+class TriageSettings(BaseSettings):
+    # Check each feed's files and headers before running the validator, and answer with
+    # those notices alone when a required file or column is missing. Off by default: the
+    # validator's full report of such a feed says much more.
+    TRIAGE_PREFLIGHT: bool = False
+
+class UsageSettings(BaseSettings):
+    # Per-API-key usage is counted in memory and written to the store this often.
+    USAGE_FLUSH_INTERVAL_SECONDS: PositiveFloat = 30
+    # How often a key's stored usage is re-read, to include other instances' usage.
+    USAGE_REFRESH_INTERVAL_SECONDS: PositiveFloat = 300
+    # Monthly quotas per API key; unset means unlimited.
+    USAGE_QUOTA_BYTES: PositiveInt | None = None
+    USAGE_QUOTA_CPU_SECONDS: PositiveFloat | None = None
+
+class WatchSettings(BaseSettings):
+    WATCH_DB_PATH: str = "/tmp/gtfs-validator-watch.sqlite3"
+    # Latest report of each watched feed.
+    WATCH_DIR: str = "/tmp/gtfs-validator-watch"
+    # How often a watched URL is checked for changes, unless registered with its own interval.
+    WATCH_INTERVAL_SECONDS: PositiveFloat = 60 * 60
+    WATCH_MIN_INTERVAL_SECONDS: PositiveFloat = 5 * 60
+    # Each check is moved by up to this fraction of its interval, so checks drift apart.
+    WATCH_JITTER: NonNegativeFloat = 0.1
+    # Watched URLs checked at the same time.
+    WATCH_CONCURRENCY: PositiveInt = 2
+    WATCH_MAX_PER_KEY: PositiveInt = 50
+
+class WorkspaceSettings(BaseSettings):
+    # Scratch space for feeds and validator output; point it at a tmpfs or local SSD mount.
+    WORKSPACE_DIR: str = "/tmp/gtfs-validator-work"
+    # Scratch space reserved by all requests together, and by one request. 0 means no limit.
+    WORKSPACE_MAX_BYTES: NonNegativeInt = 0
+    WORKSPACE_REQUEST_MAX_BYTES: NonNegativeInt = 0
+    # Validations are refused while the workspace's filesystem would have less free space than this.
+    WORKSPACE_MIN_FREE_BYTES: NonNegativeInt = 256 * 1024 * 1024
+    # Space reserved per byte of feed: the feed itself plus the reports written next to it.
+    WORKSPACE_BYTES_PER_FEED_BYTE: PositiveFloat = 3
+    # How often what the workspaces hold on disk is measured again, beyond their reservations.
+    WORKSPACE_SCAN_INTERVAL_SECONDS: PositiveFloat = 30
 
 app_settings = AppSettings()
+validator_settings = ValidatorSettings()
+cache_settings = CacheSettings()
+fetch_settings = FetchSettings()
+upload_settings = UploadSettings()
+auth_settings = AuthSettings()
+job_settings = JobSettings()
+batch_settings = BatchSettings()
+admission_settings = AdmissionSettings()
+triage_settings = TriageSettings()
+usage_settings = UsageSettings()
+watch_settings = WatchSettings()
+workspace_settings = WorkspaceSettings()
 mail_settings: Optional[MailSettings] = MailSettings() if not app_settings.DISABLE_EMAIL_AND_API_KEY else None
 rate_limit_settings: Optional[RateLimitSettings] = RateLimitSettings() if not app_settings.DISABLE_EMAIL_AND_API_KEY else None
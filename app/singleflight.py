@@ -0,0 +1,117 @@
+import asyncio
+import errno
+import logging
+import os
+import shutil
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import (
+    Generic,
+    TypeVar,
+)
+
+from app.workspace import workspace
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+DisconnectCheck = Callable[[], Awaitable[bool]]
+
+
+class Flight:
+    """One run of shared work, and the requests waiting for it."""
+
+    def __init__(self, scratch: Path) -> None:
+        # Owned by the flight rather than by any one request, so the result outlives
+        # whichever request started it; removed once the last waiter is done with it.
+        self.scratch = scratch
+        self.task: asyncio.Future | None = None
+        self.waiters: list[DisconnectCheck | None] = []
+        # Added by the work, e.g. to release what it holds for the waiters; run with the
+        # scratch directory's removal.
+        self.cleanups: list[Callable[[], None]] = []
+
+    @staticmethod
+    def link(src: Path, dest: Path) -> None:
+        """Give a waiter its own name for a file the work wrote, before the scratch goes."""
+        try:
+            os.link(src, dest)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            shutil.copyfile(src, dest)
+
+    def release(self) -> None:
+        for cleanup in self.cleanups:
+            cleanup()
+        workspace.release(self.scratch)
+
+    async def abandoned(self) -> bool:
+        """True once every waiter's client has disconnected; a disconnect check for the work."""
+        for is_disconnected in list(self.waiters):
+            if is_disconnected is None or not await is_disconnected():
+                return False
+        return True
+
+
+class SingleFlight(Generic[T]):
+    """Coalesces identical concurrent work: callers joining with the same key while the
+    work is in flight wait for the same run instead of starting their own.
+
+    The work runs as its own task, so a waiter going away does not cancel it for the
+    others; it is cancelled only when every waiter has gone. Work that has finished is
+    not shared with later callers.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._flights: dict[str, Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _land(self, key: str, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    @asynccontextmanager
+    async def join(
+        self,
+        key: str,
+        work: Callable[[Flight], Awaitable[T]],
+        is_disconnected: DisconnectCheck | None = None,
+    ) -> AsyncIterator[tuple[T, Flight, bool]]:
+        """Run `work(flight)` for `key`, or wait for the run already in flight.
+
+        Yields the result, the flight (whose scratch directory holds anything the work
+        wrote) and whether this caller started the work. The scratch directory stays,
+        and the flight's cleanups wait, until every waiter has left the context.
+        """
+        flight = self._flights.get(key)
+        leader = flight is None
+        if flight is None:
+            flight = started = Flight(workspace.create(f"flight-{self.name}"))
+            started.task = asyncio.ensure_future(work(started))
+            started.task.add_done_callback(lambda _: self._land(key, started))
+            self._flights[key] = started
+        else:
+            logger.info(f"Joining {self.name} already in flight for {key}")
+        # Set as the flight is started, just above or by the caller that started it.
+        task = flight.task
+        assert task is not None
+        flight.waiters.append(is_disconnected)
+        try:
+            result = await asyncio.shield(task)
+            yield result, flight, leader
+        finally:
+            flight.waiters.remove(is_disconnected)
+            if not flight.waiters:
+                self._land(key, flight)
+                if task.done():
+                    flight.release()
+                else:
+                    # Nobody is left to wait for it.
+                    task.cancel()
+                    landed = flight
+                    task.add_done_callback(lambda _: landed.release())
@@ -0,0 +1,78 @@
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import time
+from collections.abc import Awaitable, Callable, Iterator, Mapping
+from contextlib import contextmanager
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age() -> float | None:
+    """Seconds since this process started, from /proc (None elsewhere)."""
+    try:
+        with open("/proc/self/stat") as f:
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - started_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+# Process start on the monotonic clock; falls back to when this module was imported.
+PROCESS_STARTED = time.monotonic() - (_process_age() or 0.0)
+
+# Seconds taken by each timed step: lazy imports, client warm-ups, startup phases.
+timings: dict[str, float] = {}
+# Seconds after process start at which each milestone was reached.
+milestones: dict[str, float] = {}
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.monotonic() - started, 4)
+
+
+def mark(name: str) -> None:
+    milestones[name] = round(time.monotonic() - PROCESS_STARTED, 4)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import `name` on first use, recording how long the import took."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with timed(f"import {name}"):
+        return importlib.import_module(name)
+
+
+async def warm_up(steps: Mapping[str, Callable[[], Awaitable[object]]]) -> None:
+    """Run warm-up steps concurrently; a failing step is logged and left to first use."""
+
+    async def run(name: str, step: Callable[[], Awaitable[object]]) -> None:
+        try:
+            with timed(f"warm-up {name}"):
+                await step()
+        except Exception as e:  # noqa: BLE001  (a step that fails is left to first use)
+            logger.warning(f"Warm-up of {name} failed: {e}")
+
+    await asyncio.gather(*(run(name, step) for name, step in steps.items()))
+    mark("warm")
+    logger.info(f"Warm-up finished {milestones['warm']}s after process start.")
+
+
+def report() -> dict:
+    return {
+        "uptime_seconds": round(time.monotonic() - PROCESS_STARTED, 3),
+        "warm": "warm" in milestones,
+        "milestones": milestones,
+        "timings": dict(sorted(timings.items(), key=lambda item: -item[1])),
+    }
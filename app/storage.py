@@ -0,0 +1,196 @@
+import asyncio
+import datetime
+import hashlib
+import re
+import threading
+import uuid
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from app.settings import app_settings
+from app.startup import lazy_import
+
+Doc = dict[str, Any]
+
+# API keys are issued as "<key_id>.<secret>", where key_id is the api_keys document
+# ID, so a key resolves with one document read and one hash check.
+KEY_ID_SEPARATOR = "."
+_KEY_ID = re.compile(r"[0-9a-f]{32}")
+# Keys issued before key IDs were embedded: secrets.token_urlsafe(32).
+_LEGACY_KEY = re.compile(r"[A-Za-z0-9_-]{43}")
+
+
+def new_api_key_value(secret: str) -> str:
+    return f"{uuid.uuid4().hex}{KEY_ID_SEPARATOR}{secret}"
+
+
+def parse_key_id(api_key: str) -> str | None:
+    """The key ID embedded in `api_key`, or None if it does not have one."""
+    key_id, sep, secret = api_key.partition(KEY_ID_SEPARATOR)
+    return key_id if sep and secret and _KEY_ID.fullmatch(key_id) else None
+
+
+def is_legacy_key(api_key: str) -> bool:
+    return _LEGACY_KEY.fullmatch(api_key) is not None
+
+
+class Store(Protocol):
+    """Users, API keys and verification tokens, as used by app.auth."""
+
+    async def get_user(self, email: str) -> Doc | None: ...
+
+    async def create_user(self, email: str, is_verified: bool = False) -> Doc: ...
+
+    async def set_user_verified(self, email: str) -> None: ...
+
+    async def delete_user(self, email: str) -> None: ...
+
+    async def create_api_key(self, email: str, api_key: str) -> str: ...
+
+    async def resolve_api_key(self, api_key: str) -> tuple[Doc | None, Doc | None]: ...
+
+    async def revoke_api_key(self, key_id: str) -> None: ...
+
+    async def create_verification_token(
+        self, email: str, token: str, expires_at: datetime.datetime
+    ) -> str: ...
+
+    async def get_verification_token(
+        self, token: str
+    ) -> tuple[Doc | None, str | None]: ...
+
+    async def mark_token_used(self, token_id: str) -> None: ...
+
+    async def add_usage(
+        self, period: str, deltas: dict[str, dict[str, float]]
+    ) -> None: ...
+
+    async def get_usage(self, key_id: str, period: str) -> dict[str, float] | None: ...
+
+
+def _digest(api_key: str) -> str:
+    # Keys are long random tokens, so a fast hash is enough for an in-process index.
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class MemoryStore:
+    """Process-local store for local or no-auth deployments; nothing leaves the process."""
+
+    def __init__(self) -> None:
+        self.users: dict[str, Doc] = {}
+        self.api_keys: dict[str, Doc] = {}
+        self.key_ids_by_digest: dict[str, str] = {}
+        self.tokens: dict[str, Doc] = {}
+        self.usage: dict[tuple[str, str], dict[str, float]] = {}
+
+    async def get_user(self, email: str) -> Doc | None:
+        user = self.users.get(email.lower())
+        return dict(user) if user else None
+
+    async def create_user(self, email: str, is_verified: bool = False) -> Doc:
+        user_data = {
+            "email": email,
+            "is_verified": is_verified,
+            "created_at": datetime.datetime.now(datetime.UTC),
+        }
+        self.users[email.lower()] = user_data
+        return dict(user_data)
+
+    async def set_user_verified(self, email: str) -> None:
+        self.users[email.lower()]["is_verified"] = True
+
+    async def delete_user(self, email: str) -> None:
+        self.users.pop(email.lower(), None)
+
+    async def create_api_key(self, email: str, api_key: str) -> str:
+        key_id = parse_key_id(api_key) or str(uuid.uuid4())
+        self.api_keys[key_id] = {
+            "user_email": email.lower(),
+            "created_at": datetime.datetime.now(datetime.UTC),
+            "is_active": True,
+        }
+        self.key_ids_by_digest[_digest(api_key)] = key_id
+        return key_id
+
+    async def resolve_api_key(self, api_key: str) -> tuple[Doc | None, Doc | None]:
+        key_id = self.key_ids_by_digest.get(_digest(api_key))
+        data = self.api_keys.get(key_id) if key_id else None
+        if not data or not data["is_active"]:
+            return None, None
+        return {**data, "key_id": key_id}, await self.get_user(data["user_email"])
+
+    async def revoke_api_key(self, key_id: str) -> None:
+        if key_id in self.api_keys:
+            self.api_keys[key_id]["is_active"] = False
+
+    async def create_verification_token(
+        self, email: str, token: str, expires_at: datetime.datetime
+    ) -> str:
+        token_id = str(uuid.uuid4())
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=datetime.UTC)
+        self.tokens[token_id] = {
+            "user_email": email.lower(),
+            "token": token,
+            "created_at": datetime.datetime.now(datetime.UTC),
+            "expires_at": expires_at,
+            "is_used": False,
+        }
+        return token_id
+
+    async def get_verification_token(self, token: str) -> tuple[Doc | None, str | None]:
+        for token_id, data in self.tokens.items():
+            if data["token"] == token and not data["is_used"]:
+                return dict(data), token_id
+        return None, None
+
+    async def mark_token_used(self, token_id: str) -> None:
+        self.tokens[token_id]["is_used"] = True
+
+    async def add_usage(self, period: str, deltas: dict[str, dict[str, float]]) -> None:
+        for key_id, delta in deltas.items():
+            counters = self.usage.setdefault((key_id, period), {})
+            for name, value in delta.items():
+                counters[name] = counters.get(name, 0) + value
+
+    async def get_usage(self, key_id: str, period: str) -> dict[str, float] | None:
+        counters = self.usage.get((key_id, period))
+        return dict(counters) if counters else None
+
+
+def store_backend() -> str:
+    return app_settings.STORAGE_BACKEND or (
+        "memory" if app_settings.DISABLE_EMAIL_AND_API_KEY else "firestore"
+    )
+
+
+def create_store() -> Store:
+    if store_backend() == "memory":
+        return MemoryStore()
+    # Imported here: google-cloud-firestore is the heaviest import in the service.
+    return lazy_import("app.firestore_db").FirestoreStore()
+
+
+class LazyStore:
+    """The configured store, created on first use so that importing app.auth stays cheap."""
+
+    def __init__(self, factory: Callable[[], Store] = create_store) -> None:
+        self._factory = factory
+        self._store: Store | None = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Store:
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._factory()
+        return self._store
+
+    async def warm(self) -> None:
+        """Do the slow imports in a thread, then create the client on the event loop."""
+        if store_backend() == "firestore":
+            await asyncio.to_thread(lazy_import, "app.firestore_db")
+        self.load()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
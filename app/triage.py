@@ -0,0 +1,367 @@
+import csv
+import io
+import itertools
+import json
+import zipfile
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass, field
+from operator import itemgetter
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+# Required files and, per file, its required columns (GTFS reference).
+REQUIRED_FILES = (
+    "agency.txt",
+    "stops.txt",
+    "routes.txt",
+    "trips.txt",
+    "stop_times.txt",
+)
+REQUIRED_COLUMNS: dict[str, tuple[str, ...]] = {
+    "agency.txt": ("agency_name", "agency_url", "agency_timezone"),
+    "stops.txt": ("stop_id",),
+    "routes.txt": ("route_id", "route_type"),
+    "trips.txt": ("route_id", "service_id", "trip_id"),
+    "stop_times.txt": ("trip_id", "stop_sequence"),
+    "calendar.txt": (
+        "service_id",
+        "monday",
+        "tuesday",
+        "wednesday",
+        "thursday",
+        "friday",
+        "saturday",
+        "sunday",
+        "start_date",
+        "end_date",
+    ),
+    "calendar_dates.txt": ("service_id", "date", "exception_type"),
+}
+# Primary keys checked for duplicates, and (child file, column, parent file, column) references.
+PRIMARY_KEYS = {
+    "stops.txt": "stop_id",
+    "routes.txt": "route_id",
+    "trips.txt": "trip_id",
+}
+FOREIGN_KEYS = (
+    ("trips.txt", "route_id", "routes.txt", "route_id"),
+    ("stop_times.txt", "trip_id", "trips.txt", "trip_id"),
+    ("stop_times.txt", "stop_id", "stops.txt", "stop_id"),
+)
+# Notices that make a full validation pointless: the feed cannot be loaded as GTFS.
+FATAL_CODES = {
+    "missing_required_file",
+    "missing_calendar_and_calendar_date_files",
+    "empty_file",
+    "missing_required_column",
+}
+MAX_SAMPLE_NOTICES = 100
+# Text decoded and checked together by the key checks, and csv rows read together
+# where the text cannot simply be split on commas.
+BLOCK_CHARS = 4 * 1024 * 1024
+BLOCK_ROWS = 64 * 1024
+SEVERITY_COUNTS = {"ERROR": "Errors", "WARNING": "Warnings", "INFO": "Infos"}
+
+_templates = Environment(
+    loader=FileSystemLoader(Path(__file__).parent / "templates"),
+    autoescape=select_autoescape(["html"]),
+)
+
+
+@dataclass
+class _Notice:
+    severity: str
+    total: int = 0
+    samples: list[dict] = field(default_factory=list)
+
+
+class Notices:
+    """Notices grouped by code, in report.json's shape."""
+
+    def __init__(self) -> None:
+        self._by_code: dict[str, _Notice] = {}
+
+    def add(self, code: str, severity: str, **sample) -> None:
+        notice = self._by_code.setdefault(code, _Notice(severity))
+        notice.total += 1
+        if len(notice.samples) < MAX_SAMPLE_NOTICES:
+            notice.samples.append(sample)
+
+    def codes(self) -> set[str]:
+        return set(self._by_code)
+
+    def as_list(self) -> list[dict]:
+        return [
+            {
+                "code": code,
+                "severity": n.severity,
+                "totalNotices": n.total,
+                "sampleNotices": n.samples,
+            }
+            for code, n in self._by_code.items()
+        ]
+
+
+@dataclass
+class TriageResult:
+    mode: str
+    files: list[str]
+    notices: list[dict]
+
+    @property
+    def fatal(self) -> bool:
+        return any(notice["code"] in FATAL_CODES for notice in self.notices)
+
+    def report(self) -> dict:
+        counts = {"Notices": 0, "Errors": 0, "Warnings": 0, "Infos": 0}
+        for notice in self.notices:
+            counts["Notices"] += notice["totalNotices"]
+            counts[SEVERITY_COUNTS[notice["severity"]]] += notice["totalNotices"]
+        return {
+            "summary": {
+                "validationMode": self.mode,
+                "files": self.files,
+                "counts": counts,
+            },
+            "notices": self.notices,
+        }
+
+
+def _rows(archive: zipfile.ZipFile, name: str) -> Iterator[list[str]]:
+    with archive.open(name) as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+        yield from csv.reader(text)
+
+
+def _check_header(name: str, header: list[str], notices: Notices) -> None:
+    seen: set[str] = set()
+    for index, column in enumerate(header):
+        if not column:
+            notices.add("empty_column_name", "ERROR", filename=name, index=index)
+        elif column in seen:
+            notices.add("duplicated_column", "ERROR", filename=name, fieldName=column)
+        seen.add(column)
+    for column in REQUIRED_COLUMNS.get(name, ()):
+        if column not in seen:
+            notices.add(
+                "missing_required_column", "ERROR", filename=name, fieldName=column
+            )
+
+
+def _columns(
+    archive: zipfile.ZipFile, name: str, columns: tuple[str, ...], notices: Notices
+) -> Iterator[tuple[Sequence[int], list[list[str]]]]:
+    """Yield blocks of `name`'s rows as (csvRowNumbers, one list of values per column).
+
+    The file is decoded in blocks of BLOCK_CHARS. A block with no quotes whose lines all
+    have the header's width is split into fields with one str.split, and each column
+    taken as a slice of them: no Python code runs per row and no row lists are built.
+    Any other block goes through csv.reader, and the whole rest of the file once a quote
+    turns up, as quoted fields may span lines. Absent columns read as "".
+    """
+    with archive.open(name) as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+        header = [column.strip() for column in next(csv.reader(text), [])]
+        width = len(header)
+        indexes = [header.index(c) if c in header else None for c in columns]
+        number = 2
+        while chunk := text.read(BLOCK_CHARS):
+            chunk += text.readline()
+            if '"' in chunk:
+                rows = csv.reader(itertools.chain(io.StringIO(chunk, newline=""), text))
+                while block := list(itertools.islice(rows, BLOCK_ROWS)):
+                    numbers = range(number, number + len(block))
+                    number += len(block)
+                    yield _pick(name, numbers, block, width, indexes, notices)
+                return
+            lines = chunk.replace("\r\n", "\n").removesuffix("\n").split("\n")
+            if (
+                "\r" in chunk.replace("\r\n", "")
+                or set(map(str.count, lines, itertools.repeat(","))) != {width - 1}
+                or (width == 1 and "" in lines)
+            ):
+                block = list(csv.reader(io.StringIO(chunk, newline="")))
+                numbers = range(number, number + len(block))
+                number += len(block)
+                yield _pick(name, numbers, block, width, indexes, notices)
+                continue
+            numbers = range(number, number + len(lines))
+            number += len(lines)
+            fields = ",".join(lines).split(",")
+            yield (
+                numbers,
+                [
+                    list(map(str.strip, fields[i::width]))
+                    if i is not None
+                    else [""] * len(lines)
+                    for i in indexes
+                ],
+            )
+
+
+def _pick(
+    name: str,
+    numbers: Sequence[int],
+    block: list[list[str]],
+    width: int,
+    indexes: list[int | None],
+    notices: Notices,
+) -> tuple[Sequence[int], list[list[str]]]:
+    """The `indexes` columns of csv rows `block`, once those of the wrong width are dealt with."""
+    if any(length != width for length in set(map(len, block))):
+        numbers, block = _regular_rows(name, numbers, block, width, notices)
+    return numbers, [
+        list(map(str.strip, map(itemgetter(i), block)))
+        if i is not None
+        else [""] * len(block)
+        for i in indexes
+    ]
+
+
+def _regular_rows(
+    name: str,
+    numbers: Sequence[int],
+    block: list[list[str]],
+    width: int,
+    notices: Notices,
+) -> tuple[list[int], list[list[str]]]:
+    """Drop the blank rows of `block`, report the others of the wrong length and pad them."""
+    kept_numbers, kept = [], []
+    for number, row in zip(numbers, block):
+        if len(row) != width:
+            if row == [] or row == [""]:
+                continue
+            notices.add(
+                "invalid_row_length",
+                "ERROR",
+                filename=name,
+                csvRowNumber=number,
+                rowLength=len(row),
+                headerCount=width,
+            )
+            row = (row + [""] * width)[:width]
+        kept_numbers.append(number)
+        kept.append(row)
+    return kept_numbers, kept
+
+
+def _check_references(
+    archive: zipfile.ZipFile, names: set[str], notices: Notices
+) -> None:
+    """Duplicate primary keys and dangling foreign keys, as set operations over key columns.
+
+    Rows are only gone through one by one, to locate them, in blocks where a check fails.
+    """
+    keys: dict[tuple[str, str], set[str]] = {}
+    needed = {(parent, column) for _, _, parent, column in FOREIGN_KEYS}
+    for name, column in PRIMARY_KEYS.items():
+        values: set[str] = set()
+        for numbers, (block,) in _columns(archive, name, (column,), notices):
+            unique = set(block)
+            if len(unique) == len(block) and unique.isdisjoint(values):
+                values |= unique
+                continue
+            for number, value in zip(numbers, block):
+                if value in values:
+                    notices.add(
+                        "duplicate_key",
+                        "ERROR",
+                        filename=name,
+                        csvRowNumber=number,
+                        fieldName1=column,
+                        fieldValue1=value,
+                    )
+                values.add(value)
+        if (name, column) in needed:
+            keys[name, column] = values
+
+    services: set[str] = set()
+    for name in ("calendar.txt", "calendar_dates.txt"):
+        if name in names:
+            for _, (block,) in _columns(archive, name, ("service_id",), notices):
+                services.update(block)
+
+    # Each child file is read once, checking all of its references together.
+    children: dict[str, list[tuple[str, str, str]]] = {}
+    for child, child_column, parent, parent_column in FOREIGN_KEYS:
+        children.setdefault(child, []).append((child_column, parent, parent_column))
+    children["trips.txt"].append(("service_id", "calendar.txt", "service_id"))
+    for child, refs in children.items():
+        columns = tuple(ref[0] for ref in refs)
+        parents = [
+            services if parent == "calendar.txt" else keys[parent, parent_column]
+            for _, parent, parent_column in refs
+        ]
+        for numbers, blocks in _columns(archive, child, columns, notices):
+            # (csvRowNumber, reference, value), to report in the order rows are read.
+            violations = []
+            for ref, (block, parent_keys) in enumerate(zip(blocks, parents)):
+                dangling = set(block) - parent_keys
+                # Empty values are the validator's business (e.g. flex stop_times use location_id).
+                dangling.discard("")
+                if dangling:
+                    violations += [
+                        (number, ref, value)
+                        for number, value in zip(numbers, block)
+                        if value in dangling
+                    ]
+            for number, ref, value in sorted(violations):
+                child_column, parent, parent_column = refs[ref]
+                notices.add(
+                    "foreign_key_violation",
+                    "ERROR",
+                    childFilename=child,
+                    childFieldName=child_column,
+                    parentFilename=parent,
+                    parentFieldName=parent_column,
+                    fieldValue=value,
+                    csvRowNumber=number,
+                )
+
+
+def triage(path: str, deep: bool = False) -> TriageResult:
+    """Check a feed for structural problems without the validator.
+
+    Reads the zip's central directory and the header of each file, so it takes
+    milliseconds. With `deep`, also checks primary and foreign keys, which reads the
+    key columns of stops, routes, trips, calendars and stop_times.
+    """
+    notices = Notices()
+    with zipfile.ZipFile(path) as archive:
+        entries = {
+            info.filename: info for info in archive.infolist() if not info.is_dir()
+        }
+        names = set(entries)
+        for name in REQUIRED_FILES:
+            if name not in names:
+                notices.add("missing_required_file", "ERROR", filename=name)
+        if "calendar.txt" not in names and "calendar_dates.txt" not in names:
+            notices.add("missing_calendar_and_calendar_date_files", "ERROR")
+        readable = set()
+        for name in sorted(names):
+            if not name.endswith(".txt") or "/" in name:
+                continue
+            header = (
+                next(_rows(archive, name), None) if entries[name].file_size else None
+            )
+            if not header:
+                if name in REQUIRED_COLUMNS:
+                    notices.add("empty_file", "ERROR", filename=name)
+                continue
+            _check_header(name, [column.strip() for column in header], notices)
+            readable.add(name)
+        if deep and not notices.codes() & FATAL_CODES:
+            _check_references(archive, readable, notices)
+    return TriageResult(
+        "quick" if deep else "preflight", sorted(names), notices.as_list()
+    )
+
+
+def write_report(result: TriageResult, dest: Path) -> None:
+    """Write report.json and report.html for `result` into `dest`, like the validator does."""
+    report = result.report()
+    with (dest / "report.json").open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    html = _templates.get_template("triage_report.html").render(report=report)
+    (dest / "report.html").write_text(html, encoding="utf-8")
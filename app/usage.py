@@ -0,0 +1,215 @@
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import asdict, dataclass
+
+from fastapi import HTTPException
+
+from app import auth
+from app.settings import app_settings, usage_settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Usage:
+    validations: int = 0
+    bytes: int = 0
+    cpu_seconds: float = 0.0
+
+    def add(self, other: "Usage") -> None:
+        self.validations += other.validations
+        self.bytes += other.bytes
+        self.cpu_seconds += other.cpu_seconds
+
+    def as_dict(self) -> dict[str, float]:
+        return {**asdict(self), "cpu_seconds": round(self.cpu_seconds, 3)}
+
+
+def current_period() -> str:
+    """Quotas reset monthly (UTC)."""
+    return datetime.datetime.now(datetime.UTC).strftime("%Y-%m")
+
+
+@dataclass
+class _Account:
+    # What the store held when last read, plus what this process has flushed since.
+    stored: Usage
+    loaded_at: float | None
+    # Recorded here but not yet flushed.
+    pending: Usage
+
+
+class UsageTracker:
+    """Per-API-key usage, counted in memory and written to the store in batches.
+
+    `record` only touches a dict, so it adds nothing measurable to a request. A
+    background task flushes the pending deltas every `flush_interval` seconds as one
+    batched write, and `close` drains whatever is left. Quotas are checked against the
+    in-memory total; the stored part is re-read every `refresh_interval` seconds so
+    usage flushed by other instances is picked up.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float,
+        refresh_interval: float,
+        quota_bytes: int | None,
+        quota_cpu_seconds: float | None,
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.quota_bytes = quota_bytes
+        self.quota_cpu_seconds = quota_cpu_seconds
+        self.period = current_period()
+        self._accounts: dict[str, _Account] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def _roll_period(self) -> None:
+        period = current_period()
+        if period != self.period:
+            # Usage not flushed yet is counted in the new period.
+            self.period = period
+            for account in self._accounts.values():
+                account.stored = Usage()
+                account.loaded_at = None
+
+    def _account(self, key_id: str) -> _Account:
+        account = self._accounts.get(key_id)
+        if account is None:
+            account = self._accounts[key_id] = _Account(Usage(), None, Usage())
+        return account
+
+    def record(
+        self,
+        key_id: str | None,
+        validations: int = 0,
+        bytes: int = 0,
+        cpu_seconds: float = 0.0,
+    ) -> None:
+        if not key_id:
+            return
+        self._roll_period()
+        self._account(key_id).pending.add(Usage(validations, bytes, cpu_seconds))
+
+    async def _refresh(self, key_id: str) -> _Account:
+        account = self._account(key_id)
+        if (
+            account.loaded_at is None
+            or time.monotonic() - account.loaded_at > self.refresh_interval
+        ):
+            stored = await auth.store.get_usage(key_id, self.period)
+            account.stored = Usage(**stored) if stored else Usage()
+            account.loaded_at = time.monotonic()
+        return account
+
+    async def get(self, key_id: str) -> Usage:
+        """This period's usage of `key_id`: stored plus not yet flushed."""
+        self._roll_period()
+        account = await self._refresh(key_id)
+        total = Usage()
+        total.add(account.stored)
+        total.add(account.pending)
+        return total
+
+    async def check_quota(self, key_id: str | None) -> None:
+        """Raise a 429 if `key_id` has used up its byte or CPU-time quota this period."""
+        if not key_id or (self.quota_bytes is None and self.quota_cpu_seconds is None):
+            return
+        try:
+            used = await self.get(key_id)
+        except Exception as e:  # noqa: BLE001  (accounting must never take validation down)
+            logger.error(f"Could not read usage of {key_id}: {e}")
+            return
+        if self.quota_bytes is not None and used.bytes >= self.quota_bytes:
+            raise HTTPException(
+                429, f"Monthly quota of {self.quota_bytes} feed bytes used up."
+            )
+        if (
+            self.quota_cpu_seconds is not None
+            and used.cpu_seconds >= self.quota_cpu_seconds
+        ):
+            raise HTTPException(
+                429,
+                f"Monthly quota of {self.quota_cpu_seconds:g} validator CPU seconds used up.",
+            )
+
+    async def flush(self) -> int:
+        """Write all pending usage in one batch; return how many keys were written."""
+        async with self._flush_lock:
+            period = self.period
+            deltas: dict[str, Usage] = {}
+            for key_id, account in self._accounts.items():
+                if account.pending != Usage():
+                    deltas[key_id], account.pending = account.pending, Usage()
+            if not deltas:
+                return 0
+            try:
+                await auth.store.add_usage(
+                    period, {key_id: asdict(delta) for key_id, delta in deltas.items()}
+                )
+            except BaseException:
+                # Put the deltas back for the next flush.
+                for key_id, delta in deltas.items():
+                    self._account(key_id).pending.add(delta)
+                raise
+            for key_id, delta in deltas.items():
+                if key_id in self._accounts:
+                    self._accounts[key_id].stored.add(delta)
+            return len(deltas)
+
+    async def _flusher(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:  # noqa: BLE001  (storage backends raise their own errors)
+                logger.error(f"Flushing usage failed: {e}")
+
+    def start(self) -> None:
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flusher())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            flushed = await self.flush()
+            if flushed:
+                logger.info(f"Flushed usage of {flushed} API keys on shutdown.")
+        except Exception as e:  # noqa: BLE001  (storage backends raise their own errors)
+            logger.error(f"Flushing usage on shutdown failed: {e}")
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "period": self.period,
+            "keys": len(self._accounts),
+            "pending": sum(1 for a in self._accounts.values() if a.pending != Usage()),
+        }
+
+
+def key_id_of(api_key: dict | None) -> str | None:
+    """The key usage is counted against; None for anonymous requests, or when keys are disabled."""
+    if not api_key or app_settings.DISABLE_EMAIL_AND_API_KEY:
+        return None
+    return api_key.get("key_id")
+
+
+def validator_cpu_seconds(resources, started: float) -> float:
+    """CPU time of a validator run from its app.validator.ResourceUsage; pooled runs
+    report none, so their wall time since `started` (time.monotonic()) stands in."""
+    if resources is not None:
+        return resources.cpu_seconds
+    return time.monotonic() - started
+
+
+usage = UsageTracker(
+    usage_settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    usage_settings.USAGE_REFRESH_INTERVAL_SECONDS,
+    usage_settings.USAGE_QUOTA_BYTES,
+    usage_settings.USAGE_QUOTA_CPU_SECONDS,
+)
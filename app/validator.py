@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import tempfile
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO
+
+from fastapi import HTTPException
+
+from app.jvm_profile import cds_archive, feed_size_mb, heap_options, runtime_options
+from app.settings import validator_settings
+
+logger = logging.getLogger(__name__)
+
+DisconnectCheck = Callable[[], Awaitable[bool]]
+
+# How often a running validator is checked for timeout, memory use and client disconnect.
+POLL_SECONDS = 0.5
+# Amount of validator stderr returned to the client when a run fails.
+STDERR_TAIL_BYTES = 64 * 1024
+
+# Bounds the number of one-shot validator processes alive at once; further runs queue here.
+_slots = asyncio.Semaphore(validator_settings.VALIDATOR_MAX_CONCURRENCY)
+# Blocking waits on child processes happen here, never on the event loop.
+_waiters = ThreadPoolExecutor(
+    max_workers=validator_settings.VALIDATOR_MAX_CONCURRENCY,
+    thread_name_prefix="validator-wait",
+)
+
+
+@dataclass
+class ResourceUsage:
+    cpu_seconds: float
+    max_rss_bytes: int
+
+
+def java_options(feed_path: str | None = None) -> list[str]:
+    """Heap, GC and JIT options; sized for `feed_path` when given (one-shot runs)."""
+    feed_mb = feed_size_mb(feed_path) if feed_path else None
+    return [*heap_options(feed_mb), *runtime_options(feed_mb)]
+
+
+def build_command(
+    feed_path: str, work: str, extra_options: Sequence[str] = ()
+) -> list[str]:
+    return [
+        validator_settings.JAVA_BIN,
+        *java_options(feed_path),
+        *extra_options,
+        "-jar",
+        validator_settings.VALIDATOR_JAR,
+        "-i",
+        str(feed_path),
+        "-o",
+        str(work),
+    ]
+
+
+def _rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def kill_process_group(pid: int) -> None:
+    # Validators run in their own session, so this also takes down anything they spawned.
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _read_tail(f) -> str:
+    f.seek(0, os.SEEK_END)
+    f.seek(max(0, f.tell() - STDERR_TAIL_BYTES))
+    return f.read().decode(errors="replace")
+
+
+async def supervise(
+    pid: int, waiter: "asyncio.Future", is_disconnected: DisconnectCheck | None
+) -> str | None:
+    """Wait for `waiter`, killing process `pid` on timeout, memory overrun or disconnect.
+
+    Returns the reason the process was killed, or None if `waiter` finished on its own.
+    """
+    deadline = time.monotonic() + validator_settings.VALIDATOR_TIMEOUT_SECONDS
+    memory_limit = validator_settings.VALIDATOR_MEMORY_LIMIT_MB
+    try:
+        while True:
+            done, _ = await asyncio.wait({waiter}, timeout=POLL_SECONDS)
+            if done:
+                return None
+            reason = None
+            if time.monotonic() > deadline:
+                reason = "timeout"
+            elif memory_limit and (_rss_mb(pid) or 0) > memory_limit:
+                reason = "memory"
+            elif is_disconnected is not None and await is_disconnected():
+                reason = "disconnect"
+            if reason:
+                logger.warning(f"Killing validator pid={pid}: {reason}")
+                kill_process_group(pid)
+                await asyncio.wait({waiter})
+                if not waiter.cancelled():
+                    waiter.exception()  # the kill is the error we report
+                return reason
+    except asyncio.CancelledError:
+        kill_process_group(pid)
+        raise
+
+
+def _wait(proc: subprocess.Popen) -> ResourceUsage:
+    # wait4 rather than proc.wait(), for the child's resource usage.
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KiB on Linux.
+    return ResourceUsage(rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss * 1024)
+
+
+def _start(cmd: list[str]) -> tuple[subprocess.Popen, IO[bytes]]:
+    stderr = tempfile.TemporaryFile()  # noqa: SIM115  (the caller closes it)
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+            start_new_session=True,
+        )
+    except BaseException:
+        stderr.close()
+        raise
+    return proc, stderr
+
+
+def _abandon(starting: asyncio.Future) -> None:
+    # The run was cancelled while its validator was starting; stop it once it has.
+    if starting.cancelled() or starting.exception() is not None:
+        return
+    proc, stderr = starting.result()
+    stderr.close()
+    kill_process_group(proc.pid)
+    _waiters.submit(_wait, proc)
+
+
+def raise_for_kill_reason(reason: str | None) -> None:
+    if reason == "timeout":
+        raise HTTPException(
+            504,
+            f"Validation timed out after {validator_settings.VALIDATOR_TIMEOUT_SECONDS:g}s.",
+        )
+    if reason == "memory":
+        raise HTTPException(
+            500,
+            f"Validator exceeded the memory limit of {validator_settings.VALIDATOR_MEMORY_LIMIT_MB} MB.",
+        )
+    if reason == "disconnect":
+        raise HTTPException(499, "Client disconnected during validation.")
+
+
+async def run_oneshot(
+    feed_path: str, work: str, is_disconnected: DisconnectCheck | None = None
+) -> ResourceUsage:
+    loop = asyncio.get_running_loop()
+    async with _slots:
+        cds_options, cds_tmp = cds_archive.options()
+        cmd = build_command(feed_path, work, cds_options)
+        ok = False
+        try:
+            # Forking off a large parent process takes long enough to stall the loop.
+            starting = asyncio.ensure_future(asyncio.to_thread(_start, cmd))
+            try:
+                proc, stderr = await asyncio.shield(starting)
+            except asyncio.CancelledError:
+                starting.add_done_callback(_abandon)
+                raise
+            with stderr:
+                waiter = loop.run_in_executor(_waiters, _wait, proc)
+                raise_for_kill_reason(
+                    await supervise(proc.pid, waiter, is_disconnected)
+                )
+                if proc.returncode != 0:
+                    raise HTTPException(500, _read_tail(stderr))
+                ok = True
+                return waiter.result()
+        finally:
+            cds_archive.finish(cds_tmp, ok)
+
+
+async def run_validator(
+    feed_path: str, work: str, is_disconnected: DisconnectCheck | None = None
+) -> ResourceUsage | None:
+    """Validate `feed_path` into `work`; returns the JVM's resource usage for one-shot runs."""
+    if validator_settings.VALIDATOR_MODE == "pool":
+        from app.jvm_pool import WorkerUnavailable, pool
+
+        if pool.available():
+            try:
+                await pool.validate(feed_path, work, is_disconnected)
+                return None
+            except WorkerUnavailable as e:
+                logger.warning(
+                    f"JVM pool unavailable ({e}); falling back to one-shot validator."
+                )
+    return await run_oneshot(feed_path, work, is_disconnected)
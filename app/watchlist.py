@@ -0,0 +1,338 @@
+import asyncio
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from fastapi import HTTPException
+
+from app.fetch import fetcher
+from app.pipeline import validate_in_background
+from app.settings import watch_settings
+from app.workspace import pid_alive
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+OK = "ok"
+FAILED = "failed"
+
+# Longest pause between looks at the schedule; new watches wake the scheduler early.
+POLL_SECONDS = 60
+# Watches overdue at startup are checked within this many seconds, not all at once.
+STARTUP_SPREAD_SECONDS = 60
+# Directories of checks in progress, inside the watch's directory.
+CHECK_PREFIX = ".check-"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id TEXT PRIMARY KEY,
+    key_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    interval REAL NOT NULL,
+    status TEXT NOT NULL,
+    feed_sha256 TEXT,
+    report_id TEXT,
+    cache_status TEXT,
+    mode TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    checked_at REAL,
+    changed_at REAL,
+    next_check_at REAL NOT NULL,
+    UNIQUE (key_id, url)
+);
+CREATE INDEX IF NOT EXISTS watches_next_check ON watches (next_check_at);
+CREATE INDEX IF NOT EXISTS watches_url ON watches (url, status);
+"""
+
+
+class Watchlist:
+    """Feed URLs registered by API keys, re-validated in the background when they change.
+
+    A scheduler checks each URL every `interval` seconds (give or take `jitter`), at
+    most `concurrency` at a time. Checks are conditional fetches, so an unchanged feed
+    costs a 304; the validator only runs when the feed's SHA-256 changes. The latest
+    report of each watch is kept in `watch_dir`, where /validate serves it from.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        watch_dir: str,
+        default_interval: float,
+        min_interval: float,
+        jitter: float,
+        concurrency: int,
+        max_per_key: int,
+    ) -> None:
+        self.db_path = db_path
+        self.watch_dir = Path(watch_dir)
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.max_per_key = max_per_key
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._wake = asyncio.Event()
+        self._checking: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.watch_dir.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                self.db_path, check_same_thread=False, isolation_level=None
+            )
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def _update(self, watch_id: str, **fields: Any) -> None:
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(
+            f"UPDATE watches SET {columns} WHERE id = ?", (*fields.values(), watch_id)
+        )
+
+    def _claim_due(self, limit: int) -> list[dict[str, Any]]:
+        """Take up to `limit` due watches for this process, rescheduling their next check.
+
+        Claimed and rescheduled in one statement, so a watch due in several processes
+        is checked by only one of them, and a slow check is not picked twice. The next
+        check is `interval` from now, give or take `jitter`.
+        """
+        now = time.time()
+        rows = self._execute(
+            "UPDATE watches SET next_check_at = ? + interval * (1 + ? * random() / 9223372036854775808.0)"
+            " WHERE id IN (SELECT id FROM watches WHERE next_check_at <= ? ORDER BY next_check_at LIMIT ?)"
+            " RETURNING *",
+            (now, self.jitter, now, limit),
+        )
+        return [dict(row) for row in rows]
+
+    def report_dir(self, watch: dict[str, Any]) -> Path | None:
+        if not watch["feed_sha256"]:
+            return None
+        return self.watch_dir / watch["id"] / watch["feed_sha256"][:16]
+
+    def add(
+        self, key_id: str, url: str, interval: float | None = None
+    ) -> dict[str, Any]:
+        """Watch `url` for `key_id`; its first check runs right away."""
+        interval = interval or self.default_interval
+        if interval < self.min_interval:
+            raise HTTPException(
+                400, f"The interval must be at least {self.min_interval:g} seconds."
+            )
+        existing = self._execute(
+            "UPDATE watches SET interval = ? WHERE key_id = ? AND url = ? RETURNING *",
+            (interval, key_id, url),
+        )
+        if existing:
+            return dict(existing[0])
+        count = self._execute(
+            "SELECT COUNT(*) FROM watches WHERE key_id = ?", (key_id,)
+        )[0][0]
+        if count >= self.max_per_key:
+            raise HTTPException(
+                400, f"An API key may watch at most {self.max_per_key} feeds."
+            )
+        now = time.time()
+        added = self._execute(
+            "INSERT INTO watches (id, key_id, url, interval, status, created_at, next_check_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING *",
+            (uuid.uuid4().hex, key_id, url, interval, PENDING, now, now),
+        )
+        self._wake.set()
+        return dict(added[0])
+
+    def get(self, key_id: str, watch_id: str) -> dict[str, Any] | None:
+        rows = self._execute(
+            "SELECT * FROM watches WHERE id = ? AND key_id = ?", (watch_id, key_id)
+        )
+        return dict(rows[0]) if rows else None
+
+    def list(self, key_id: str) -> list[dict[str, Any]]:
+        rows = self._execute(
+            "SELECT * FROM watches WHERE key_id = ? ORDER BY created_at", (key_id,)
+        )
+        return [dict(row) for row in rows]
+
+    def remove(self, key_id: str, watch_id: str) -> bool:
+        if self.get(key_id, watch_id) is None:
+            return False
+        self._execute("DELETE FROM watches WHERE id = ?", (watch_id,))
+        if watch_id not in self._checking:
+            shutil.rmtree(self.watch_dir / watch_id, ignore_errors=True)
+        return True
+
+    def ready(self, url: str) -> dict[str, Any] | None:
+        """The most recently checked watch of `url` whose report is ready, if any."""
+        rows = self._execute(
+            "SELECT * FROM watches WHERE url = ? AND status = ? ORDER BY checked_at DESC LIMIT 1",
+            (url, OK),
+        )
+        if not rows:
+            return None
+        watch = dict(rows[0])
+        report_dir = self.report_dir(watch)
+        if report_dir is None or not (report_dir / "report.json").exists():
+            return None
+        return watch
+
+    async def check(self, watch: dict[str, Any]) -> None:
+        """Fetch the watched feed and, if it changed, validate it and keep the new report."""
+        # Named after this process, so a restart only removes those of processes that are gone.
+        work = (
+            self.watch_dir
+            / watch["id"]
+            / f"{CHECK_PREFIX}{os.getpid()}-{uuid.uuid4().hex}"
+        )
+        work.mkdir(parents=True)
+        try:
+            feed = work / "feed.zip"
+            fetched = await fetcher.fetch(watch["url"], str(feed))
+            now = time.time()
+            report_dir = self.report_dir(watch)
+            if (
+                fetched.sha256 == watch["feed_sha256"]
+                and report_dir
+                and report_dir.exists()
+            ):
+                self._update(watch["id"], status=OK, error=None, checked_at=now)
+                return
+            cache_status, report_id, mode = await validate_in_background(
+                feed, fetched.sha256, f"watch:{watch['key_id']}", watch["key_id"]
+            )
+            dest = self.watch_dir / watch["id"] / fetched.sha256[:16]
+            await asyncio.to_thread(shutil.rmtree, dest, ignore_errors=True)
+            os.rename(work, dest)
+            self._update(
+                watch["id"],
+                status=OK,
+                error=None,
+                feed_sha256=fetched.sha256,
+                report_id=report_id,
+                cache_status=cache_status,
+                mode=mode,
+                checked_at=now,
+                changed_at=now,
+            )
+            # Keep the previous report too: a response may still be reading it.
+            keep = {dest.name, report_dir.name if report_dir else None}
+            for path in (self.watch_dir / watch["id"]).iterdir():
+                if path.name not in keep and not path.name.startswith("."):
+                    await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
+            logger.info(f"Watched feed {watch['url']} changed; new report ready.")
+        finally:
+            if work.exists():
+                await asyncio.to_thread(shutil.rmtree, work, ignore_errors=True)
+
+    async def _run_check(self, watch: dict[str, Any], slots: asyncio.Semaphore) -> None:
+        try:
+            async with slots:
+                await self.check(watch)
+        except HTTPException as e:
+            logger.info(f"Check of watched feed {watch['url']} failed: {e.detail}")
+            self._update(
+                watch["id"], status=FAILED, error=str(e.detail), checked_at=time.time()
+            )
+        except Exception as e:  # noqa: BLE001  (whatever went wrong, the check is failed)
+            logger.error(f"Check of watched feed {watch['url']} failed: {e}")
+            self._update(
+                watch["id"],
+                status=FAILED,
+                error="Internal error.",
+                checked_at=time.time(),
+            )
+        finally:
+            self._checking.discard(watch["id"])
+            # Removed while it was being checked.
+            if not self._execute("SELECT 1 FROM watches WHERE id = ?", (watch["id"],)):
+                shutil.rmtree(self.watch_dir / watch["id"], ignore_errors=True)
+
+    async def _scheduler(self) -> None:
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                self._wake.clear()
+                # A few checks may wait for a slot, so one finishing starts the next at once.
+                free = self.concurrency * 2 - len(tasks)
+                for watch in self._claim_due(max(free, 0)):
+                    if watch["id"] in self._checking:
+                        continue
+                    self._checking.add(watch["id"])
+                    task = asyncio.create_task(self._run_check(watch, slots))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    task.add_done_callback(lambda _: self._wake.set())
+                nearest = self._execute("SELECT MIN(next_check_at) FROM watches")[0][0]
+                if nearest is None or len(tasks) >= self.concurrency * 2:
+                    # Nothing to schedule until a watch is added or a check finishes.
+                    timeout = POLL_SECONDS
+                else:
+                    timeout = min(max(nearest - time.time(), 0.1), POLL_SECONDS)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except TimeoutError:
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._checking = set()
+        now = time.time()
+        overdue = self._execute(
+            "SELECT id, interval FROM watches WHERE next_check_at < ?", (now,)
+        )
+        for row in overdue:
+            spread = min(row["interval"], STARTUP_SPREAD_SECONDS)
+            self._update(row["id"], next_check_at=now + random.uniform(0, spread))
+        # Half-finished checks of processes that are gone; nothing runs here yet, so
+        # those named after this process's PID are a previous process's too.
+        for path in self.watch_dir.glob(f"*/{CHECK_PREFIX}*"):
+            pid = path.name[len(CHECK_PREFIX) :].partition("-")[0]
+            if pid.isdigit() and int(pid) != os.getpid() and pid_alive(int(pid)):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+        self._task = asyncio.create_task(self._scheduler())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+watchlist = Watchlist(
+    watch_settings.WATCH_DB_PATH,
+    watch_settings.WATCH_DIR,
+    watch_settings.WATCH_INTERVAL_SECONDS,
+    watch_settings.WATCH_MIN_INTERVAL_SECONDS,
+    watch_settings.WATCH_JITTER,
+    watch_settings.WATCH_CONCURRENCY,
+    watch_settings.WATCH_MAX_PER_KEY,
+)
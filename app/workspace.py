@@ -0,0 +1,295 @@
+import fcntl
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from app.admission import admission
+from app.settings import workspace_settings
+
+logger = logging.getLogger(__name__)
+
+# In the root: one file per worker process, named `<pid>-<id>`, holding the bytes reserved for each of its
+# workspaces, readable by the others; kept apart from the workspaces, whose files are
+# linked and moved.
+RESERVATIONS_DIR = ".reserved"
+# In the root: held while a reservation is checked against all workspaces and recorded.
+LOCK_FILE = ".lock"
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Workspace:
+    """Scratch directories for feeds and validator output, under one configurable root.
+
+    Directories are named `<pid>-<prefix>-<id>`, so at startup those of processes that
+    are gone can be removed without touching other workers'. Space is reserved before
+    anything is written (an upload, a download, a validator run) and refused, like a
+    full admission queue, when the root's quota or free space would run out. Quota and
+    free space are checked against every worker's reservations, plus whatever their
+    workspaces held beyond them when the disk was last scanned. Reserving costs a few
+    small file reads; the scan of the disk and the deletion of directories happen on a
+    background thread rather than on the request path.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        request_max_bytes: int,
+        min_free_bytes: int,
+        bytes_per_feed_byte: float,
+        scan_interval: float = 30,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.request_max_bytes = request_max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.bytes_per_feed_byte = bytes_per_feed_byte
+        self.scan_interval = scan_interval
+        self.deleted = 0
+        self.refused = 0
+        self._reservations: dict[str, int] = {}
+        self._id = f"{os.getpid()}-{uuid.uuid4().hex}"
+        # Bytes each workspace held at the last scan of the disk.
+        self._on_disk: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._pending: queue.Queue[Path | None] = queue.Queue()
+        self._reaper: threading.Thread | None = None
+
+    def create(self, prefix: str) -> Path:
+        (self.root / RESERVATIONS_DIR).mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{os.getpid()}-{prefix}-{uuid.uuid4().hex}"
+        path.mkdir()
+        with self._lock:
+            self._reservations[path.name] = 0
+        return path
+
+    @contextmanager
+    def _root_locked(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with (self.root / LOCK_FILE).open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    @staticmethod
+    def _size(path: Path, seen: set[tuple[int, int]]) -> int:
+        size = 0
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    st = os.lstat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                # Feeds and reports are hard-linked between workspaces; count them once.
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    size += st.st_size
+        return size
+
+    def scan(self) -> None:
+        """Measure what every workspace holds on disk; run by the background thread."""
+        if not self.root.exists():
+            return
+        on_disk = {}
+        seen: set[tuple[int, int]] = set()
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                continue
+            on_disk[entry.name] = self._size(Path(entry.path), seen)
+        with self._lock:
+            self._on_disk = on_disk
+
+    def _reserved(self) -> dict[str, int]:
+        """Bytes reserved for each workspace of every worker process that still runs."""
+        with self._lock:
+            reserved = dict(self._reservations)
+        for path in (self.root / RESERVATIONS_DIR).glob("[0-9]*"):
+            pid, _, _ = path.name.partition("-")
+            if path.name == self._id or not pid.isdigit() or not pid_alive(int(pid)):
+                continue
+            try:
+                reserved.update(json.loads(path.read_text()))
+            except (FileNotFoundError, ValueError):
+                continue
+        return reserved
+
+    def _publish(self) -> None:
+        # Replaced whole, so other processes never read it half-written.
+        path = self.root / RESERVATIONS_DIR / self._id
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(self._reservations))
+        os.replace(tmp, path)
+
+    def usage(self) -> tuple[int, int]:
+        """Bytes held or reserved by all workspaces, and bytes reserved but not yet written.
+
+        What is on disk is as of the last scan.
+        """
+        reserved = self._reserved()
+        with self._lock:
+            on_disk = dict(self._on_disk)
+        used = pending = sum(reserved.values())
+        for name, nbytes in on_disk.items():
+            used += max(nbytes - reserved.get(name, 0), 0)
+            pending -= min(nbytes, reserved.get(name, 0))
+        return used, pending
+
+    def reserve(self, path: Path, nbytes: int) -> None:
+        """Reserve `nbytes` more for the workspace at `path`, or refuse with 413 or 503."""
+        with self._root_locked():
+            total = self._reservations.get(path.name, 0) + nbytes
+            if self.request_max_bytes and total > self.request_max_bytes:
+                self.refused += 1
+                raise HTTPException(
+                    413,
+                    f"The feed needs more than the {self.request_max_bytes} bytes of scratch space allowed.",
+                )
+            full = False
+            if self.max_bytes or self.min_free_bytes:
+                used, pending = self.usage()
+                full = bool(self.max_bytes) and used + nbytes > self.max_bytes
+                if not full and self.min_free_bytes:
+                    free = shutil.disk_usage(self.root).free - pending
+                    full = free - nbytes < self.min_free_bytes
+            if full:
+                self.refused += 1
+                raise HTTPException(
+                    503,
+                    "Not enough scratch space for this feed right now; try again later.",
+                    headers={"Retry-After": str(admission.retry_after())},
+                )
+            with self._lock:
+                if path.name not in self._reservations:
+                    return
+                self._reservations[path.name] = total
+                self._publish()
+
+    def reserve_for_feed(self, path: Path, feed_size: int) -> None:
+        """Reserve room for validating a feed of `feed_size` bytes: the feed and its reports."""
+        self.reserve(path, int(feed_size * self.bytes_per_feed_byte))
+
+    def release(self, path: str | Path) -> None:
+        """Delete the workspace at `path` in the background; returns immediately."""
+        self._ensure_reaper()
+        self._pending.put(Path(path))
+
+    def _delete(self, path: Path) -> None:
+        shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            self._on_disk.pop(path.name, None)
+            if self._reservations.pop(path.name, None) is not None:
+                self._publish()
+            self.deleted += 1
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                path = self._pending.get(timeout=self.scan_interval)
+            except queue.Empty:
+                # Idle for a while: measure the disk again.
+                try:
+                    self.scan()
+                except OSError as e:
+                    logger.error(f"Scanning workspaces failed: {e}")
+                continue
+            try:
+                if path is None:
+                    return
+                self._delete(path)
+            except OSError as e:
+                logger.error(f"Deleting workspace {path} failed: {e}")
+            finally:
+                self._pending.task_done()
+
+    def _ensure_reaper(self) -> None:
+        with self._lock:
+            if self._reaper is None or not self._reaper.is_alive():
+                self._reaper = threading.Thread(
+                    target=self._reap, name="workspace-reaper", daemon=True
+                )
+                self._reaper.start()
+
+    def _orphaned(self, name: str) -> bool:
+        pid, _, _ = name.partition("-")
+        if pid.isdigit() and int(pid) != os.getpid() and pid_alive(int(pid)):
+            return False
+        return not (
+            pid.isdigit() and int(pid) == os.getpid() and name in self._reservations
+        )
+
+    def clean_orphans(self) -> int:
+        """Delete workspaces left behind by processes that no longer run; return how many."""
+        if not self.root.exists():
+            return 0
+        removed = 0
+        for path in self.root.iterdir():
+            if path.name in (LOCK_FILE, RESERVATIONS_DIR) or not self._orphaned(
+                path.name
+            ):
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            removed += 1
+        for path in (self.root / RESERVATIONS_DIR).glob("[0-9]*"):
+            if path.name != self._id and self._orphaned(path.name):
+                path.unlink(missing_ok=True)
+        if removed:
+            logger.info(f"Removed {removed} orphaned workspaces from {self.root}")
+        return removed
+
+    def start(self) -> None:
+        self.clean_orphans()
+        self.scan()
+        self._ensure_reaper()
+
+    def close(self) -> None:
+        """Finish pending deletions."""
+        if self._reaper is not None and self._reaper.is_alive():
+            self._pending.put(None)
+            self._reaper.join()
+        self._reaper = None
+
+    def stats(self) -> dict[str, int]:
+        used, pending = self.usage()
+        with self._lock:
+            stats = {
+                "workspaces": len(self._reservations),
+                "reserved_bytes": used,
+                "pending_bytes": pending,
+                "max_bytes": self.max_bytes,
+                "pending_deletions": self._pending.qsize(),
+                "deleted": self.deleted,
+                "refused": self.refused,
+            }
+        if self.root.exists():
+            stats["free_bytes"] = shutil.disk_usage(self.root).free
+        return stats
+
+
+workspace = Workspace(
+    workspace_settings.WORKSPACE_DIR,
+    workspace_settings.WORKSPACE_MAX_BYTES,
+    workspace_settings.WORKSPACE_REQUEST_MAX_BYTES,
+    workspace_settings.WORKSPACE_MIN_FREE_BYTES,
+    workspace_settings.WORKSPACE_BYTES_PER_FEED_BYTE,
+    workspace_settings.WORKSPACE_SCAN_INTERVAL_SECONDS,
+)
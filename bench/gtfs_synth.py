@@ -0,0 +1,182 @@
+"""Deterministic synthetic GTFS feeds for benchmarks.
+
+The same arguments always produce a byte-identical zip, so feeds (and their cache
+keys) are stable across runs and machines.
+
+    python -m bench.gtfs_synth out.zip --preset medium --error foreign_key
+"""
+
+import argparse
+import csv
+import io
+import random
+import zipfile
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+# Fixed member timestamps keep the archive bytes reproducible.
+ZIP_DATE_TIME = (2024, 1, 1, 0, 0, 0)
+
+ERRORS = (
+    # stop_times rows that point at stops that do not exist
+    "foreign_key",
+    # calendar.txt left out
+    "missing_calendar",
+    # an empty agency.txt
+    "empty_agency",
+    # stops.txt without its stop_name column
+    "missing_column",
+    # a stop_id used twice
+    "duplicate_stop",
+)
+
+
+@dataclass(frozen=True)
+class FeedSize:
+    stops: int
+    routes: int
+    trips: int
+    stops_per_trip: int
+
+
+PRESETS: dict[str, FeedSize] = {
+    "tiny": FeedSize(stops=10, routes=1, trips=5, stops_per_trip=5),
+    "small": FeedSize(stops=200, routes=10, trips=500, stops_per_trip=20),
+    "medium": FeedSize(stops=2_000, routes=50, trips=10_000, stops_per_trip=30),
+    "large": FeedSize(stops=10_000, routes=200, trips=50_000, stops_per_trip=40),
+    "huge": FeedSize(stops=50_000, routes=1_000, trips=250_000, stops_per_trip=40),
+}
+
+
+def _csv(header: Sequence[str], rows) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue().encode()
+
+
+def _time(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def build_files(
+    size: FeedSize, errors: Sequence[str] = (), seed: int = 0
+) -> dict[str, bytes]:
+    """Return the feed's files as {name: content}."""
+    unknown = set(errors) - set(ERRORS)
+    if unknown:
+        raise ValueError(f"Unknown errors: {sorted(unknown)}")
+    rng = random.Random(seed)
+    files: dict[str, bytes] = {}
+
+    if "empty_agency" in errors:
+        files["agency.txt"] = b""
+    else:
+        files["agency.txt"] = _csv(
+            ("agency_id", "agency_name", "agency_url", "agency_timezone"),
+            [
+                (
+                    "agency",
+                    "Synthetic Transit",
+                    "https://example.com",
+                    "America/Los_Angeles",
+                )
+            ],
+        )
+
+    stops = [
+        (f"S{i}", f"Stop {i}", f"{37 + rng.random():.6f}", f"{-122 - rng.random():.6f}")
+        for i in range(size.stops)
+    ]
+    if "duplicate_stop" in errors and len(stops) > 1:
+        stops[-1] = (stops[0][0], *stops[-1][1:])
+    if "missing_column" in errors:
+        files["stops.txt"] = _csv(
+            ("stop_id", "stop_lat", "stop_lon"), [(s[0], s[2], s[3]) for s in stops]
+        )
+    else:
+        files["stops.txt"] = _csv(
+            ("stop_id", "stop_name", "stop_lat", "stop_lon"), stops
+        )
+
+    files["routes.txt"] = _csv(
+        ("route_id", "agency_id", "route_short_name", "route_type"),
+        [(f"R{i}", "agency", str(i), "3") for i in range(size.routes)],
+    )
+    if "missing_calendar" not in errors:
+        files["calendar.txt"] = _csv(
+            (
+                "service_id",
+                "monday",
+                "tuesday",
+                "wednesday",
+                "thursday",
+                "friday",
+                "saturday",
+                "sunday",
+                "start_date",
+                "end_date",
+            ),
+            [("weekday", 1, 1, 1, 1, 1, 0, 0, "20240101", "20251231")],
+        )
+    files["trips.txt"] = _csv(
+        ("route_id", "service_id", "trip_id"),
+        [
+            (f"R{rng.randrange(size.routes)}", "weekday", f"T{i}")
+            for i in range(size.trips)
+        ],
+    )
+
+    def stop_times():
+        for trip in range(size.trips):
+            start = rng.randrange(5 * 3600, 22 * 3600)
+            first = rng.randrange(size.stops)
+            for seq in range(size.stops_per_trip):
+                stop = (first + seq) % size.stops
+                stop_id = f"S{stop}"
+                if "foreign_key" in errors and trip % 100 == 0 and seq == 0:
+                    stop_id = f"MISSING{trip}"
+                at = _time(start + seq * 120)
+                yield (f"T{trip}", at, at, stop_id, seq + 1)
+
+    files["stop_times.txt"] = _csv(
+        ("trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"),
+        stop_times(),
+    )
+    return files
+
+
+def write_feed(
+    path: str, size: FeedSize, errors: Sequence[str] = (), seed: int = 0
+) -> None:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in sorted(build_files(size, errors, seed).items()):
+            info = zipfile.ZipInfo(name, ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--preset", choices=PRESETS, default="small")
+    parser.add_argument("--stops", type=int)
+    parser.add_argument("--routes", type=int)
+    parser.add_argument("--trips", type=int)
+    parser.add_argument("--stops-per-trip", type=int)
+    parser.add_argument("--error", action="append", choices=ERRORS, default=[])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    preset = PRESETS[args.preset]
+    size = FeedSize(
+        stops=args.stops or preset.stops,
+        routes=args.routes or preset.routes,
+        trips=args.trips or preset.trips,
+        stops_per_trip=args.stops_per_trip or preset.stops_per_trip,
+    )
+    write_feed(args.output, size, args.error, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""Load driver: runs the API locally with the stub validator and measures it.
+
+Starts uvicorn in a subprocess (no auth, no network, stub validator as JAVA_BIN),
+runs each scenario with a fixed number of concurrent clients and writes JSON with
+latency percentiles, throughput and the server's peak RSS (including validator
+children) per scenario. Compare the files across commits.
+
+    python -m bench.load --output bench-results.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import aiohttp
+
+from bench.gtfs_synth import PRESETS, write_feed
+
+ROOT = Path(__file__).resolve().parent.parent
+STUB = Path(__file__).resolve().parent / "stub_validator.py"
+RSS_POLL_SECONDS = 0.05
+
+
+@dataclass
+class Scenario:
+    name: str
+    endpoint: str  # "validate", "batch" or "jobs"
+    format: str
+    preset: str
+    use_cache: bool
+    batch_size: int = 1
+
+
+DEFAULT_SCENARIOS = [
+    Scenario("validate-json-miss", "validate", "json", "small", use_cache=False),
+    Scenario("validate-json-hit", "validate", "json", "small", use_cache=True),
+    Scenario("validate-html-hit", "validate", "html", "small", use_cache=True),
+    Scenario("validate-errors-hit", "validate", "errors", "small", use_cache=True),
+    Scenario("validate-ndjson-hit", "validate", "ndjson", "small", use_cache=True),
+    Scenario(
+        "validate-json-medium-miss", "validate", "json", "medium", use_cache=False
+    ),
+    Scenario(
+        "batch-errors-miss", "batch", "errors", "small", use_cache=False, batch_size=5
+    ),
+    Scenario("jobs-json-miss", "jobs", "json", "small", use_cache=False),
+]
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest rank.
+    rank = max(
+        0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[rank]
+
+
+def _process_tree_rss(root_pid: int) -> int:
+    children: dict[int, list[int]] = {}
+    rss: dict[int, int] = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry.name}/statm") as f:
+                rss[int(entry.name)] = int(f.read().split()[1]) * os.sysconf(
+                    "SC_PAGE_SIZE"
+                )
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry.name))
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class RssSampler(threading.Thread):
+    """Tracks the peak RSS of a process and its descendants."""
+
+    def __init__(self, pid: int) -> None:
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def reset(self) -> None:
+        self.peak = 0
+        self.sample()
+
+    def sample(self) -> None:
+        self.peak = max(self.peak, _process_tree_rss(self.pid))
+
+    def run(self) -> None:
+        while not self.stopped.wait(RSS_POLL_SECONDS):
+            self.sample()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(
+    port: int, scratch: Path, stub_env: dict[str, str], log: str | None
+) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **stub_env,
+        "APP_ENV": "local",
+        "DISABLE_EMAIL_AND_API_KEY": "True",
+        "STORAGE_BACKEND": "memory",
+        "JAVA_BIN": str(STUB),
+        "VALIDATOR_JAR": "stub.jar",
+        "REPORT_CACHE_DIR": str(scratch / "cache"),
+        "FETCH_STORE_DIR": str(scratch / "fetch"),
+        "JOBS_DB_PATH": str(scratch / "jobs.sqlite3"),
+        "JOBS_DIR": str(scratch / "jobs"),
+        "WATCH_DB_PATH": str(scratch / "watch.sqlite3"),
+        "WATCH_DIR": str(scratch / "watch"),
+        "WORKSPACE_DIR": str(scratch / "work"),
+        "RATE_LIMIT_STORAGE_URI": "memory://",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=open(log, "ab") if log else subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(base: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("The API did not start")
+
+
+def _form(feeds: list[bytes], field: str) -> aiohttp.FormData:
+    form = aiohttp.FormData()
+    for i, feed in enumerate(feeds):
+        form.add_field(
+            field, feed, filename=f"feed{i}.zip", content_type="application/zip"
+        )
+    return form
+
+
+def scenario_feeds(scenario: Scenario, requests: int) -> list[bytes]:
+    """Distinct feeds for the scenario, so that misses really are misses.
+
+    Jobs always use the report cache, so a job "miss" needs a new feed per request.
+    A batch needs distinct feeds, since identical ones are validated once.
+    """
+    count = (
+        requests + 1
+        if scenario.endpoint == "jobs" and not scenario.use_cache
+        else scenario.batch_size
+    )
+    feeds = []
+    with tempfile.TemporaryDirectory(prefix="gtfs-bench-feeds-") as scratch:
+        for seed in range(count):
+            path = Path(scratch) / f"{seed}.zip"
+            write_feed(str(path), PRESETS[scenario.preset], seed=seed)
+            feeds.append(path.read_bytes())
+    return feeds
+
+
+async def one_request(
+    session: aiohttp.ClientSession, base: str, scenario: Scenario, feeds: list[bytes]
+) -> bool:
+    cache = str(scenario.use_cache).lower()
+    if scenario.endpoint == "validate":
+        url = f"{base}/validate?format={scenario.format}&use_cache={cache}"
+        async with session.post(url, data=_form(feeds, "file")) as response:
+            await response.read()
+            return response.status == 200
+    if scenario.endpoint == "batch":
+        url = f"{base}/validate/batch?format={scenario.format}&use_cache={cache}"
+        async with session.post(url, data=_form(feeds, "files")) as response:
+            lines = (await response.read()).splitlines()
+            return response.status == 200 and all(
+                json.loads(line)["status"] == "ok" for line in lines
+            )
+    async with session.post(f"{base}/jobs", data=_form(feeds, "file")) as response:
+        if response.status != 202:
+            return False
+        job_id = (await response.json())["id"]
+    while True:
+        async with session.get(f"{base}/jobs/{job_id}") as response:
+            status = (await response.json())["status"]
+        if status == "failed":
+            return False
+        if status == "done":
+            break
+        await asyncio.sleep(0.05)
+    async with session.get(
+        f"{base}/jobs/{job_id}/report?format={scenario.format}"
+    ) as response:
+        await response.read()
+        return response.status == 200
+
+
+async def run_scenario(
+    base: str, scenario: Scenario, concurrency: int, requests: int, sampler: RssSampler
+) -> dict:
+    feeds = scenario_feeds(scenario, requests)
+    per_request = len(feeds) > scenario.batch_size
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        if scenario.use_cache:
+            # Prime the cache so the measured requests are hits.
+            await one_request(session, base, scenario, feeds)
+        elif per_request:
+            # Warm up on a feed that no measured request uses.
+            await one_request(session, base, scenario, feeds[-1:])
+
+        async def client() -> None:
+            nonlocal errors
+            for i in remaining:
+                started = time.perf_counter()
+                try:
+                    ok = await one_request(
+                        session,
+                        base,
+                        scenario,
+                        feeds[i : i + 1] if per_request else feeds,
+                    )
+                except aiohttp.ClientError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        sampler.reset()
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    sampler.sample()
+    latencies.sort()
+    return {
+        **asdict(scenario),
+        "feed_bytes": len(feeds[0]),
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1)
+            if latencies
+            else 0.0,
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        "peak_rss_bytes": sampler.peak,
+    }
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    scenarios = [
+        s for s in DEFAULT_SCENARIOS if not args.scenario or s.name in args.scenario
+    ]
+    stub_env = {
+        "STUB_LATENCY_SECONDS": str(args.stub_latency),
+        "STUB_SECONDS_PER_MB": str(args.stub_seconds_per_mb),
+        "STUB_RSS_MB": str(args.stub_rss_mb),
+    }
+    port = args.port or _free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="gtfs-bench-") as scratch:
+        server = start_server(port, Path(scratch), stub_env, args.server_log)
+        sampler = RssSampler(server.pid)
+        sampler.start()
+        try:
+            await wait_until_up(base)
+            results = []
+            for scenario in scenarios:
+                result = await run_scenario(
+                    base, scenario, args.concurrency, args.requests, sampler
+                )
+                print(
+                    f"{scenario.name}: p50={result['latency_ms']['p50']}ms "
+                    f"p99={result['latency_ms']['p99']}ms {result['throughput_rps']} req/s "
+                    f"errors={result['errors']}",
+                    file=sys.stderr,
+                )
+                results.append(result)
+        finally:
+            sampler.stopped.set()
+            server.terminate()
+            server.wait(timeout=30)
+    return {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "stub": stub_env,
+        },
+        "scenarios": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    parser.add_argument(
+        "--scenario", action="append", choices=[s.name for s in DEFAULT_SCENARIOS]
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-seconds-per-mb", type=float, default=0.2)
+    parser.add_argument("--stub-rss-mb", type=float, default=0)
+    parser.add_argument("--server-log", help="Append the API's log output to this file")
+    args = parser.parse_args(argv)
+    results = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        Path(args.output).write_text(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
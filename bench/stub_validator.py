@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Stand-in for `java -jar gtfs-validator.jar`, for benchmarks without Java.
+
+Use it as JAVA_BIN. It ignores JVM options and the jar, reads the feed given with -i
+and writes report.json, report.html and system_errors.json to the -o directory,
+like the validator does. Behaviour is tuned with environment variables:
+
+    STUB_LATENCY_SECONDS      fixed run time (default 0.5)
+    STUB_SECONDS_PER_MB       extra run time per MB of feed (default 0.2)
+    STUB_RSS_MB               memory to hold while running (default 0)
+    STUB_WARNINGS_PER_FILE    sample notices per feed file, to grow reports (default 5)
+"""
+
+import html
+import json
+import os
+import sys
+import time
+import zipfile
+
+REQUIRED_FILES = (
+    "agency.txt",
+    "stops.txt",
+    "routes.txt",
+    "trips.txt",
+    "stop_times.txt",
+)
+
+
+def _arg(argv, flag):
+    return argv[argv.index(flag) + 1]
+
+
+def _notices(feed: str, warnings_per_file: int):
+    with zipfile.ZipFile(feed) as archive:
+        names = set(archive.namelist())
+        notices = [
+            {
+                "code": "missing_required_file",
+                "severity": "ERROR",
+                "totalNotices": 1,
+                "sampleNotices": [{"filename": name}],
+            }
+            for name in REQUIRED_FILES
+            if name not in names
+        ]
+        for name in sorted(names):
+            if archive.getinfo(name).file_size == 0:
+                notices.append(
+                    {
+                        "code": "empty_file",
+                        "severity": "ERROR",
+                        "totalNotices": 1,
+                        "sampleNotices": [{"filename": name}],
+                    }
+                )
+    notices.append(
+        {
+            "code": "stub_warning",
+            "severity": "WARNING",
+            "totalNotices": warnings_per_file * len(names),
+            "sampleNotices": [
+                {"filename": name, "csvRowNumber": row}
+                for name in sorted(names)
+                for row in range(2, warnings_per_file + 2)
+            ],
+        }
+    )
+    return notices
+
+
+def main(argv) -> int:
+    feed = _arg(argv, "-i")
+    out = _arg(argv, "-o")
+    started = time.monotonic()
+    ballast = bytearray(int(float(os.environ.get("STUB_RSS_MB", "0")) * 1024 * 1024))
+    # Touch every page so the memory is actually resident.
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+    try:
+        notices = _notices(feed, int(os.environ.get("STUB_WARNINGS_PER_FILE", "5")))
+    except zipfile.BadZipFile as e:
+        print(f"Bad feed: {e}", file=sys.stderr)
+        return 1
+    megabytes = os.path.getsize(feed) / (1024 * 1024)
+    latency = float(os.environ.get("STUB_LATENCY_SECONDS", "0.5"))
+    latency += megabytes * float(os.environ.get("STUB_SECONDS_PER_MB", "0.2"))
+    time.sleep(max(0.0, latency - (time.monotonic() - started)))
+    report = {
+        "summary": {
+            "validatorVersion": "stub",
+            "feedInfo": {"sizeMb": round(megabytes, 3)},
+        },
+        "notices": notices,
+    }
+    with open(os.path.join(out, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(out, "report.html"), "w") as f:
+        rows = "".join(
+            f"<tr><td>{html.escape(n['code'])}</td><td>{n['severity']}</td><td>{n['totalNotices']}</td></tr>"
+            for n in notices
+        )
+        f.write(f"<html><body><table>{rows}</table></body></html>\n")
+    with open(os.path.join(out, "system_errors.json"), "w") as f:
+        json.dump({"notices": []}, f)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
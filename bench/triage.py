@@ -0,0 +1,75 @@
+"""Triage timing: runs app.triage on a synthetic feed and measures it.
+
+Writes JSON with the best and median seconds of the preflight (headers only) and deep
+(key columns) checks over a few repeats, and the notices deep triage found. Compare
+the files across commits.
+
+    python -m bench.triage --preset large --error foreign_key
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.triage import triage
+from bench.gtfs_synth import ERRORS, PRESETS, write_feed
+
+
+def time_triage(feed: str, deep: bool, repeats: int) -> dict:
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = triage(feed, deep)
+        seconds.append(time.perf_counter() - started)
+    return {
+        "best_seconds": round(min(seconds), 4),
+        "median_seconds": round(statistics.median(seconds), 4),
+        "notices": {n["code"]: n["totalNotices"] for n in result.notices},
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(prefix="gtfs-bench-") as scratch:
+        feed = str(Path(scratch) / "feed.zip")
+        write_feed(feed, PRESETS[args.preset], args.error)
+        results = {
+            "preflight": time_triage(feed, False, args.repeats),
+            "deep": time_triage(feed, True, args.repeats),
+        }
+        size = Path(feed).stat().st_size
+    for mode, result in results.items():
+        print(f"{mode}: best={result['best_seconds']}s", file=sys.stderr)
+    return {
+        "meta": {
+            "preset": args.preset,
+            "errors": args.error,
+            "feed_bytes": size,
+            "repeats": args.repeats,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        **results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    parser.add_argument("--preset", choices=PRESETS, default="medium")
+    parser.add_argument("--error", action="append", choices=ERRORS, default=[])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+    results = json.dumps(run(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import java.io.BufferedReader;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.jar.JarFile;
+
+/**
+ * Long-lived wrapper around the GTFS validator CLI, used by app/jvm_pool.py.
+ *
+ * <p>Usage: {@code java -cp <validator.jar>:<this dir> ValidatorWorker <validator.jar>}
+ *
+ * <p>Loads the validator's main class once, prints {@code READY}, then reads one job per line
+ * from stdin as {@code <input>\t<output>} and answers each with {@code OK} or
+ * {@code ERR <message>} on stdout. Everything the validator prints goes to stderr so that
+ * stdout only carries the protocol. Calls to {@code System.exit} inside the validator are
+ * trapped and reported as the job's result instead of ending the worker.
+ */
+public final class ValidatorWorker {
+  private static final class ExitTrapped extends SecurityException {
+    final int status;
+
+    ExitTrapped(int status) {
+      super("validator exited with status " + status);
+      this.status = status;
+    }
+  }
+
+  public static void main(String[] args) throws Exception {
+    String mainClass;
+    try (JarFile jar = new JarFile(args[0])) {
+      mainClass = jar.getManifest().getMainAttributes().getValue("Main-Class");
+    }
+    Method entry = Class.forName(mainClass).getMethod("main", String[].class);
+
+    PrintStream protocol =
+        new PrintStream(new FileOutputStream(FileDescriptor.out), true, StandardCharsets.UTF_8);
+    System.setOut(System.err);
+    System.setSecurityManager(
+        new SecurityManager() {
+          @Override
+          public void checkPermission(Permission perm) {}
+
+          @Override
+          public void checkExit(int status) {
+            throw new ExitTrapped(status);
+          }
+        });
+
+    BufferedReader in =
+        new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+    protocol.println("READY");
+    String line;
+    while ((line = in.readLine()) != null) {
+      String[] job = line.split("\t", -1);
+      if (job.length != 2) {
+        protocol.println("ERR malformed job line");
+        continue;
+      }
+      protocol.println(run(entry, job[0], job[1]));
+    }
+  }
+
+  private static String run(Method entry, String input, String output) {
+    try {
+      entry.invoke(null, (Object) new String[] {"-i", input, "-o", output});
+      return "OK";
+    } catch (InvocationTargetException e) {
+      Throwable cause = e.getCause();
+      if (cause instanceof ExitTrapped && ((ExitTrapped) cause).status == 0) {
+        return "OK";
+      }
+      cause.printStackTrace();
+      return "ERR " + String.valueOf(cause).replace('\n', ' ');
+    } catch (Exception e) {
+      e.printStackTrace();
+      return "ERR " + String.valueOf(e).replace('\n', ' ');
+    }
+  }
+}
@@ -0,0 +1,16 @@
+import os
+
+# Same environment as tests/test_main.py, so any test module can import app.* on its own.
+os.environ.setdefault("APP_ENV", "development")
+os.environ.setdefault("DISABLE_EMAIL_AND_API_KEY", "False")
+os.environ.setdefault("FIRESTORE_EMULATOR_HOST", "localhost:8081")
+os.environ.setdefault("MAIL_FROM", "test@example.com")
+os.environ.setdefault("MAIL_USERNAME", "testuser")
+os.environ.setdefault("MAIL_PASSWORD", "testpass")
+os.environ.setdefault("MAIL_PORT", "587")
+os.environ.setdefault("MAIL_SERVER", "smtp.example.com")
+os.environ.setdefault("MAIL_STARTTLS", "true")
+os.environ.setdefault("MAIL_SSL_TLS", "false")
+
+# Counters in a shared file would carry over between test runs.
+os.environ.setdefault("RATE_LIMIT_STORAGE_URI", "memory://")
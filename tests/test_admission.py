@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admission import AdmissionController
+
+
+async def run_in_order(controller, requests):
+    """Hold the only slot while `requests` queue up, then record the order they run in."""
+    order = []
+
+    async def run(client, size, name):
+        async with controller.slot(client, size):
+            order.append(name)
+
+    async with controller.slot("holder", 1):
+        tasks = []
+        for request in requests:
+            tasks.append(asyncio.create_task(run(*request)))
+            await asyncio.sleep(0)
+        assert controller.stats()["queued"] == len(requests)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_clients_share_turns_fairly():
+    controller = AdmissionController(1, 10, 10**9)
+    requests = [("a", 100, "a1"), ("a", 100, "a2"), ("a", 100, "a3"), ("b", 100, "b1")]
+    order = asyncio.run(run_in_order(controller, requests))
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_large_feeds_wait_behind_small_ones_from_other_clients():
+    controller = AdmissionController(1, 10, 10**9)
+    requests = [("a", 1000, "big"), ("b", 10, "small1"), ("b", 10, "small2")]
+    order = asyncio.run(run_in_order(controller, requests))
+    assert order == ["small1", "small2", "big"]
+
+
+def test_full_queue_is_refused_with_retry_after():
+    controller = AdmissionController(1, 1, 10**9)
+
+    async def scenario():
+        async with controller.slot("a", 1):
+            waiter = asyncio.create_task(controller.slot("b", 1).__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as exc:
+                async with controller.slot("c", 1):
+                    pass
+            assert exc.value.status_code == 503
+            assert int(exc.value.headers["Retry-After"]) >= 1
+            # Work that is already queued elsewhere waits instead.
+            queued = asyncio.create_task(
+                controller.slot("d", 1, reject=False).__aenter__()
+            )
+            await asyncio.sleep(0)
+            assert controller.stats()["queued"] == 2
+            waiter.cancel()
+            queued.cancel()
+            await asyncio.gather(waiter, queued, return_exceptions=True)
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["queued"] == 0
+    assert stats["queued_bytes"] == 0
+    assert stats["running"] == 0
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app import auth
+from app.storage import MemoryStore, is_legacy_key, new_api_key_value, parse_key_id
+
+
+class CountingStore(MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.resolves = 0
+
+    async def resolve_api_key(self, api_key):
+        self.resolves += 1
+        return await super().resolve_api_key(api_key)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = CountingStore()
+    monkeypatch.setattr(auth, "store", store)
+    auth.api_key_cache.clear()
+    auth.rejected_key_cache.clear()
+    yield store
+    auth.api_key_cache.clear()
+    auth.rejected_key_cache.clear()
+
+
+def issue_key(store, email="a@example.com"):
+    key = new_api_key_value("secret")
+
+    async def setup():
+        await store.create_user(email, is_verified=True)
+        await store.create_api_key(email, key)
+
+    asyncio.run(setup())
+    return key
+
+
+def test_key_value_embeds_document_id():
+    key = new_api_key_value("abc-def_123")
+    key_id = parse_key_id(key)
+    assert key_id and key == f"{key_id}.abc-def_123"
+    assert parse_key_id("legacy-key-without-id") is None
+
+
+def test_malformed_key_ids_are_not_parsed():
+    # The key ID is used as a document path, so anything but the issued shape is refused.
+    assert parse_key_id("users/a@example.com.secret") is None
+    assert parse_key_id("nope.nope") is None
+    assert parse_key_id(f"{'A' * 32}.secret") is None
+    assert is_legacy_key("x" * 43)
+    assert not is_legacy_key("x" * 42)
+    assert not is_legacy_key(new_api_key_value("secret"))
+
+
+def test_verified_key_is_cached(store):
+    key = issue_key(store)
+    assert asyncio.run(auth.get_api_key(key))["user_email"] == "a@example.com"
+    assert asyncio.run(auth.get_api_key(key))["key_id"] == parse_key_id(key)
+    assert store.resolves == 1
+
+
+def test_unknown_key_is_refused_from_cache(store):
+    assert asyncio.run(auth.get_api_key("nope.nope")) is None
+    assert asyncio.run(auth.get_api_key("nope.nope")) is None
+    assert store.resolves == 1
+
+
+def test_revoke_and_user_delete_invalidate_cache(store):
+    key = issue_key(store)
+    asyncio.run(auth.get_api_key(key))
+    asyncio.run(auth.revoke_key(parse_key_id(key)))
+    assert asyncio.run(auth.get_api_key(key)) is None
+
+    other = issue_key(store, "b@example.com")
+    asyncio.run(auth.get_api_key(other))
+    asyncio.run(auth.remove_user("B@example.com"))
+    assert asyncio.run(auth.get_api_key(other)) is None
+
+
+def test_email_verification_issues_a_working_key(store):
+    async def flow():
+        await auth.create_user_with_email("c@example.com")
+        token = next(iter(store.tokens.values()))["token"]
+        user, api_key = await auth.verify_email_token(token)
+        return user, api_key.key
+
+    user, key = asyncio.run(flow())
+    assert user["is_verified"]
+    assert asyncio.run(auth.get_api_key(key))["user_email"] == "c@example.com"
+
+
+def test_disabled_auth_never_touches_the_store(store, monkeypatch):
+    monkeypatch.setattr(auth.app_settings, "DISABLE_EMAIL_AND_API_KEY", True)
+    assert asyncio.run(auth.get_api_key(None)) == auth.DUMMY_API_KEY
+    assert store.resolves == 0
+    assert not store.users
@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from bench.gtfs_synth import PRESETS, build_files, write_feed
+from bench.load import STUB, percentile
+from bench.triage import main as triage_main
+
+
+def test_feed_is_byte_identical_for_a_seed(tmp_path):
+    a, b, c = tmp_path / "a.zip", tmp_path / "b.zip", tmp_path / "c.zip"
+    write_feed(str(a), PRESETS["tiny"], seed=1)
+    write_feed(str(b), PRESETS["tiny"], seed=1)
+    write_feed(str(c), PRESETS["tiny"], seed=2)
+    assert a.read_bytes() == b.read_bytes()
+    assert a.read_bytes() != c.read_bytes()
+
+
+def test_injected_errors():
+    files = build_files(
+        PRESETS["tiny"],
+        ["missing_calendar", "empty_agency", "missing_column", "duplicate_stop"],
+    )
+    assert "calendar.txt" not in files
+    assert files["agency.txt"] == b""
+    stops = list(csv.reader(io.StringIO(files["stops.txt"].decode())))
+    assert stops[0] == ["stop_id", "stop_lat", "stop_lon"]
+    assert stops[1][0] == stops[-1][0]
+
+    stop_ids = {
+        row[0]
+        for row in csv.reader(
+            io.StringIO(build_files(PRESETS["tiny"])["stops.txt"].decode())
+        )
+    }
+    stop_times = csv.reader(
+        io.StringIO(
+            build_files(PRESETS["tiny"], ["foreign_key"])["stop_times.txt"].decode()
+        )
+    )
+    assert {row[3] for row in list(stop_times)[1:]} - stop_ids == {"MISSING0"}
+
+    with pytest.raises(ValueError):
+        build_files(PRESETS["tiny"], ["nope"])
+
+
+def test_stub_validator_writes_reports(tmp_path):
+    feed = tmp_path / "feed.zip"
+    write_feed(str(feed), PRESETS["tiny"], ["empty_agency"])
+    out = tmp_path / "out"
+    out.mkdir()
+    subprocess.run(
+        [
+            sys.executable,
+            str(STUB),
+            "-Xmx1g",
+            "-jar",
+            "x.jar",
+            "-i",
+            str(feed),
+            "-o",
+            str(out),
+        ],
+        env={**os.environ, "STUB_LATENCY_SECONDS": "0"},
+        check=True,
+    )
+    report = json.loads((out / "report.json").read_text())
+    assert {
+        "code": "empty_file",
+        "severity": "ERROR",
+        "totalNotices": 1,
+        "sampleNotices": [{"filename": "agency.txt"}],
+    } in report["notices"]
+    assert (out / "report.html").exists() and (out / "system_errors.json").exists()
+    with zipfile.ZipFile(feed) as archive:
+        assert len(archive.namelist()) == 6
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+
+
+def test_triage_benchmark_reports_deep_notices(tmp_path):
+    out = tmp_path / "triage.json"
+    triage_main(
+        ["--preset", "tiny", "--error", "foreign_key", "--repeats", "1"]
+        + ["--output", str(out)]
+    )
+    results = json.loads(out.read_text())
+    assert results["preflight"]["notices"] == {}
+    assert results["deep"]["notices"] == {"foreign_key_violation": 1}
@@ -0,0 +1,88 @@
+import time
+
+from app.cache import ReportCache, sha256_file
+
+
+def make_work(tmp_path, name, size=10):
+    work = tmp_path / name
+    work.mkdir()
+    (work / "report.json").write_text("x" * size)
+    (work / "report.html").write_text("<html></html>")
+    return work
+
+
+def test_put_then_get_serves_reports(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"), max_bytes=10_000)
+    key = cache.key("abc")
+    assert cache.get(key) is None
+    cache.put(key, str(make_work(tmp_path, "w1")))
+    entry = cache.get(key)
+    assert entry is not None
+    assert (entry / "report.json").read_text() == "x" * 10
+    assert (entry / "report.html").exists()
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_key_depends_on_validator_version(monkeypatch):
+    from app.settings import validator_settings
+
+    before = ReportCache.key("abc")
+    monkeypatch.setattr(validator_settings, "GTFS_VALIDATOR_VERSION", "99.0.0")
+    assert ReportCache.key("abc") != before
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"), max_bytes=250)
+    for name in ("a", "b"):
+        cache.put(name, str(make_work(tmp_path, name, size=100)))
+    cache.get("a")
+    cache.put("c", str(make_work(tmp_path, "c", size=100)))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_pinned_entries_are_not_evicted_or_replaced(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"), max_bytes=250)
+    a = cache.put(cache.key("a"), str(make_work(tmp_path, "a", size=100)), pin=True)
+    b = cache.put(cache.key("b"), str(make_work(tmp_path, "b", size=100)))
+    cache.pin(a)
+    cache.put(cache.key("c"), str(make_work(tmp_path, "c", size=100)))
+    # The least recently used entry that is not being served goes instead.
+    assert (a / "report.json").exists()
+    assert not b.exists()
+    cache.put(cache.key("a"), str(make_work(tmp_path, "a2", size=50)))
+    assert (a / "report.json").read_text() == "x" * 100
+    cache.unpin(a)
+    assert cache.stats()["pinned"] == 1
+    cache.unpin(a)
+    assert cache.stats()["pinned"] == 0
+    # Unpinned, it is evicted like any other entry.
+    cache.put(cache.key("d"), str(make_work(tmp_path, "d", size=100)))
+    cache.put(cache.key("e"), str(make_work(tmp_path, "e", size=100)))
+    assert cache.get(cache.key("a")) is None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"), max_bytes=10_000, ttl_seconds=60)
+    cache.put("a", str(make_work(tmp_path, "a")))
+    cache._entries["a"].created_at = time.time() - 120
+    assert cache.get("a") is None
+    assert not (tmp_path / "cache" / "a").exists()
+
+
+def test_entries_survive_restart(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"), max_bytes=10_000)
+    cache.put("a", str(make_work(tmp_path, "a")))
+    reloaded = ReportCache(str(tmp_path / "cache"), max_bytes=10_000)
+    assert reloaded.get("a") is not None
+
+
+def test_sha256_file(tmp_path):
+    path = tmp_path / "feed.zip"
+    path.write_bytes(b"hello")
+    assert (
+        sha256_file(str(path))
+        == "2cf24dba5fb0a30e26e83b2ac5b9e29e1b161e5c1fa7425e73043362938b9824"
+    )
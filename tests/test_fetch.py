@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+
+import pytest
+from aiohttp import web
+from fastapi import HTTPException
+
+from app.fetch import FeedFetcher
+from app.settings import fetch_settings
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+
+
+async def serve_feed(tmp_path, payload=PAYLOAD):
+    """Local stand-in for a feed host; records the status of every response."""
+    feed = tmp_path / "served.zip"
+    feed.write_bytes(payload)
+    statuses = []
+
+    async def record(request, response):
+        statuses.append(response.status)
+
+    async def handler(request):
+        return web.FileResponse(feed)
+
+    app = web.Application()
+    app.on_response_prepare.append(record)
+    app.router.add_get("/feed.zip", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/feed.zip", statuses
+
+
+def fetch_twice(tmp_path, **settings):
+    async def main():
+        runner, url, statuses = await serve_feed(tmp_path)
+        fetcher = FeedFetcher(str(tmp_path / "store"), 10 * len(PAYLOAD))
+        try:
+            first = await fetcher.fetch(url, str(tmp_path / "first.zip"))
+            second = await fetcher.fetch(url, str(tmp_path / "second.zip"))
+        finally:
+            await fetcher.close()
+            await runner.cleanup()
+        return first, second, statuses
+
+    return asyncio.run(main())
+
+
+def test_unchanged_feed_is_not_downloaded_twice(tmp_path):
+    first, second, statuses = fetch_twice(tmp_path)
+    assert first.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert not first.not_modified
+    assert second.not_modified
+    assert second.sha256 == first.sha256
+    assert statuses[-1] == 304
+    assert (tmp_path / "second.zip").read_bytes() == PAYLOAD
+
+
+def test_large_feed_is_fetched_in_parallel_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_settings, "FETCH_RANGE_PART_BYTES", 200_000)
+    first, _, statuses = fetch_twice(tmp_path)
+    assert statuses.count(206) == 6
+    assert (tmp_path / "first.zip").read_bytes() == PAYLOAD
+    assert first.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+def test_oversized_feed_is_rejected_before_writing(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_settings, "FETCH_MAX_BYTES", 1000)
+    with pytest.raises(HTTPException) as exc:
+        fetch_twice(tmp_path)
+    assert exc.value.status_code == 413
+    assert not (tmp_path / "first.zip").exists()
+
+
+def test_room_for_the_feed_is_reserved_before_writing(tmp_path):
+    dest = tmp_path / "feed.zip"
+    reserved = []
+
+    def reserve(nbytes):
+        assert not dest.exists()
+        reserved.append(nbytes)
+
+    async def main():
+        runner, url, _ = await serve_feed(tmp_path)
+        fetcher = FeedFetcher(str(tmp_path / "store"), 10 * len(PAYLOAD))
+        try:
+            await fetcher.fetch(url, str(dest), reserve)
+        finally:
+            await fetcher.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+    assert reserved == [len(PAYLOAD)]
+
+
+def test_feed_of_unknown_size_is_reserved_ahead_in_steps(tmp_path, monkeypatch):
+    import app.fetch as fetch_module
+
+    monkeypatch.setattr(fetch_module, "RESERVE_AHEAD_BYTES", len(PAYLOAD) // 2)
+    reserved = []
+
+    async def chunked(request):
+        response = web.StreamResponse()
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for start in range(0, len(PAYLOAD), 16 * 1024):
+            await response.write(PAYLOAD[start : start + 16 * 1024])
+        await response.write_eof()
+        return response
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/feed.zip", chunked)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        fetcher = FeedFetcher(str(tmp_path / "store"), 10 * len(PAYLOAD))
+        try:
+            await fetcher.fetch(
+                f"http://127.0.0.1:{port}/feed.zip",
+                str(tmp_path / "feed.zip"),
+                reserved.append,
+            )
+        finally:
+            await fetcher.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+    assert (tmp_path / "feed.zip").read_bytes() == PAYLOAD
+    # Far fewer reservations than the 64 chunks the body arrived in.
+    assert 2 <= len(reserved) <= 3
+    assert sum(reserved) >= len(PAYLOAD)
+
+
+def test_remembered_body_lost_before_304_is_fetched_again(tmp_path, monkeypatch):
+    import app.fetch as fetch_module
+
+    link_or_copy = fetch_module._link_or_copy
+    lost = []
+
+    def lose_remembered_first(src, dest):
+        # A concurrent fetch of the same URL forgets the body between request and 304.
+        if src.parent == tmp_path / "store" and not lost:
+            lost.append(src)
+            src.unlink()
+        link_or_copy(src, dest)
+
+    async def main():
+        runner, url, statuses = await serve_feed(tmp_path)
+        fetcher = FeedFetcher(str(tmp_path / "store"), 10 * len(PAYLOAD))
+        try:
+            await fetcher.fetch(url, str(tmp_path / "first.zip"))
+            monkeypatch.setattr(fetch_module, "_link_or_copy", lose_remembered_first)
+            second = await fetcher.fetch(url, str(tmp_path / "second.zip"))
+        finally:
+            await fetcher.close()
+            await runner.cleanup()
+        return second, statuses
+
+    second, statuses = asyncio.run(main())
+    assert lost
+    assert not second.not_modified
+    assert statuses[-2:] == [304, 206]
+    assert (tmp_path / "second.zip").read_bytes() == PAYLOAD
+
+
+def test_fetchers_sharing_a_store_keep_their_own_bodies(tmp_path):
+    async def main():
+        runner, url, _ = await serve_feed(tmp_path)
+        # Stand-ins for two worker processes remembering the same URL.
+        one = FeedFetcher(str(tmp_path / "store"), 10 * len(PAYLOAD))
+        two = FeedFetcher(str(tmp_path / "store"), 10 * len(PAYLOAD))
+        try:
+            await one.fetch(url, str(tmp_path / "one.zip"))
+            await two.fetch(url, str(tmp_path / "two.zip"))
+            # Replacing its remembered body leaves the other fetcher's alone.
+            await one.fetch(url, str(tmp_path / "one-again.zip"))
+            again = await two.fetch(url, str(tmp_path / "two-again.zip"))
+        finally:
+            await one.close()
+            await two.close()
+            await runner.cleanup()
+        return again
+
+    again = asyncio.run(main())
+    assert again.not_modified
+    assert (tmp_path / "two-again.zip").read_bytes() == PAYLOAD
+    assert len(list((tmp_path / "store").iterdir())) == 2
+
+
+def test_clean_store_removes_bodies_of_gone_processes(tmp_path):
+    async def main():
+        runner, url, _ = await serve_feed(tmp_path)
+        fetcher = FeedFetcher(str(tmp_path / "store"), 10 * len(PAYLOAD))
+        try:
+            await fetcher.fetch(url, str(tmp_path / "feed.zip"))
+        finally:
+            await fetcher.close()
+            await runner.cleanup()
+        return fetcher
+
+    fetcher = asyncio.run(main())
+    store = tmp_path / "store"
+    (kept,) = store.iterdir()
+    (store / "999999999-0123abcd").write_bytes(b"left by a gone process")
+    (store / hashlib.sha256(b"old").hexdigest()).write_bytes(b"left by an old version")
+    assert fetcher.clean_store() == 2
+    assert list(store.iterdir()) == [kept]
@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+import io
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.ingest import check_feed_archive, stream_upload
+from app.settings import upload_settings
+
+
+def test_stream_upload_hashes_while_copying(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_settings, "UPLOAD_CHUNK_BYTES", 7)
+    data = b"stop_id,stop_name\n" * 100
+    dest = tmp_path / "feed.zip"
+    sha = asyncio.run(stream_upload(UploadFile(io.BytesIO(data)), str(dest)))
+    assert sha == hashlib.sha256(data).hexdigest()
+    assert dest.read_bytes() == data
+
+
+def test_stream_upload_rejects_oversized_feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_settings, "UPLOAD_MAX_BYTES", 10)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(
+            stream_upload(UploadFile(io.BytesIO(b"x" * 11)), str(tmp_path / "feed.zip"))
+        )
+    assert exc.value.status_code == 413
+
+
+def write_zip(path, files):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+
+
+def test_check_feed_archive_accepts_normal_feed(tmp_path):
+    feed = tmp_path / "feed.zip"
+    write_zip(feed, {"stops.txt": "stop_id,stop_name\n1,Main St\n"})
+    check_feed_archive(str(feed))
+
+
+def test_check_feed_archive_rejects_non_zip(tmp_path):
+    feed = tmp_path / "feed.zip"
+    feed.write_bytes(b"dummy content")
+    with pytest.raises(HTTPException) as exc:
+        check_feed_archive(str(feed))
+    assert exc.value.status_code == 400
+
+
+def test_check_feed_archive_rejects_zip_bomb(tmp_path):
+    feed = tmp_path / "feed.zip"
+    write_zip(feed, {"stop_times.txt": "0" * 10_000_000})
+    with pytest.raises(HTTPException) as exc:
+        check_feed_archive(str(feed))
+    assert "compression ratio" in exc.value.detail
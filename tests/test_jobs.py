@@ -0,0 +1,153 @@
+import asyncio
+import os
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main, pipeline
+from app.cache import ReportCache
+from app.jobs import DONE, JobQueue
+from app.rate_limit import limiter
+from app.settings import validator_settings
+from bench.gtfs_synth import PRESETS, write_feed
+
+FAKE_JAVA = """#!/bin/sh
+while [ "$#" -gt 0 ]; do
+  if [ "$1" = "-o" ]; then out="$2"; fi
+  shift
+done
+echo '{"notices": [{"code": "missing_required_file", "severity": "ERROR"}]}' > "$out/report.json"
+echo "<html>report</html>" > "$out/report.html"
+"""
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    java = tmp_path / "java"
+    java.write_text(FAKE_JAVA)
+    java.chmod(java.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", str(java))
+    monkeypatch.setattr(
+        pipeline, "report_cache", ReportCache(str(tmp_path / "cache"), 10**9)
+    )
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "jobs"), 2, 10, 60)
+    monkeypatch.setattr(main, "jobs", queue)
+    limiter.reset()
+    return queue
+
+
+@pytest.fixture
+def feed(tmp_path):
+    path = tmp_path / "feed.zip"
+    write_feed(str(path), PRESETS["tiny"])
+    return path
+
+
+def wait_for(client, job_id):
+    for _ in range(100):
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+def test_job_submit_poll_and_fetch(queue, feed):
+    with TestClient(main.app) as client:
+        with open(feed, "rb") as f:
+            response = client.post(
+                "/jobs", files={"file": ("feed.zip", f, "application/zip")}
+            )
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        assert response.headers["location"] == f"/jobs/{job_id}"
+        assert wait_for(client, job_id)["status"] == "done"
+        report = client.get(f"/jobs/{job_id}/report?format=errors")
+        assert report.json()["errors"][0]["code"] == "missing_required_file"
+        assert report.headers["x-cache"] == "MISS"
+        assert "report" in client.get(f"/jobs/{job_id}/report?format=html").text
+        assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_job_failure_is_reported(queue, tmp_path):
+    bad = tmp_path / "bad.zip"
+    bad.write_bytes(b"not a zip")
+    with TestClient(main.app) as client:
+        with open(bad, "rb") as f:
+            job_id = client.post(
+                "/jobs", files={"file": ("bad.zip", f, "application/zip")}
+            ).json()["id"]
+        status = wait_for(client, job_id)
+        assert status["status"] == "failed"
+        assert status["status_code"] == 400
+        assert client.get(f"/jobs/{job_id}/report").status_code == 400
+
+
+def exited_pid():
+    exited = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        check=True,
+    )
+    return int(exited.stdout)
+
+
+def test_unfinished_jobs_of_gone_processes_are_requeued_on_start(queue, feed):
+    dead = exited_pid()
+    job_id = queue.new_job()
+    (queue.job_dir(job_id) / "feed.zip").write_bytes(feed.read_bytes())
+    queue.submit(job_id)
+    queue._execute(
+        "UPDATE jobs SET status = 'validating', owner = ? WHERE id = ?", (dead, job_id)
+    )
+    # Running in another live process: left alone.
+    running = queue.new_job()
+    queue.submit(running)
+    queue._execute(
+        "UPDATE jobs SET status = 'validating', owner = ? WHERE id = ?",
+        (os.getppid(), running),
+    )
+    # Uploads that never made it to submit().
+    abandoned = queue.new_job()
+    queue._execute("UPDATE jobs SET owner = ? WHERE id = ?", (dead, abandoned))
+    receiving = queue.new_job()
+    queue._execute("UPDATE jobs SET owner = ? WHERE id = ?", (os.getppid(), receiving))
+    orphan = queue.job_dir("orphan")
+    orphan.mkdir()
+
+    async def run():
+        await queue.start()
+        await asyncio.wait_for(queue._queue.join(), 5)
+        await queue.close()
+
+    asyncio.run(run())
+    assert queue.get(job_id)["status"] == DONE
+    assert (queue.job_dir(job_id) / "report.json").exists()
+    assert queue.get(running)["status"] == "validating"
+    assert queue.job_dir(receiving).exists()
+    assert not queue.job_dir(abandoned).exists()
+    assert not orphan.exists()
+
+
+def test_a_job_is_claimed_by_one_process(queue):
+    job_id = queue.new_job()
+    queue.submit(job_id)
+    other = JobQueue(queue.db_path, str(queue.jobs_dir), 1, 10, 60)
+    assert queue._claim(job_id)
+    assert not other._claim(job_id)
+    assert not queue._claim(job_id)
+    other._db.close()
+
+
+def test_reap_removes_expired_jobs(queue, feed):
+    job_id = queue.new_job()
+    queue.submit(job_id)
+    queue._set_status(job_id, DONE)
+    queue._execute("UPDATE jobs SET finished_at = 0 WHERE id = ?", (job_id,))
+    assert queue.get(job_id) is None
+    assert queue.reap() == 1
+    assert not queue.job_dir(job_id).exists()
@@ -0,0 +1,78 @@
+import asyncio
+import stat
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+from app.jvm_pool import JvmWorkerPool
+from app.settings import validator_settings
+
+FAKE_WORKER = """
+import os, sys
+print("READY", flush=True)
+for line in sys.stdin:
+    feed, out = line.rstrip("\\n").split("\\t")
+    if feed == "crash.zip":
+        sys.exit(1)
+    if feed == "bad.zip":
+        print("ERR invalid feed", flush=True)
+        continue
+    with open(os.path.join(out, "report.json"), "w") as f:
+        f.write(str(os.getpid()))
+    print("OK", flush=True)
+"""
+
+
+@pytest.fixture
+def fake_worker(tmp_path, monkeypatch):
+    java = tmp_path / "java"
+    java.write_text(f"#!{sys.executable}\n{FAKE_WORKER}")
+    java.chmod(java.stat().st_mode | stat.S_IEXEC)
+    (tmp_path / "ValidatorWorker.class").write_bytes(b"")
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", str(java))
+    monkeypatch.setattr(validator_settings, "JVM_WORKER_CLASSPATH", str(tmp_path))
+    return tmp_path
+
+
+def run_jobs(pool, work, feeds):
+    async def main():
+        pids = []
+        try:
+            await pool.start()
+            for feed in feeds:
+                await pool.validate(feed, str(work))
+                pids.append((work / "report.json").read_text())
+        finally:
+            await pool.close()
+        return pids
+
+    return asyncio.run(main())
+
+
+def test_pool_reuses_and_recycles_workers(fake_worker):
+    pool = JvmWorkerPool(size=1, max_jobs=2)
+    assert pool.available()
+    pids = run_jobs(pool, fake_worker, ["a.zip", "b.zip", "c.zip"])
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[1]
+
+
+def test_pool_reports_validator_errors_and_replaces_crashed_workers(fake_worker):
+    pool = JvmWorkerPool(size=1, max_jobs=10)
+
+    async def main():
+        try:
+            await pool.start()
+            with pytest.raises(HTTPException) as exc:
+                await pool.validate("bad.zip", str(fake_worker))
+            assert "invalid feed" in exc.value.detail
+            with pytest.raises(HTTPException) as exc:
+                await pool.validate("crash.zip", str(fake_worker))
+            assert "exited during validation" in exc.value.detail
+            await pool.validate("ok.zip", str(fake_worker))
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+    assert (fake_worker / "report.json").exists()
@@ -0,0 +1,65 @@
+import asyncio
+import zipfile
+
+from app import jvm_profile, validator
+from app.jvm_profile import CdsArchive, heap_options, memory_budget_mb, runtime_options
+from app.settings import validator_settings
+from tests.test_validator import WRITE_REPORT, make_fake_java
+
+
+def test_memory_budget_from_cgroup(tmp_path, monkeypatch):
+    limit = tmp_path / "memory.max"
+    monkeypatch.setattr(jvm_profile, "CGROUP_MEMORY_LIMITS", (str(limit),))
+    monkeypatch.setattr(validator_settings, "VALIDATOR_MEMORY_LIMIT_MB", 0)
+    monkeypatch.setattr(validator_settings, "VALIDATOR_MAX_CONCURRENCY", 2)
+    limit.write_text("max\n")
+    assert memory_budget_mb() is None
+    limit.write_text(f"{2048 * 1024 * 1024}\n")
+    assert memory_budget_mb() == (2048 - validator_settings.JVM_RESERVED_MB) // 2
+    monkeypatch.setattr(validator_settings, "VALIDATOR_MEMORY_LIMIT_MB", 1000)
+    assert memory_budget_mb() == 1000
+
+
+def test_heap_and_runtime_options_follow_feed_size(monkeypatch):
+    monkeypatch.setattr(validator_settings, "VALIDATOR_MEMORY_LIMIT_MB", 1000)
+    monkeypatch.setattr(validator_settings, "JVM_HEAP_BASE_MB", 64)
+    monkeypatch.setattr(validator_settings, "JVM_HEAP_MB_PER_FEED_MB", 4)
+    assert heap_options(10) == ["-Xmx750m", "-Xms104m"]
+    assert heap_options(5000) == ["-Xmx750m", "-Xms750m"]
+    assert heap_options(None) == ["-Xmx750m"]
+    assert runtime_options(1) == ["-XX:+UseSerialGC", "-XX:TieredStopAtLevel=1"]
+    assert runtime_options(validator_settings.JVM_SMALL_FEED_MB + 1) == []
+
+
+def test_first_run_creates_the_cds_archive(tmp_path, monkeypatch):
+    args = tmp_path / "args"
+    java = make_fake_java(
+        tmp_path,
+        f'echo "$@" >> {args}\n'
+        'for a in "$@"; do case "$a" in -XX:ArchiveClassesAtExit=*) echo jsa > "${a#*=}";; esac; done\n'
+        + WRITE_REPORT,
+    )
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", java)
+    archive = CdsArchive(str(tmp_path / "cds" / "validator.jsa"), auto_create=True)
+    monkeypatch.setattr(validator, "cds_archive", archive)
+    feed = tmp_path / "feed.zip"
+    with zipfile.ZipFile(feed, "w") as f:
+        f.writestr("stops.txt", "stop_id\n1\n")
+
+    asyncio.run(validator.run_validator(str(feed), str(tmp_path)))
+    assert archive.path.read_text() == "jsa\n"
+    asyncio.run(validator.run_validator(str(feed), str(tmp_path)))
+    first, second = args.read_text().splitlines()
+    assert "-XX:ArchiveClassesAtExit=" in first
+    assert f"-XX:SharedArchiveFile={archive.path}" in second
+    assert "-XX:+UseSerialGC" in second
+
+
+def test_failed_run_discards_the_cds_archive(tmp_path):
+    archive = CdsArchive(str(tmp_path / "validator.jsa"), auto_create=True)
+    _, tmp = archive.options()
+    assert archive.options() == ([], None)  # one creator at a time
+    tmp.write_text("partial")
+    archive.finish(tmp, ok=False)
+    assert not tmp.exists() and not archive.path.exists()
+    assert archive.options()[1] is not None
@@ -14,7 +14,8 @@ import subprocess
 import time
 import pytest
 from fastapi.testclient import TestClient
-from app.main import app, get_md_intro, get_md_section
+from app.main import UPLOAD_OVERHEAD_BYTES, app, get_md_intro, get_md_section
+from bench.gtfs_synth import PRESETS, write_feed
 import re
 
 
@@ -115,3 +116,259 @@ def test_get_md_section_end_of_file():
 def test_get_md_section_not_found():
     md = "# Title\n\n## Section 1\nContent 1\n"
     assert get_md_section(md, "## Not Present") == ""
+
+
+FAKE_JAVA = """#!/bin/sh
+while [ "$#" -gt 0 ]; do
+  if [ "$1" = "-o" ]; then out="$2"; fi
+  shift
+done
+cat > "$out/report.json" <<'REPORT'
+{"summary": {}, "notices": [
+  {"code": "missing_required_file", "severity": "ERROR", "totalNotices": 1, "sampleNotices": []},
+  {"code": "unused_shape", "severity": "WARNING", "totalNotices": 1, "sampleNotices": []}
+]}
+REPORT
+echo "<html>report</html>" > "$out/report.html"
+"""
+
+
+@pytest.fixture
+def fake_validator(tmp_path, monkeypatch):
+    import stat
+
+    from app import main, pipeline
+    from app.cache import ReportCache
+    from app.rate_limit import limiter
+    from app.settings import validator_settings
+
+    java = tmp_path / "java"
+    java.write_text(FAKE_JAVA)
+    java.chmod(java.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", str(java))
+    cache = ReportCache(str(tmp_path / "cache"), 10**9)
+    monkeypatch.setattr(main, "report_cache", cache)
+    monkeypatch.setattr(pipeline, "report_cache", cache)
+    limiter.reset()
+    feed = tmp_path / "feed.zip"
+    write_feed(str(feed), PRESETS["tiny"])
+    return feed
+
+
+def post_feed(feed, format, use_cache="true", headers=None):
+    with open(feed, "rb") as f:
+        return client.post(
+            f"/validate?format={format}&use_cache={use_cache}",
+            files={"file": ("feed.zip", f, "application/zip")},
+            headers=headers,
+        )
+
+
+def test_validate_streams_errors_and_ndjson(fake_validator):
+    response = post_feed(fake_validator, "errors", use_cache="false")
+    assert response.status_code == 200
+    assert [n["code"] for n in response.json()["errors"]] == ["missing_required_file"]
+    response = post_feed(fake_validator, "ndjson", use_cache="false")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(response.text.splitlines()) == 2
+
+
+def test_validate_serves_repeat_feeds_from_cache(fake_validator):
+    from app import main
+
+    first = post_feed(fake_validator, "json")
+    second = post_feed(fake_validator, "html")
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert "report" in second.text
+    # Entries are pinned only while their reports are being sent.
+    assert main.report_cache.stats()["pinned"] == 0
+
+
+def test_validate_sends_precompressed_reports(fake_validator):
+    response = post_feed(fake_validator, "json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["notices"][0]["code"] == "missing_required_file"
+    again = post_feed(fake_validator, "json", headers={"Accept-Encoding": "gzip"})
+    assert again.headers["x-cache"] == "HIT"
+    assert again.content == response.content
+
+
+def test_reports_are_diffed_by_report_id(fake_validator):
+    report_id = post_feed(fake_validator, "json").headers["x-report-id"]
+    diff = client.get(f"/reports/{report_id}/diff/{report_id}").json()
+    assert diff["codes"] == {"added": 0, "removed": 0, "changed": 0, "unchanged": 2}
+    assert client.get(f"/reports/{report_id}/diff/{'0' * 64}").status_code == 404
+    assert client.get(f"/reports/{report_id}/diff/..").status_code == 404
+
+
+def test_report_notices_are_queried_by_report_id(fake_validator):
+    from app import main
+
+    report_id = post_feed(fake_validator, "json").headers["x-report-id"]
+    page = client.get(f"/reports/{report_id}/notices?severity=ERROR").json()
+    assert page["total"] == 0
+    summary = client.get(f"/reports/{report_id}/summary").json()
+    assert summary["counts"] == {"ERROR": 1, "WARNING": 1}
+    assert client.get(f"/reports/{'0' * 64}/summary").status_code == 404
+    assert main.report_cache.stats()["pinned"] == 0
+
+
+def test_landing_page_is_cached_and_revalidated():
+    first = client.get("/")
+    assert first.status_code == 200
+    assert "Cache-Control" in first.headers
+    etag = first.headers["etag"]
+    second = client.get("/", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+
+
+def test_readme_page_rerenders_when_readme_changes(tmp_path):
+    import os
+
+    from app.readme import ReadmePage
+
+    readme = tmp_path / "README.md"
+    readme.write_text("one")
+    renders = []
+    page = ReadmePage(lambda: renders.append(1) or readme.read_text(), readme)
+    assert page.get()[0] == page.get()[0] == "one"
+    readme.write_text("two")
+    os.utime(readme, ns=(0, 10**9))
+    assert page.get()[0] == "two"
+    assert len(renders) == 2
+
+
+def test_validate_batch_dedupes_and_streams_per_feed_results(fake_validator):
+    import json
+
+    from app import main
+
+    data = fake_validator.read_bytes()
+    response = client.post(
+        "/validate/batch",
+        files=[
+            ("files", ("a.zip", data, "application/zip")),
+            ("files", ("b.zip", data, "application/zip")),
+            ("files", ("c.txt", b"not a feed", "text/plain")),
+        ],
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda r: r["index"])
+    assert [r["status"] for r in results] == ["ok", "ok", "error"]
+    assert [r["cache"] for r in results[:2]] == ["MISS", "DUPLICATE"]
+    assert results[0]["errors"][0]["code"] == "missing_required_file"
+    assert results[2]["status_code"] == 400
+    assert main.report_cache.stats()["pinned"] == 0
+
+
+def test_validate_batch_costs_one_hit_per_feed(fake_validator):
+    data = fake_validator.read_bytes()
+    files = [("files", (f"{i}.zip", data, "application/zip")) for i in range(3)]
+    assert client.post("/validate/batch", files=files).status_code == 200
+    # The default limit is 5 per day, so a second batch of 3 is refused.
+    assert client.post("/validate/batch", files=files).status_code == 429
+
+
+def test_validate_batch_counts_urls_and_files_towards_its_cost(fake_validator):
+    data = fake_validator.read_bytes()
+    files = [("files", ("feed.zip", data, "application/zip"))]
+    urls = {"urls": ["http://127.0.0.1:9/a.zip", "http://127.0.0.1:9/b.zip"]}
+    response = client.post("/validate/batch", data=urls, files=files)
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 3
+    assert client.post("/validate/batch", data=urls, files=files).status_code == 429
+
+
+def test_metrics_report_stage_timings(fake_validator, caplog):
+    import logging
+
+    with caplog.at_level(logging.INFO, logger="app.metrics"):
+        post_feed(fake_validator, "json", use_cache="false")
+    assert any('"path": "/validate"' in r.getMessage() and "validator" in r.getMessage() for r in caplog.records)
+    text = client.get("/metrics").text
+    assert 'gtfs_stage_seconds_count{stage="validator"}' in text
+    assert 'gtfs_report_cache_requests_total{result="bypass"}' in text
+    assert "gtfs_validator_max_rss_bytes_count" in text
+    assert "gtfs_admission_queued 0" in text
+
+
+def test_quick_mode_skips_the_validator(fake_validator, tmp_path):
+    broken = tmp_path / "broken.zip"
+    write_feed(str(broken), PRESETS["tiny"], ["foreign_key"])
+    with open(broken, "rb") as f:
+        response = client.post("/validate?mode=quick", files={"file": ("feed.zip", f, "application/zip")})
+    assert response.status_code == 200
+    assert response.headers["x-validation-mode"] == "quick"
+    assert [n["code"] for n in response.json()["notices"]] == ["foreign_key_violation"]
+
+
+def test_incomplete_feeds_get_the_full_report_by_default(fake_validator, tmp_path):
+    broken = tmp_path / "broken.zip"
+    write_feed(str(broken), PRESETS["tiny"], ["missing_calendar"])
+    response = post_feed(broken, "errors", use_cache="false")
+    assert response.headers["x-validation-mode"] == "full"
+
+
+def test_preflight_answers_for_unloadable_feeds(fake_validator, tmp_path, monkeypatch):
+    from app.settings import triage_settings
+
+    monkeypatch.setattr(triage_settings, "TRIAGE_PREFLIGHT", True)
+    broken = tmp_path / "broken.zip"
+    write_feed(str(broken), PRESETS["tiny"], ["missing_calendar"])
+    response = post_feed(broken, "errors", use_cache="false")
+    assert response.headers["x-validation-mode"] == "preflight"
+    assert [n["code"] for n in response.json()["errors"]] == ["missing_calendar_and_calendar_date_files"]
+    assert post_feed(fake_validator, "json", use_cache="false").headers["x-validation-mode"] == "full"
+
+
+def test_startup_report():
+    with TestClient(app) as started:
+        report = started.get("/startup").json()
+    assert {"imported", "serving"} <= set(report["milestones"])
+    assert report["milestones"]["imported"] <= report["milestones"]["serving"]
+
+
+def test_admin_endpoints_require_the_admin_token(monkeypatch):
+    from pydantic import SecretStr
+
+    from app import auth
+    from app.settings import auth_settings
+    from app.storage import MemoryStore
+
+    monkeypatch.setattr(auth, "store", MemoryStore())
+    form = {"key_id": "0" * 32}
+    assert client.post("/admin/revoke-key", data=form).status_code == 403
+    monkeypatch.setattr(auth_settings, "ADMIN_TOKEN", SecretStr("s3cret"))
+    assert client.post("/admin/revoke-key", data=form).status_code == 401
+    wrong = {"X-Admin-Token": "guess"}
+    assert client.post("/admin/revoke-key", data=form, headers=wrong).status_code == 401
+    right = {"X-Admin-Token": "s3cret"}
+    assert client.post("/admin/revoke-key", data=form, headers=right).status_code == 200
+
+
+def test_validate_batch_json_embeds_reports_and_limits_each_file(fake_validator, monkeypatch):
+    import json
+
+    from app.settings import upload_settings
+
+    data = fake_validator.read_bytes()
+    # Each file is within the limit, the body as a whole is not.
+    monkeypatch.setattr(upload_settings, "UPLOAD_MAX_BYTES", len(data) + 10)
+    too_big = data + b"\0" * (len(data) + UPLOAD_OVERHEAD_BYTES)
+    response = client.post(
+        "/validate/batch?format=json&use_cache=false",
+        files=[
+            ("files", ("a.zip", data, "application/zip")),
+            ("files", ("b.zip", too_big, "application/zip")),
+        ],
+    )
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == 2
+    results = sorted((json.loads(line) for line in lines), key=lambda r: r["index"])
+    assert results[0]["report"]["notices"][0]["code"] == "missing_required_file"
+    assert results[1]["status_code"] == 413
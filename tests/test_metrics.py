@@ -0,0 +1,33 @@
+from app.metrics import Counter, Histogram, Registry, _stages, stage, start_request
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    counter = registry.add(Counter("things_total", "Things.", ["kind"]))
+    histogram = registry.add(Histogram("size", "Sizes.", [1, 10]))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    histogram.observe(50)
+    text = registry.render()
+    assert 'things_total{kind="a"} 3' in text
+    assert 'size_bucket{le="1"} 1' in text
+    assert 'size_bucket{le="10"} 2' in text
+    assert 'size_bucket{le="+Inf"} 3' in text
+    assert "size_sum 55.5" in text
+    assert "# TYPE size histogram" in text
+
+
+def test_stage_times_are_collected_per_request():
+    token = _stages.set(None)
+    try:
+        stages = start_request()
+        with stage("download"):
+            pass
+        with stage("download"):
+            pass
+        assert list(stages) == ["download"]
+        assert stages["download"] >= 0
+    finally:
+        _stages.reset(token)
@@ -0,0 +1,61 @@
+import json
+
+from app.notice_index import INDEX_FILE, ensure_index, query_notices, summarize_notices
+
+
+def indexed_report(tmp_path):
+    notices = [
+        {
+            "code": "foreign_key_violation",
+            "severity": "ERROR",
+            "totalNotices": 250,
+            "sampleNotices": [
+                {"childFilename": "stop_times.txt", "fieldValue": f"S{i}"}
+                for i in range(5)
+            ],
+        },
+        {
+            "code": "unused_shape",
+            "severity": "WARNING",
+            "totalNotices": 2,
+            "sampleNotices": [
+                {"filename": "shapes.txt", "shapeId": "A"},
+                {"filename": "shapes.txt", "shapeId": "B"},
+            ],
+        },
+        {
+            "code": "feed_expiration_date7_days",
+            "severity": "WARNING",
+            "totalNotices": 1,
+            "sampleNotices": [{}],
+        },
+    ]
+    (tmp_path / "report.json").write_text(
+        json.dumps({"summary": {}, "notices": notices})
+    )
+    assert ensure_index(tmp_path) > 0
+    assert ensure_index(tmp_path) == 0
+    return tmp_path
+
+
+def test_notices_are_filtered_and_paged(tmp_path):
+    report = indexed_report(tmp_path)
+    page = query_notices(report, code="foreign_key_violation", offset=2, limit=2)
+    assert page["total"] == 5
+    assert [n["sample"]["fieldValue"] for n in page["notices"]] == ["S2", "S3"]
+    assert query_notices(report, severity="WARNING")["total"] == 3
+    by_file = query_notices(report, filename="shapes.txt")
+    assert {n["sample"]["shapeId"] for n in by_file["notices"]} == {"A", "B"}
+    assert query_notices(report, code="missing")["notices"] == []
+
+
+def test_summary_counts_all_notices_not_only_samples(tmp_path):
+    summary = summarize_notices(indexed_report(tmp_path))
+    assert summary["counts"] == {"ERROR": 250, "WARNING": 3}
+    assert summary["codes"][0] == {
+        "code": "foreign_key_violation",
+        "severity": "ERROR",
+        "total": 250,
+    }
+    assert summary["sampled_files"] == {"shapes.txt": 2, "stop_times.txt": 5}
+    assert not list(tmp_path.glob(f".{INDEX_FILE}*"))
@@ -0,0 +1,57 @@
+import time
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+
+from app.rate_limit_store import SQLiteStorage
+
+
+def make_storage(tmp_path):
+    return storage_from_string(f"sqlite://{tmp_path}/limits.sqlite3")
+
+
+def test_uri_selects_sqlite_storage(tmp_path):
+    storage = make_storage(tmp_path)
+    assert isinstance(storage, SQLiteStorage)
+    assert storage.check()
+
+
+def test_fixed_window_is_shared_between_storages(tmp_path):
+    # Two storages on one file stand in for two worker processes.
+    first = FixedWindowRateLimiter(make_storage(tmp_path))
+    second = FixedWindowRateLimiter(make_storage(tmp_path))
+    limit = parse("5/minute")
+    assert first.hit(limit, "key", cost=3)
+    assert second.hit(limit, "key", cost=2)
+    assert not first.hit(limit, "key")
+    assert first.hit(limit, "other")
+    assert second.get_window_stats(limit, "key").remaining == 0
+
+
+def test_counters_expire(tmp_path):
+    storage = make_storage(tmp_path)
+    assert storage.incr("key", 1, amount=2) == 2
+    assert storage.get("key") == 2
+    storage.db.execute("UPDATE counters SET expires_at = ?", (time.time() - 1,))
+    assert storage.get("key") == 0
+    assert storage.incr("key", 1) == 1
+
+
+def test_sliding_window_counter(tmp_path):
+    limiter = SlidingWindowCounterRateLimiter(make_storage(tmp_path))
+    limit = parse("3/minute")
+    assert limiter.hit(limit, "key", cost=2)
+    assert not limiter.hit(limit, "key", cost=2)
+    assert limiter.hit(limit, "key")
+    assert not limiter.hit(limit, "key")
+    limiter.clear(limit, "key")
+    assert limiter.hit(limit, "key", cost=3)
+
+
+def test_reset_clears_everything(tmp_path):
+    storage = make_storage(tmp_path)
+    storage.incr("a", 60)
+    storage.incr("b", 60)
+    assert storage.reset() == 2
+    assert storage.get("a") == 0
@@ -0,0 +1,71 @@
+import json
+
+from app.report_diff import diff_summaries, load_summary, summarize
+
+
+def write_report(path, notices):
+    path.mkdir()
+    (path / "report.json").write_text(json.dumps({"summary": {}, "notices": notices}))
+    return path
+
+
+def notice(code, total, samples, severity="ERROR"):
+    return {
+        "code": code,
+        "severity": severity,
+        "totalNotices": total,
+        "sampleNotices": samples,
+    }
+
+
+def test_diff_ignores_row_numbers_and_reports_changed_samples(tmp_path):
+    base = write_report(
+        tmp_path / "base",
+        [
+            notice(
+                "foreign_key_violation",
+                2,
+                [
+                    {"fieldValue": "S1", "csvRowNumber": 5},
+                    {"fieldValue": "S2", "csvRowNumber": 6},
+                ],
+            ),
+            notice("unused_shape", 1, [{"shapeId": "X"}], "WARNING"),
+        ],
+    )
+    head = write_report(
+        tmp_path / "head",
+        [
+            notice(
+                "foreign_key_violation",
+                2,
+                [
+                    {"fieldValue": "S2", "csvRowNumber": 9},
+                    {"fieldValue": "S3", "csvRowNumber": 10},
+                ],
+            ),
+            notice("duplicate_key", 1, [{"fieldValue1": "T1"}]),
+        ],
+    )
+    diff = diff_summaries(
+        summarize(str(base / "report.json")), summarize(str(head / "report.json"))
+    )
+    assert diff["codes"] == {"added": 1, "removed": 1, "changed": 1, "unchanged": 0}
+    by_code = {change["code"]: change for change in diff["notices"]}
+    fk = by_code["foreign_key_violation"]
+    assert fk["delta"] == 0
+    assert fk["added_samples"] == [{"fieldValue": "S3", "csvRowNumber": 10}]
+    assert fk["removed_samples"] == [{"fieldValue": "S1", "csvRowNumber": 5}]
+    assert by_code["unused_shape"]["status"] == "removed"
+    assert by_code["duplicate_key"]["head_total"] == 1
+
+
+def test_summary_is_written_once(tmp_path):
+    report = write_report(tmp_path / "r", [notice("unused_shape", 3, [], "WARNING")])
+    summary, written = load_summary(report)
+    assert written > 0
+    assert load_summary(report) == (summary, 0)
+    assert diff_summaries(summary, summary) == {
+        "codes": {"added": 0, "removed": 0, "changed": 0, "unchanged": 1},
+        "notices": [],
+    }
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from app import reports
+from app.reports import iter_notices, stream_errors, stream_ndjson
+
+REPORT = {
+    "summary": {
+        "validatorVersion": "7.1.0",
+        "counts": {"Errors": 1},
+        "nested": [1, 2, {"a": "]}"}],
+    },
+    "notices": [
+        {
+            "code": "foreign_key_violation",
+            "severity": "ERROR",
+            "totalNotices": 2,
+            "sampleNotices": [{"childFilename": "stop_times.txt", "csvRowNumber": 10}],
+        },
+        {
+            "code": "unused_shape",
+            "severity": "WARNING",
+            "totalNotices": 1,
+            "sampleNotices": [],
+        },
+        {
+            "code": "empty_row",
+            "severity": "INFO",
+            "totalNotices": 12345,
+            "sampleNotices": [{"x": 1.5e3}],
+        },
+    ],
+    "trailer": 123456,
+}
+
+
+@pytest.fixture(params=[3, 64 * 1024])
+def report_json(tmp_path, monkeypatch, request):
+    # A tiny read size forces values to straddle reads.
+    monkeypatch.setattr(reports, "READ_CHARS", request.param)
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(REPORT, indent=2))
+    return str(path)
+
+
+def test_iter_notices_matches_json_load(report_json):
+    assert list(iter_notices(report_json)) == REPORT["notices"]
+
+
+def test_iter_notices_filters_by_severity(report_json):
+    assert [n["code"] for n in iter_notices(report_json, "ERROR")] == [
+        "foreign_key_violation"
+    ]
+
+
+def test_iter_notices_handles_empty_report(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text('{"notices": []}')
+    assert list(iter_notices(str(path))) == []
+    path.write_text("{}")
+    assert list(iter_notices(str(path))) == []
+
+
+def test_stream_errors_is_valid_json(report_json):
+    body = b"".join(stream_errors(report_json))
+    assert json.loads(body) == {"errors": [REPORT["notices"][0]]}
+
+
+def test_stream_ndjson_one_notice_per_line(report_json):
+    lines = b"".join(stream_ndjson(report_json)).decode().splitlines()
+    assert [json.loads(line) for line in lines] == REPORT["notices"]
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(reports, "brotli", None)
+    assert reports.choose_encoding("gzip, deflate, br") == "gzip"
+    assert reports.choose_encoding("gzip;q=0, identity") is None
+    assert reports.choose_encoding("*") == "gzip"
+    assert reports.choose_encoding("") is None
+
+
+def test_precompressed_is_written_once(report_json):
+    import gzip
+    from pathlib import Path
+
+    path = Path(report_json)
+    variant, written = reports.precompressed(path, "gzip")
+    assert variant.name == "report.json.gz"
+    assert written == variant.stat().st_size > 0
+    assert gzip.decompress(variant.read_bytes()) == path.read_bytes()
+    assert reports.precompressed(path, "gzip") == (variant, 0)
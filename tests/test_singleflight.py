@@ -0,0 +1,164 @@
+import asyncio
+import stat
+
+import httpx
+import pytest
+
+from app import main
+from app.rate_limit import limiter
+from app.settings import validator_settings
+from app.singleflight import SingleFlight
+from app.workspace import workspace
+from bench.gtfs_synth import PRESETS, write_feed
+
+
+def test_concurrent_callers_share_one_run():
+    flights = SingleFlight("test")
+    runs = []
+
+    async def work(flight):
+        runs.append(flight)
+        await asyncio.sleep(0.05)
+        (flight.scratch / "out").write_text("result")
+        return len(runs)
+
+    async def call():
+        async with flights.join("key", work) as (result, flight, leader):
+            return result, (flight.scratch / "out").read_text(), leader
+
+    async def scenario():
+        return await asyncio.gather(*(call() for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert [r[:2] for r in results] == [(1, "result")] * 5
+    assert [r[2] for r in results].count(True) == 1
+    workspace.close()
+    assert not runs[0].scratch.exists()
+    assert flights.in_flight() == 0
+
+
+def test_a_waiter_leaving_does_not_cancel_the_work():
+    flights = SingleFlight("test")
+    finished = []
+
+    async def work(flight):
+        await asyncio.sleep(0.1)
+        finished.append(True)
+        return "done"
+
+    async def call():
+        async with flights.join("key", work) as (result, _, _):
+            return result
+
+    async def scenario():
+        leader = asyncio.create_task(call())
+        follower = asyncio.create_task(call())
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "done"
+    assert finished == [True]
+
+
+def test_work_stops_once_every_waiter_is_gone():
+    flights = SingleFlight("test")
+    state = {}
+
+    async def work(flight):
+        state["flight"] = flight
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def call():
+        async with flights.join("key", work):
+            pass
+
+    async def scenario():
+        tasks = [asyncio.create_task(call()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert state["cancelled"]
+    workspace.close()
+    assert not state["flight"].scratch.exists()
+
+
+def test_abandoned_only_when_every_client_disconnected():
+    flights = SingleFlight("test")
+    gone = {"a": True, "b": False}
+
+    async def work(flight):
+        await asyncio.sleep(0.02)
+        return await flight.abandoned()
+
+    def check(name):
+        async def is_disconnected():
+            return gone[name]
+
+        return is_disconnected
+
+    async def call(name):
+        async with flights.join("key", work, check(name)) as (abandoned, _, _):
+            return abandoned
+
+    async def scenario():
+        return await asyncio.gather(call("a"), call("b"))
+
+    assert asyncio.run(scenario()) == [False, False]
+    gone["b"] = True
+    assert asyncio.run(scenario()) == [True, True]
+
+
+SLOW_JAVA = """#!/bin/sh
+while [ "$#" -gt 0 ]; do
+  if [ "$1" = "-o" ]; then out="$2"; fi
+  shift
+done
+echo run >> "{runs}"
+sleep 0.3
+echo '{{"notices": []}}' > "$out/report.json"
+echo "<html>report</html>" > "$out/report.html"
+"""
+
+
+def test_identical_concurrent_validations_run_the_validator_once(tmp_path, monkeypatch):
+    runs = tmp_path / "runs"
+    java = tmp_path / "java"
+    java.write_text(SLOW_JAVA.format(runs=runs))
+    java.chmod(java.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", str(java))
+    limiter.reset()
+    feed = tmp_path / "feed.zip"
+    write_feed(str(feed), PRESETS["tiny"])
+    data = feed.read_bytes()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await asyncio.gather(
+                *(
+                    client.post(
+                        "/validate?use_cache=false",
+                        files={"file": ("feed.zip", data, "application/zip")},
+                    )
+                    for _ in range(4)
+                )
+            )
+
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 4
+    assert all(r.json() == {"notices": []} for r in responses)
+    assert runs.read_text().splitlines() == ["run"]
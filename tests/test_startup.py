@@ -0,0 +1,48 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from app import startup
+
+
+def test_heavy_dependencies_are_not_imported_with_the_app():
+    code = (
+        "import sys, app.main\n"
+        "heavy = ['google.cloud.firestore', 'fastapi_mail', 'aiohttp', 'markdown']\n"
+        "print([name for name in heavy if name in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ.copy(),
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_warm_up_times_steps_and_survives_failures(monkeypatch):
+    monkeypatch.setattr(startup, "timings", {})
+    monkeypatch.setattr(startup, "milestones", {})
+
+    async def ok():
+        await asyncio.sleep(0)
+
+    async def broken():
+        raise RuntimeError("no network")
+
+    asyncio.run(startup.warm_up({"ok": ok, "broken": broken}))
+    report = startup.report()
+    assert report["warm"]
+    assert set(report["timings"]) == {"warm-up ok", "warm-up broken"}
+
+
+def test_lazy_import_records_first_import(monkeypatch):
+    monkeypatch.setattr(startup, "timings", {})
+    monkeypatch.delitem(sys.modules, "json.tool", raising=False)
+    assert startup.lazy_import("json.tool").__name__ == "json.tool"
+    assert "import json.tool" in startup.timings
+    startup.timings.clear()
+    startup.lazy_import("json.tool")
+    assert startup.timings == {}
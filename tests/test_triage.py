@@ -0,0 +1,80 @@
+import json
+import zipfile
+
+import pytest
+
+from app.triage import triage, write_report
+from bench.gtfs_synth import PRESETS, write_feed
+
+
+@pytest.fixture
+def feed(tmp_path):
+    def make(errors=(), extra=None):
+        path = tmp_path / "feed.zip"
+        write_feed(str(path), PRESETS["tiny"], errors)
+        if extra:
+            with zipfile.ZipFile(path, "a") as archive:
+                for name, content in extra.items():
+                    archive.writestr(name, content)
+        return str(path)
+
+    return make
+
+
+def codes(result):
+    return {n["code"]: n["totalNotices"] for n in result.notices}
+
+
+def test_clean_feed_has_no_notices(feed):
+    assert triage(feed()).notices == []
+    assert triage(feed(), deep=True).notices == []
+
+
+def test_structural_problems_are_fatal(feed):
+    result = triage(feed(["missing_calendar", "empty_agency"]))
+    assert result.fatal
+    assert codes(result) == {
+        "missing_calendar_and_calendar_date_files": 1,
+        "empty_file": 1,
+    }
+
+
+def test_headers(feed):
+    result = triage(
+        feed(
+            extra={
+                "shapes.txt": "shape_id,,shape_id\n1,2,3\n",
+                "frequencies.txt": "x\n",
+            }
+        )
+    )
+    assert codes(result) == {"empty_column_name": 1, "duplicated_column": 1}
+    assert not result.fatal
+
+
+def test_deep_checks_keys_and_references(feed):
+    assert codes(triage(feed(["duplicate_stop"]), deep=True))["duplicate_key"] == 1
+    result = triage(feed(["foreign_key"]), deep=True)
+    assert codes(result) == {"foreign_key_violation": 1}
+    violation = next(n for n in result.notices if n["code"] == "foreign_key_violation")
+    assert violation["sampleNotices"] == [
+        {
+            "childFilename": "stop_times.txt",
+            "childFieldName": "stop_id",
+            "parentFilename": "stops.txt",
+            "parentFieldName": "stop_id",
+            "fieldValue": "MISSING0",
+            "csvRowNumber": 2,
+        }
+    ]
+    assert not result.fatal
+
+
+def test_report_matches_validator_schema(feed, tmp_path):
+    result = triage(feed(["empty_agency"]))
+    write_report(result, tmp_path)
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["summary"]["validationMode"] == "preflight"
+    assert report["summary"]["counts"]["Errors"] == 1
+    assert report["notices"][0]["sampleNotices"] == [{"filename": "agency.txt"}]
+    assert "empty_file" in (tmp_path / "report.html").read_text()
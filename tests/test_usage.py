@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app import auth
+from app.storage import MemoryStore
+from app.usage import UsageTracker
+
+
+class CountingStore(MemoryStore):
+    def __init__(self, fail=False):
+        super().__init__()
+        self.writes = 0
+        self.fail = fail
+
+    async def add_usage(self, period, deltas):
+        self.writes += 1
+        if self.fail:
+            raise RuntimeError("store unavailable")
+        await super().add_usage(period, deltas)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = CountingStore()
+    monkeypatch.setattr(auth, "store", store)
+    return store
+
+
+def tracker(**quotas):
+    return UsageTracker(3600, 3600, quotas.get("bytes"), quotas.get("cpu_seconds"))
+
+
+def test_usage_is_flushed_in_one_batched_write(store):
+    usage = tracker()
+
+    async def scenario():
+        for _ in range(3):
+            usage.record("a", validations=1, bytes=100, cpu_seconds=0.5)
+        usage.record("b", validations=1, bytes=10)
+        usage.record(None, validations=1, bytes=10**9)
+        assert store.writes == 0
+        assert await usage.flush() == 2
+        assert await usage.flush() == 0
+        return await store.get_usage("a", usage.period), await usage.get("a")
+
+    stored, total = asyncio.run(scenario())
+    assert store.writes == 1
+    assert stored == {"validations": 3, "bytes": 300, "cpu_seconds": 1.5}
+    assert total.bytes == 300
+
+
+def test_close_drains_pending_usage(store):
+    usage = tracker()
+
+    async def scenario():
+        usage.start()
+        usage.record("a", validations=1, bytes=100)
+        await usage.close()
+
+    asyncio.run(scenario())
+    assert store.usage[("a", usage.period)]["bytes"] == 100
+
+
+def test_failed_flush_keeps_usage_for_the_next_one(monkeypatch):
+    store = CountingStore(fail=True)
+    monkeypatch.setattr(auth, "store", store)
+    usage = tracker()
+
+    async def scenario():
+        usage.record("a", validations=1, bytes=100)
+        with pytest.raises(RuntimeError):
+            await usage.flush()
+        usage.record("a", validations=1, bytes=50)
+        store.fail = False
+        await usage.flush()
+
+    asyncio.run(scenario())
+    assert store.usage[("a", usage.period)] == {
+        "validations": 2,
+        "bytes": 150,
+        "cpu_seconds": 0.0,
+    }
+
+
+def test_quota_counts_unflushed_and_stored_usage(store):
+    usage = tracker(bytes=1000)
+
+    async def scenario():
+        await store.add_usage(
+            usage.period, {"a": {"validations": 1, "bytes": 600, "cpu_seconds": 0}}
+        )
+        await usage.check_quota("a")
+        usage.record("a", validations=1, bytes=400)
+        with pytest.raises(HTTPException) as exc:
+            await usage.check_quota("a")
+        assert exc.value.status_code == 429
+        # Other keys and anonymous requests are unaffected.
+        await usage.check_quota("b")
+        await usage.check_quota(None)
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import asyncio
+import stat
+
+import pytest
+from fastapi import HTTPException
+
+from app import validator
+from app.settings import validator_settings
+
+# Writes an empty report into the -o directory, wherever the JVM options put it.
+WRITE_REPORT = """while [ "$#" -gt 0 ]; do
+  if [ "$1" = "-o" ]; then out="$2"; fi
+  shift
+done
+echo "{}" > "$out/report.json"
+"""
+
+
+def make_fake_java(tmp_path, script: str):
+    java = tmp_path / "java"
+    java.write_text("#!/bin/sh\n" + script)
+    java.chmod(java.stat().st_mode | stat.S_IEXEC)
+    return str(java)
+
+
+def test_run_validator_success(tmp_path, monkeypatch):
+    java = make_fake_java(tmp_path, WRITE_REPORT)
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", java)
+    asyncio.run(validator.run_validator("feed.zip", str(tmp_path)))
+    assert (tmp_path / "report.json").exists()
+
+
+def test_run_validator_failure_returns_stderr(tmp_path, monkeypatch):
+    java = make_fake_java(tmp_path, "echo 'bad feed' >&2\nexit 3\n")
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", java)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(validator.run_validator("feed.zip", str(tmp_path)))
+    assert exc.value.status_code == 500
+    assert "bad feed" in exc.value.detail
+
+
+def test_run_validator_timeout_kills_process(tmp_path, monkeypatch):
+    java = make_fake_java(tmp_path, "sleep 30\n")
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", java)
+    monkeypatch.setattr(validator_settings, "VALIDATOR_TIMEOUT_SECONDS", 0.2)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(validator.run_validator("feed.zip", str(tmp_path)))
+    assert exc.value.status_code == 504
+
+
+def test_run_validator_stops_on_disconnect(tmp_path, monkeypatch):
+    java = make_fake_java(tmp_path, "sleep 30\n")
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", java)
+
+    async def disconnected():
+        return True
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(validator.run_validator("feed.zip", str(tmp_path), disconnected))
+    assert exc.value.status_code == 499
+
+
+def test_run_validator_reports_resource_usage(tmp_path, monkeypatch):
+    java = make_fake_java(tmp_path, WRITE_REPORT)
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", java)
+    usage = asyncio.run(validator.run_validator("feed.zip", str(tmp_path)))
+    assert usage.cpu_seconds >= 0
+    assert usage.max_rss_bytes > 0
+
+
+def test_run_validator_starts_the_process_off_the_event_loop(tmp_path, monkeypatch):
+    java = make_fake_java(tmp_path, WRITE_REPORT)
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", java)
+    popen = validator.subprocess.Popen
+    started_on_loop = []
+
+    def recording_popen(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            started_on_loop.append(True)
+        except RuntimeError:
+            started_on_loop.append(False)
+        return popen(*args, **kwargs)
+
+    monkeypatch.setattr(validator.subprocess, "Popen", recording_popen)
+    asyncio.run(validator.run_validator("feed.zip", str(tmp_path)))
+    assert started_on_loop == [False]
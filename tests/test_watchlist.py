@@ -0,0 +1,175 @@
+import asyncio
+import os
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import auth, main, pipeline
+from app import watchlist as watchlist_module
+from app.cache import ReportCache, sha256_file
+from app.fetch import FetchResult, fetcher
+from app.settings import validator_settings
+from app.storage import MemoryStore
+from app.watchlist import CHECK_PREFIX, OK, Watchlist
+from bench.gtfs_synth import PRESETS, write_feed
+
+FAKE_JAVA = """#!/bin/sh
+while [ "$#" -gt 0 ]; do
+  if [ "$1" = "-o" ]; then out="$2"; fi
+  shift
+done
+echo '{"notices": [{"code": "unused_shape", "severity": "WARNING"}]}' > "$out/report.json"
+echo "<html>report</html>" > "$out/report.html"
+"""
+
+
+@pytest.fixture
+def feeds(tmp_path):
+    paths = []
+    for seed in range(2):
+        path = tmp_path / f"feed{seed}.zip"
+        write_feed(str(path), PRESETS["tiny"], seed=seed)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def watches(tmp_path, monkeypatch, feeds):
+    java = tmp_path / "java"
+    java.write_text(FAKE_JAVA)
+    java.chmod(java.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(validator_settings, "JAVA_BIN", str(java))
+    monkeypatch.setattr(
+        pipeline, "report_cache", ReportCache(str(tmp_path / "cache"), 10**9)
+    )
+    # Checks count usage against the watch's key.
+    monkeypatch.setattr(auth, "store", MemoryStore())
+    watches = Watchlist(
+        str(tmp_path / "watch.sqlite3"), str(tmp_path / "watch"), 3600, 60, 0.1, 2, 3
+    )
+    watches.served = feeds[0]
+    watches.fetches = 0
+    watches.validations = 0
+
+    async def fetch(url, dest):
+        watches.fetches += 1
+        (tmp_path / "served").write_bytes(watches.served.read_bytes())
+        (tmp_path / "served").replace(dest)
+        return FetchResult(sha256_file(dest), watches.served.stat().st_size)
+
+    async def validate(*args, **kwargs):
+        watches.validations += 1
+        return await pipeline.validate_in_background(*args, **kwargs)
+
+    monkeypatch.setattr(fetcher, "fetch", fetch)
+    monkeypatch.setattr(watchlist_module, "validate_in_background", validate)
+    return watches
+
+
+def test_unchanged_feeds_are_not_revalidated(watches, feeds):
+    url = "https://example.com/gtfs.zip"
+    watch = watches.add("key", url)
+
+    async def check():
+        await watches.check(watches.get("key", watch["id"]))
+
+    asyncio.run(check())
+    asyncio.run(check())
+    assert (watches.fetches, watches.validations) == (2, 1)
+    first = watches.ready(url)
+    assert first["status"] == OK
+    assert (watches.report_dir(first) / "report.json").exists()
+
+    watches.served = feeds[1]
+    asyncio.run(check())
+    assert watches.validations == 2
+    second = watches.ready(url)
+    assert second["feed_sha256"] != first["feed_sha256"]
+    # The previous report stays until the next change, for responses still reading it.
+    assert watches.report_dir(first).exists()
+
+
+def test_watches_are_limited_per_key_and_interval(watches):
+    with pytest.raises(HTTPException):
+        watches.add("key", "https://example.com/a.zip", interval=1)
+    for name in "abc":
+        watches.add("key", f"https://example.com/{name}.zip")
+    # Registering a URL again updates it rather than adding another watch.
+    assert watches.add("key", "https://example.com/a.zip", 7200)["interval"] == 7200
+    with pytest.raises(HTTPException):
+        watches.add("key", "https://example.com/d.zip")
+    assert len(watches.list("key")) == 3
+    assert watches.list("other") == []
+
+
+def test_checks_are_spread_by_jitter(watches):
+    for n in range(50):
+        watches.add(f"key{n}", "https://example.com/gtfs.zip", interval=1000)
+    now = time.time()
+    claimed = watches._claim_due(100)
+    assert len(claimed) == 50
+    delays = [watch["next_check_at"] - now for watch in claimed]
+    assert all(899 <= delay <= 1101 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_a_due_watch_is_claimed_by_one_process(watches, tmp_path):
+    watch = watches.add("key", "https://example.com/gtfs.zip")
+    other = Watchlist(
+        str(tmp_path / "watch.sqlite3"), str(tmp_path / "watch"), 3600, 60, 0.1, 2, 3
+    )
+    try:
+        assert [claimed["id"] for claimed in watches._claim_due(10)] == [watch["id"]]
+        assert other._claim_due(10) == []
+    finally:
+        asyncio.run(other.close())
+
+
+def test_start_removes_only_checks_of_gone_processes(watches):
+    watch = watches.add("key", "https://example.com/gtfs.zip")
+    dead = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        check=True,
+    )
+    gone = watches.watch_dir / watch["id"] / f"{CHECK_PREFIX}{int(dead.stdout)}-abc"
+    running = watches.watch_dir / watch["id"] / f"{CHECK_PREFIX}{os.getppid()}-abc"
+    gone.mkdir(parents=True)
+    running.mkdir()
+
+    async def start():
+        watches.start()
+        await watches.close()
+
+    asyncio.run(start())
+    assert not gone.exists()
+    assert running.exists()
+
+
+def test_validate_answers_from_the_watchlist(watches, monkeypatch):
+    url = "https://example.com/gtfs.zip"
+    monkeypatch.setattr(main, "watchlist", watches)
+
+    async def scheduled():
+        watches.start()
+        watches.add("key", url)
+        for _ in range(100):
+            if watches.ready(url):
+                break
+            await asyncio.sleep(0.05)
+        await watches.close()
+
+    asyncio.run(scheduled())
+    assert watches.validations == 1
+    with TestClient(main.app) as client:
+        response = client.post("/validate", data={"url": url})
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "HIT"
+    assert "x-checked-at" in response.headers
+    assert response.json()["notices"][0]["code"] == "unused_shape"
+    assert watches.fetches == 1
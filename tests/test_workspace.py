@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+from app.workspace import Workspace
+
+
+def make_workspace(tmp_path, **limits):
+    return Workspace(
+        str(tmp_path / "work"),
+        limits.get("max_bytes", 0),
+        limits.get("request_max_bytes", 0),
+        limits.get("min_free_bytes", 0),
+        2,
+    )
+
+
+def test_reservations_are_limited_and_freed_after_deletion(tmp_path):
+    workspace = make_workspace(tmp_path, max_bytes=1000, request_max_bytes=800)
+    a, b = workspace.create("validate"), workspace.create("validate")
+    workspace.reserve_for_feed(a, 300)
+    with pytest.raises(HTTPException) as exc:
+        workspace.reserve_for_feed(b, 300)
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+    with pytest.raises(HTTPException) as exc:
+        workspace.reserve(a, 300)
+    assert exc.value.status_code == 413
+    (a / "feed.zip").write_bytes(b"x")
+    workspace.release(a)
+    workspace.close()
+    assert not a.exists()
+    assert workspace.stats()["reserved_bytes"] == 0
+    workspace.reserve_for_feed(b, 300)
+
+
+def test_reservations_of_other_processes_count(tmp_path):
+    workspace = make_workspace(tmp_path, max_bytes=1000)
+    # Another worker process sharing the root.
+    other = make_workspace(tmp_path, max_bytes=1000)
+    workspace.reserve(workspace.create("validate"), 600)
+    b = other.create("validate")
+    with pytest.raises(HTTPException) as exc:
+        other.reserve(b, 600)
+    assert exc.value.status_code == 503
+    # What is on disk counts too, beyond what was reserved, once the disk is scanned.
+    (b / "feed.zip").write_bytes(b"x" * 300)
+    other.reserve(b, 200)
+    other.scan()
+    with pytest.raises(HTTPException):
+        other.reserve(b, 200)
+    assert other.stats()["reserved_bytes"] == 900
+
+
+def test_reserving_does_not_walk_the_disk(tmp_path, monkeypatch):
+    workspace = make_workspace(tmp_path, max_bytes=1000, min_free_bytes=1)
+    a = workspace.create("validate")
+    (a / "feed.zip").write_bytes(b"x" * 100)
+    workspace.scan()
+
+    def walk(*args):
+        raise AssertionError("reserve walked the workspaces")
+
+    monkeypatch.setattr(Workspace, "_size", staticmethod(walk))
+    for _ in range(5):
+        workspace.reserve(a, 100)
+    assert workspace.usage() == (500, 400)
+
+
+def test_reservations_of_gone_processes_do_not_count(tmp_path):
+    workspace = make_workspace(tmp_path, max_bytes=1000)
+    exited = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        check=True,
+    )
+    workspace.create("validate")
+    gone = f"{exited.stdout.decode().strip()}-abc"
+    (workspace.root / ".reserved" / gone).write_text('{"gone": 900}')
+    assert workspace.usage() == (0, 0)
+
+
+def test_low_free_space_is_refused(tmp_path):
+    workspace = make_workspace(tmp_path, min_free_bytes=2**62)
+    with pytest.raises(HTTPException) as exc:
+        workspace.reserve_for_feed(workspace.create("validate"), 1)
+    assert exc.value.status_code == 503
+
+
+def test_orphans_of_exited_processes_are_removed(tmp_path):
+    workspace = make_workspace(tmp_path)
+    live = workspace.create("validate")
+    exited = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        check=True,
+    )
+    dead_pid = int(exited.stdout)
+    orphan = workspace.root / f"{dead_pid}-validate-abc"
+    orphan.mkdir()
+    other_worker = workspace.root / f"{os.getppid()}-batch-abc"
+    other_worker.mkdir()
+    stale = workspace.root / f"{os.getpid()}-validate-stale"
+    stale.mkdir()
+    assert workspace.clean_orphans() == 2
+    assert live.exists() and other_worker.exists()
+    assert not orphan.exists() and not stale.exists()